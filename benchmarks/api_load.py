@@ -0,0 +1,74 @@
+"""End-to-end API load tests through an in-process ASGI client (no network, no server)."""
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.datagen import generate_sales_data
+from benchmarks.harness import summarize
+
+
+def _load_app():
+    from src.api import main as api_main
+    # ASGITransport does not run lifespan events, so load the models explicitly
+    api_main.load_trained_models()
+    return api_main.app
+
+
+async def _drive(app, make_request, n_requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await make_request(client)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await one()  # warm-up
+        latencies.clear()
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        wall = time.perf_counter() - wall_start
+    return latencies, wall
+
+
+def _load_test(make_request, rows_per_request: int, n_requests: int, concurrency: int) -> dict:
+    app = _load_app()
+    latencies, wall = asyncio.run(_drive(app, make_request, n_requests, concurrency))
+    result = summarize(latencies, rows_per_request)
+    result['concurrency'] = concurrency
+    result['requests_per_sec'] = n_requests / wall
+    result['rows_per_sec'] = n_requests * rows_per_request / wall
+    return result
+
+
+def bench_predict_json(rows_per_request: int, n_requests: int, concurrency: int, model: str = 'xgboost'):
+    records = generate_sales_data(rows_per_request, seed=1).to_dict('records')
+    payload = {'data': records, 'model': model}
+
+    def make_request(client):
+        return client.post('/api/predict_json', json=payload)
+
+    return _load_test(make_request, rows_per_request, n_requests, concurrency)
+
+
+def bench_predict_csv(rows_per_request: int, n_requests: int, concurrency: int, model: str = 'xgboost'):
+    body = generate_sales_data(rows_per_request, seed=2).to_csv(index=False).encode()
+
+    def make_request(client):
+        return client.post('/api/predict_csv', data={'model_name': model},
+                           files={'file': ('bench.csv', body, 'text/csv')})
+
+    return _load_test(make_request, rows_per_request, n_requests, concurrency)
+
+
+def cases(n_rows: int, concurrency: int = 8):
+    """Yield ``(name, fn, args)`` load tests where each request carries ``n_rows`` rows."""
+    n_requests = int(max(4, min(64, 200_000 // max(n_rows, 1))))
+    # JSON bodies of very large batches are dominated by JSON decoding; cap them
+    if n_rows <= 100_000:
+        yield 'api.predict_json', bench_predict_json, (n_rows, n_requests, concurrency)
+    yield 'api.predict_csv', bench_predict_csv, (n_rows, n_requests, concurrency)
@@ -0,0 +1,78 @@
+"""Synthetic Walmart-shaped sales data for benchmarks.
+
+Rows are bootstrapped from ``data/Walmart.csv`` so that stores, dates and holiday flags keep
+their real categories, and the numeric measures get a small multiplicative jitter so that
+duplicates are rare at large sizes.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.load_data import load_raw_data
+from src.data.schema import DATE_FORMAT
+
+COLUMNS = ['Store', 'Date', 'Weekly_Sales', 'Holiday_Flag', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+NUMERIC_COLUMNS = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+_reference = None
+
+
+def parse_size(label: str) -> int:
+    """Turn '1k', '100k', '10m' or a plain integer string into a row count."""
+    label = label.strip().lower()
+    if label in SIZES:
+        return SIZES[label]
+    if label[-1:] in ('k', 'm'):
+        return int(float(label[:-1]) * (1_000 if label[-1] == 'k' else 1_000_000))
+    return int(label)
+
+
+def _reference_data() -> pd.DataFrame:
+    global _reference
+    if _reference is None:
+        _reference = load_raw_data()[COLUMNS]
+        # Clients send dates as text, so keep them in the CSV's own format
+        _reference['Date'] = _reference['Date'].dt.strftime(DATE_FORMAT)
+    return _reference
+
+
+def generate_sales_data(n_rows: int, seed: int = 0, jitter: float = 0.02) -> pd.DataFrame:
+    """Return ``n_rows`` rows shaped like ``Walmart.csv``."""
+    reference = _reference_data()
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(reference), size=n_rows)
+    df = reference.iloc[idx].reset_index(drop=True)
+    for col in NUMERIC_COLUMNS:
+        noise = rng.normal(1.0, jitter, size=n_rows)
+        df[col] = (df[col].to_numpy() * noise).round(4).astype(np.float32)
+    return df
+
+
+def write_sales_csv(path, n_rows: int, seed: int = 0, chunk_rows: int = 1_000_000) -> Path:
+    """Stream ``n_rows`` synthetic rows to ``path`` without materialising them all at once."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    chunk_index = 0
+    with open(path, 'w', newline='') as f:
+        while written < n_rows:
+            rows = min(chunk_rows, n_rows - written)
+            chunk = generate_sales_data(rows, seed=seed + chunk_index)
+            chunk.to_csv(f, header=(written == 0), index=False)
+            written += rows
+            chunk_index += 1
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic Walmart-shaped CSV")
+    parser.add_argument('size', help="Row count, e.g. 1k, 100k, 10m")
+    parser.add_argument('output', help="Destination CSV path")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(write_sales_csv(args.output, parse_size(args.size), seed=args.seed))
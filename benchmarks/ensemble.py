@@ -0,0 +1,70 @@
+"""How training and inference cost scale with the size of the prediction-interval ensemble.
+
+    python -m benchmarks.ensemble                            # bootstrap, 1..32 members, 100k rows
+    python -m benchmarks.ensemble --members 1,4,16 --rows 1m --method quantile
+
+For each ensemble size a bootstrap (or quantile) ensemble is trained on synthetic rows and then
+asked for five quantiles of every row. Each size runs in a forked process, so the peak RSS column
+shows what that ensemble costs on its own. With the feature matrix shared by all members, latency
+should grow about linearly with the member count and memory barely at all.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import numpy as np
+
+from src.models.ensemble import DEFAULT_QUANTILES
+from src.models.train import train_xgboost_ensemble
+
+from benchmarks.datagen import generate_sales_data, parse_size
+from benchmarks.harness import run_isolated, time_calls
+from benchmarks.micro import load_artifacts, prepare_features
+
+TRAIN_ROWS = 20_000
+REPEATS = 5
+
+
+def bench_ensemble(X, y, members: int, method: str, n_jobs: int = None) -> dict:
+    n_train = min(len(X), TRAIN_ROWS)
+    quantiles = np.linspace(0.05, 0.95, members) if method == 'quantile' else DEFAULT_QUANTILES
+    start = time.perf_counter()
+    ensemble = train_xgboost_ensemble(X[:n_train], y[:n_train], method=method, members=members,
+                                      quantiles=quantiles, n_jobs=n_jobs)
+    train_s = time.perf_counter() - start
+    result = time_calls(lambda: ensemble.predict_quantiles(X, DEFAULT_QUANTILES), len(X), repeats=REPEATS)
+    result.update(members=ensemble.n_members, train_s=train_s)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ensemble size vs training time, prediction latency and memory")
+    parser.add_argument('--rows', default='100k', help="Rows scored per prediction call (1k, 100k, 1m, ...)")
+    parser.add_argument('--members', default='1,2,4,8,16,32', help="Comma-separated ensemble sizes")
+    parser.add_argument('--method', default='bootstrap', choices=['bootstrap', 'quantile'])
+    parser.add_argument('--jobs', type=int, default=None, help="Training threads (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    n_rows = parse_size(args.rows)
+    models, scaler = load_artifacts()
+    df_proc, X = prepare_features(generate_sales_data(n_rows), scaler, models['xgboost']['feature_names'])
+    y = df_proc['Weekly_Sales'].to_numpy()
+
+    print(f"{args.method} ensemble, {len(X):,} rows per call, trained on {min(len(X), TRAIN_ROWS):,} rows")
+    print(f"{'members':>8} {'train s':>9} {'p50 ms':>10} {'ms/member':>10} {'rows/s':>14} {'peak RSS MB':>12}")
+    for size in (int(s) for s in args.members.split(',') if s):
+        r = run_isolated(bench_ensemble, X, y, size, args.method, args.jobs)
+        print(f"{r['members']:8d} {r['train_s']:9.2f} {r['p50_ms']:10.2f} {r['p50_ms'] / r['members']:10.2f} "
+              f"{r['rows_per_sec']:14,.0f} {r['peak_rss_mb']:12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Timing, memory and isolation helpers shared by the benchmark modules."""
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import traceback
+
+import numpy as np
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process right now."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def default_repeats(n_rows: int) -> int:
+    """More repeats for small inputs, a handful for large ones."""
+    return int(max(3, min(50, 2_000_000 // max(n_rows, 1))))
+
+
+def summarize(latencies, n_rows: int) -> dict:
+    """Latency percentiles (ms) and throughput for a list of per-call durations in seconds."""
+    lat = np.asarray(latencies, dtype=float)
+    p50 = float(np.percentile(lat, 50))
+    return {
+        'repeats': int(lat.size),
+        'rows': int(n_rows),
+        'mean_ms': float(lat.mean() * 1e3),
+        'p50_ms': p50 * 1e3,
+        'p95_ms': float(np.percentile(lat, 95) * 1e3),
+        'p99_ms': float(np.percentile(lat, 99) * 1e3),
+        'rows_per_sec': float(n_rows / p50) if p50 > 0 else float('inf'),
+    }
+
+
+def time_calls(fn, n_rows: int, repeats: int = None, warmup: int = 1) -> dict:
+    """Call ``fn()`` repeatedly and summarise its latency."""
+    repeats = repeats or default_repeats(n_rows)
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, n_rows)
+
+
+def _child(queue, fn, args):
+    try:
+        rss_before = current_rss_mb()
+        result = fn(*args)
+        result['peak_rss_mb'] = peak_rss_mb()
+        result['rss_delta_mb'] = max(0.0, result['peak_rss_mb'] - rss_before)
+        queue.put(('ok', result))
+    except BaseException:
+        queue.put(('error', traceback.format_exc()))
+
+
+def run_isolated(fn, *args) -> dict:
+    """Run ``fn(*args)`` in a forked child so its peak RSS is measured on its own.
+
+    Falls back to running in-process where ``fork`` is unavailable; the RSS numbers are then cumulative.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        rss_before = current_rss_mb()
+        result = fn(*args)
+        result['peak_rss_mb'] = peak_rss_mb()
+        result['rss_delta_mb'] = max(0.0, result['peak_rss_mb'] - rss_before)
+        return result
+    ctx = multiprocessing.get_context('fork')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_child, args=(queue, fn, args))
+    process.start()
+    status, payload = queue.get()
+    process.join()
+    if status != 'ok':
+        raise RuntimeError(f"Benchmark {getattr(fn, '__name__', fn)} failed:\n{payload}")
+    return payload
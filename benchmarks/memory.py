@@ -0,0 +1,89 @@
+"""Memory per row of the compact dtype schema versus pandas' default dtypes.
+
+    python -m benchmarks.memory                  # 100k rows
+    python -m benchmarks.memory --rows 1m --min-ratio 3
+
+Compares the deep size per row of the raw and the preprocessed frame in pandas' default
+(int64/float64/str) dtypes with the schema dtypes, and reports the tracemalloc peak per row of
+``preprocess_sales_data``. Exits non-zero when a frame shrinks by less than ``--min-ratio``.
+"""
+import argparse
+import logging
+import sys
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+from src.data.schema import DATE_COLUMN, DATE_FORMAT, apply_schema, bytes_per_row
+from src.features.preprocess import preprocess_sales_data
+
+from benchmarks.datagen import generate_sales_data, parse_size
+
+
+def default_dtype_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` as ``pd.read_csv`` would return it without a schema."""
+    legacy = pd.DataFrame({col: df[col].to_numpy() for col in df.columns})
+    for col in legacy.columns:
+        if pd.api.types.is_integer_dtype(legacy[col]):
+            legacy[col] = legacy[col].astype('int64')
+        elif pd.api.types.is_float_dtype(legacy[col]):
+            legacy[col] = legacy[col].astype('float64')
+    return legacy
+
+
+def schema_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` as ``load_raw_data`` returns it: schema dtypes and a parsed Date column."""
+    compact = apply_schema(df.copy())
+    compact[DATE_COLUMN] = pd.to_datetime(compact[DATE_COLUMN], format=DATE_FORMAT)
+    return compact
+
+
+def preprocess_peak_bytes_per_row(df: pd.DataFrame) -> float:
+    tracemalloc.start()
+    try:
+        preprocess_sales_data(df)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / len(df)
+
+
+def measure(n_rows: int, seed: int = 0) -> dict:
+    df = generate_sales_data(n_rows, seed=seed)
+    legacy, compact = default_dtype_frame(df), schema_frame(df)
+    del df
+    processed = preprocess_sales_data(compact)
+    return {
+        'raw': (bytes_per_row(legacy), bytes_per_row(compact)),
+        'preprocessed': (bytes_per_row(default_dtype_frame(processed)), bytes_per_row(processed)),
+        'preprocess_peak': preprocess_peak_bytes_per_row(compact),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory per row: default dtypes vs the compact schema")
+    parser.add_argument('--rows', default='100k', help="Row count (1k, 100k, 1m, ...)")
+    parser.add_argument('--min-ratio', type=float, default=3.0, help="Required reduction factor")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    results = measure(parse_size(args.rows))
+
+    failed = False
+    peak = results.pop('preprocess_peak')
+    print(f"{'frame':<18} {'default B/row':>14} {'schema B/row':>13} {'ratio':>7}")
+    for name, (before, after) in results.items():
+        ratio = before / after if after else float('inf')
+        failed |= ratio < args.min_ratio
+        print(f'{name:<18} {before:14.1f} {after:13.1f} {ratio:7.2f}')
+    print(f'preprocess_sales_data peak: {peak:.1f} B/row')
+    if failed:
+        print(f'Memory reduction below {args.min_ratio}x')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Per-function micro-benchmarks for the preprocessing, scaling and prediction hot path."""
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from src.features.preprocess import preprocess_sales_data, scale_features, remove_outliers_iqr
+from src.models.train import predict
+
+from benchmarks.datagen import generate_sales_data, NUMERIC_COLUMNS
+from benchmarks.harness import time_calls
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / 'src' / 'models'
+MODEL_FILES = {'linear': 'linear_regression_model.pkl', 'xgboost': 'xgboost_model.pkl'}
+
+
+def load_artifacts():
+    """Load the trained models and scaler shipped in ``src/models``."""
+    models = {name: joblib.load(MODELS_DIR / filename) for name, filename in MODEL_FILES.items()}
+    scaler = joblib.load(MODELS_DIR / 'standard_scaler.pkl')
+    return models, scaler
+
+
+def bench_preprocess(df, repeats=None):
+    return time_calls(lambda: preprocess_sales_data(df), len(df), repeats)
+
+
+def bench_remove_outliers(df, repeats=None):
+    return time_calls(lambda: remove_outliers_iqr(df, columns=NUMERIC_COLUMNS), len(df), repeats)
+
+
+def bench_scale(df_proc, scaler, repeats=None):
+    return time_calls(lambda: scale_features(df_proc, scaler), len(df_proc), repeats)
+
+
+def bench_predict(model_data, X, repeats=None):
+    return time_calls(lambda: predict(model_data, X), len(X), repeats)
+
+
+def prepare_features(df, scaler, feature_names):
+    """Preprocess, scale and align ``df`` the way the API does before calling predict."""
+    df_proc = preprocess_sales_data(df)
+    df_scaled, _ = scale_features(df_proc, scaler)
+    for col in feature_names:
+        if col not in df_scaled.columns:
+            df_scaled[col] = 0
+    return df_proc, np.ascontiguousarray(df_scaled[feature_names].to_numpy())
+
+
+def cases(n_rows: int, seed: int = 0):
+    """Yield ``(name, fn, args)`` for every micro-benchmark at the given size."""
+    df = generate_sales_data(n_rows, seed=seed)
+    models, scaler = load_artifacts()
+    feature_names = models['xgboost']['feature_names']
+    df_proc, X = prepare_features(df, scaler, feature_names)
+    df_proc_features = df_proc.drop(columns=['Weekly_Sales'], errors='ignore')
+
+    yield 'preprocess_sales_data', bench_preprocess, (df,)
+    yield 'remove_outliers_iqr', bench_remove_outliers, (df,)
+    yield 'scale_features', bench_scale, (df_proc_features, scaler)
+    for name, model_data in models.items():
+        yield f'predict[{name}]', bench_predict, (model_data, X)
@@ -0,0 +1,142 @@
+"""Run the benchmark suite, store the results as JSON and compare them with a baseline.
+
+    python -m benchmarks.run                        # micro + api at 1k and 100k rows
+    python -m benchmarks.run --sizes 1k,100k,10m    # include the 10M-row micro-benchmarks
+    python -m benchmarks.run --save-baseline        # record the current numbers as the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+from pathlib import Path
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+warnings.filterwarnings('ignore')
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import api_load, micro
+from benchmarks.datagen import parse_size
+from benchmarks.harness import run_isolated
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+BASELINE_PATH = RESULTS_DIR / 'baseline.json'
+LATEST_PATH = RESULTS_DIR / 'latest.json'
+
+# The API load tests send each batch as one request; beyond this they only measure JSON/CSV parsing
+MAX_API_ROWS = 1_000_000
+
+
+def _environment() -> dict:
+    import sklearn
+    import xgboost
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_suite(sizes, suites, concurrency: int) -> dict:
+    results = {}
+    for label in sizes:
+        n_rows = parse_size(label)
+        generators = []
+        if 'micro' in suites:
+            generators.append(micro.cases(n_rows))
+        if 'api' in suites and n_rows <= MAX_API_ROWS:
+            generators.append(api_load.cases(n_rows, concurrency=concurrency))
+        for generator in generators:
+            for name, fn, args in generator:
+                key = f'{name}@{label}'
+                print(f'  running {key} ...', flush=True)
+                results[key] = run_isolated(fn, *args)
+    return results
+
+
+def compare(latest: dict, baseline: dict, threshold: float) -> list:
+    """Print a p50 comparison table and return the keys that regressed by more than ``threshold``."""
+    regressions = []
+    rows = []
+    for key in sorted(set(latest) | set(baseline)):
+        new, old = latest.get(key), baseline.get(key)
+        if new is None or old is None:
+            rows.append((key, old and old['p50_ms'], new and new['p50_ms'], None, 'new' if old is None else 'missing'))
+            continue
+        ratio = new['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+        status = 'ok'
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            status = 'faster'
+        rows.append((key, old['p50_ms'], new['p50_ms'], ratio, status))
+
+    print(f"\n{'benchmark':<36} {'base p50 ms':>12} {'new p50 ms':>12} {'ratio':>7}  status")
+    for key, old, new, ratio, status in rows:
+        fmt = lambda v: f'{v:12.2f}' if v is not None else f"{'-':>12}"
+        ratio_text = f'{ratio:7.2f}' if ratio is not None else f"{'-':>7}"
+        print(f'{key:<36} {fmt(old)} {fmt(new)} {ratio_text}  {status}')
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"\n{'benchmark':<36} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rows/s':>14} {'peak RSS MB':>12}")
+    for key, r in results.items():
+        print(f"{key:<36} {r['p50_ms']:10.2f} {r['p95_ms']:10.2f} {r['p99_ms']:10.2f} "
+              f"{r['rows_per_sec']:14,.0f} {r['peak_rss_mb']:12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sales forecasting performance benchmarks")
+    parser.add_argument('--sizes', default='1k,100k', help="Comma-separated row counts (1k, 100k, 10m, ...)")
+    parser.add_argument('--suites', default='micro,api', help="Comma-separated suites to run: micro, api")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent in-flight API requests")
+    parser.add_argument('--output', default=str(LATEST_PATH), help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Also store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative p50 slowdown reported as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero when a regression is found")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(',') if s]
+    suites = {s.strip() for s in args.suites.split(',') if s.strip()}
+    print(f'Running {sorted(suites)} benchmarks at sizes {sizes}')
+    results = run_suite(sizes, suites, args.concurrency)
+    print_results(results)
+
+    report = {'environment': _environment(), 'results': results}
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f'\nResults written to {output}')
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f'Baseline written to {baseline_path}')
+        return 0
+    if not baseline_path.exists():
+        print(f'No baseline at {baseline_path}; run with --save-baseline to create one.')
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    regressions = compare(results, baseline.get('results', {}), args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {", ".join(regressions)}')
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
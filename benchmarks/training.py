@@ -0,0 +1,83 @@
+"""Peak memory and time of in-memory versus streaming (out-of-core) training.
+
+    python -m benchmarks.training                         # 1m rows, chunks of 100k
+    python -m benchmarks.training --rows 5m --chunk-rows 250k --external-memory
+
+A synthetic CSV is written to a temporary directory, then the linear and XGBoost models are trained
+from it once the way ``scripts/train.py`` does in memory and once with ``src.models.streaming``.
+Each mode runs in a forked process, so the peak RSS column is that mode's own. In-memory peak
+grows with the row count; streaming peak should stay roughly flat as rows are added (the
+quantized XGBoost matrix still grows by about one byte per feature per row unless it is paged to
+disk with ``--external-memory``).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from sklearn.model_selection import train_test_split
+
+from src.data.load_data import load_raw_data
+from src.features.preprocess import fit_codebook, preprocess_sales_data, scale_features
+from src.models.streaming import StreamingTrainer
+from src.models.train import train_linear_regression, train_xgboost
+
+from benchmarks.datagen import parse_size, write_sales_csv
+from benchmarks.harness import run_isolated
+
+
+def bench_in_memory(path) -> dict:
+    start = time.perf_counter()
+    df = load_raw_data(path)
+    df_proc = preprocess_sales_data(df, codebook=fit_codebook(df))
+    del df
+    X, y = df_proc.drop(columns='Weekly_Sales'), df_proc['Weekly_Sales']
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=1)
+    X_train_scaled, _ = scale_features(X_train)
+    train_linear_regression(X_train_scaled.values, y_train)
+    train_xgboost(X_train_scaled.values, y_train)
+    return {'train_s': time.perf_counter() - start}
+
+
+def bench_streaming(path, chunk_rows: int, external_memory: bool, cache_dir: str) -> dict:
+    start = time.perf_counter()
+    trainer = StreamingTrainer(path, chunk_rows=chunk_rows)
+    trainer.scan()
+    trainer.fit_scaler()
+    trainer.train_linear()
+    trainer.boost(trainer.quantile_dmatrix(external_memory, cache_dir=cache_dir))
+    return {'train_s': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-memory vs streaming training: time and peak memory")
+    parser.add_argument('--rows', default='1m', help="Rows in the synthetic training CSV (100k, 1m, ...)")
+    parser.add_argument('--chunk-rows', default='100k', help="Rows per chunk in streaming mode")
+    parser.add_argument('--external-memory', action='store_true', help="Also page the XGBoost matrix to disk")
+    parser.add_argument('--skip-in-memory', action='store_true', help="Only run the streaming mode (for sizes that do not fit)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    warnings.filterwarnings('ignore')
+    n_rows, chunk_rows = parse_size(args.rows), parse_size(args.chunk_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_sales_csv(os.path.join(tmp, 'train.csv'), n_rows)
+        print(f"{n_rows:,} rows ({os.path.getsize(path) / 1e6:.0f} MB CSV), streaming chunks of {chunk_rows:,} rows")
+        print(f"{'mode':<24} {'train s':>9} {'peak RSS MB':>12}")
+        cases = [] if args.skip_in_memory else [('in-memory', bench_in_memory, (path,))]
+        cases.append(('streaming', bench_streaming, (path, chunk_rows, False, tmp)))
+        if args.external_memory:
+            cases.append(('streaming + ext. memory', bench_streaming, (path, chunk_rows, True, tmp)))
+        for name, fn, fn_args in cases:
+            r = run_isolated(fn, *fn_args)
+            print(f"{name:<24} {r['train_s']:9.2f} {r['peak_rss_mb']:12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
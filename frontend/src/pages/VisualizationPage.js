@@ -56,12 +56,45 @@ const VisualizationPage = () => {
   const [visualizationData, setVisualizationData] = useState(null);
   const [storeOptions, setStoreOptions] = useState([]);
   const [selectedStore, setSelectedStore] = useState('all');
+  const [weeklyTrend, setWeeklyTrend] = useState(null);
 
   useEffect(() => {
     // Load the Walmart.csv file automatically
     loadWalmartData();
   }, []);
 
+  useEffect(() => {
+    // Abort the request of the previously selected store, so its response cannot land after ours
+    const controller = new AbortController();
+    loadWeeklyTrend(selectedStore, controller.signal);
+    return () => controller.abort();
+  }, [selectedStore]);
+
+  // Weekly sales from the API, aggregated and downsampled to about one point per pixel on the server.
+  // Falls back to the series sampled from the CSV when the API is not reachable.
+  const loadWeeklyTrend = async (store, signal) => {
+    const params = new URLSearchParams({ width: String(Math.min(window.innerWidth || 800, 2000)) });
+    if (store !== 'all') {
+      params.append('store', store);
+      params.append('total', 'false');
+    }
+    try {
+      const response = await fetch(`${API_URL}/api/charts/weekly_sales?${params}`, { signal });
+      if (!response.ok) {
+        throw new Error(`Chart request failed: ${response.status}`);
+      }
+      const chart = await response.json();
+      const series = chart.series[0];
+      setWeeklyTrend(series ? { dates: series.dates, sales: series.values } : null);
+    } catch (chartError) {
+      if (signal?.aborted) {
+        return;
+      }
+      console.warn("Falling back to the CSV sample for weekly sales trends:", chartError);
+      setWeeklyTrend(null);
+    }
+  };
+
   const loadWalmartData = async () => {
     setLoading(true);
     setError(null);
@@ -660,9 +693,10 @@ const VisualizationPage = () => {
   };
   
   const renderWeeklySalesTrends = () => {
-    if (!visualizationData || !visualizationData.weeklySalesTrends) return null;
+    const trend = weeklyTrend || visualizationData?.weeklySalesTrends;
+    if (!trend) return null;
     
-    const { dates, sales } = visualizationData.weeklySalesTrends;
+    const { dates, sales } = trend;
     
     const data = {
       labels: dates,
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+from src.models.bundle import build_bundle_from_files
+from src.utils.config import load_config
+from src.utils.logging import get_logger, configure_logging
+
+if __name__ == "__main__":
+    config = load_config()
+    configure_logging(config.get('logging'))
+    logger = get_logger("build_bundle")
+    models_dir = Path(config['model']['path']).parent
+    output = sys.argv[1] if len(sys.argv) > 1 else config['model'].get('bundle_path')
+    path = build_bundle_from_files(models_dir, output)
+    logger.info(f"Model bundle written to {path}")
@@ -1,20 +1,41 @@
+import argparse
+import sys
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from src.data.load_data import load_raw_data
-from src.features.preprocess import preprocess_sales_data, scale_features
+from src.features.preprocess import preprocess_sales_data, scale_features, fit_codebook
+from src.features.drift import build_reference
 from src.utils.config import load_config
-from src.utils.logging import get_logger
-from src.models.train import train_linear_regression, train_xgboost
-from sklearn.metrics import mean_squared_error, r2_score
+from src.utils.logging import get_logger, configure_logging
+from src.models.train import train_linear_regression, train_xgboost, train_xgboost_ensemble, evaluate_model
+from src.models.explain import global_importance, supports as supports_contributions
+from src.models.bundle import CODEBOOK_FILE, DRIFT_REFERENCE_FILE, MODEL_FILES, build_bundle_from_files
+from src.models.streaming import train_streaming
 import joblib
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the sales models and save them to the models directory")
+    parser.add_argument('--streaming', action='store_true', help="Train out of core, reading the CSV in chunks (see src/models/streaming.py)")
+    parser.add_argument('--chunk-rows', type=int, default=None, help="Rows per chunk in streaming mode (default: training.chunk_rows)")
+    args = parser.parse_args()
     config = load_config()
+    configure_logging(config.get('logging'))
     logger = get_logger("train")
+    models_dir = Path(config['model']['path']).parent
+
+    if args.streaming or config.get('training', {}).get('streaming', False):
+        # Peak memory is bounded by the chunk size instead of the dataset size
+        train_streaming(config['data']['path'], models_dir, config, chunk_rows=args.chunk_rows)
+        build_bundle_from_files(models_dir, config['model'].get('bundle_path'))
+        sys.exit(0)
+
     df = load_raw_data(config['data']['path'])
-    df_proc = preprocess_sales_data(df)
+    # Pin the category encoding seen in training so that later inputs are encoded the same way
+    codebook = fit_codebook(df)
+    df_proc = preprocess_sales_data(df, codebook=codebook)
 
     X = df_proc.drop('Weekly_Sales', axis=1)
     y = df_proc['Weekly_Sales']    # Get feature names after preprocessing and before scaling for saving with the model
@@ -24,31 +45,44 @@ if __name__ == "__main__":
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=1)
     
     # Data scaling - Note: X already has Weekly_Sales removed, so it won't be scaled
-    X_train_df = pd.DataFrame(X_train, columns=X.columns)
-    X_train_scaled_df, scaler = scale_features(X_train_df)
+    X_train_scaled_df, scaler = scale_features(X_train)
     X_train_scaled = X_train_scaled_df.values
     
     # Apply same scaling to test data using the fitted scaler
-    X_test_df = pd.DataFrame(X_test, columns=X.columns)
-    X_test_scaled_df, _ = scale_features(X_test_df, scaler)  # Use same scaler, ignore returned one
+    X_test_scaled_df, _ = scale_features(X_test, scaler)  # Use same scaler, ignore returned one
     X_test_scaled = X_test_scaled_df.values
 
-    models_dir = Path(config['model']['path']).parent
     models_dir.mkdir(exist_ok=True)
     
     # Save the scaler for prediction-time use
     scaler_path = models_dir / 'standard_scaler.pkl'
     joblib.dump(scaler, scaler_path)
     logger.info(f"StandardScaler saved to {scaler_path}")
+    joblib.dump(codebook, models_dir / CODEBOOK_FILE)
+    # Histograms of the training inputs that the API compares live traffic against
+    joblib.dump(build_reference(X_train, codebook, bins=config.get('drift', {}).get('bins', 20)),
+                models_dir / DRIFT_REFERENCE_FILE)
 
     logger.info("Training Linear Regression...")
     train_linear_regression(X_train_scaled, y_train, str(models_dir / 'linear_regression_model.pkl'), feature_names=feature_names)
     logger.info("Training XGBoost...")
     train_xgboost(X_train_scaled, y_train, str(models_dir / 'xgboost_model.pkl'), feature_names=feature_names)
+    ensemble_config = config.get('ensemble', {})
+    ensemble = None
+    if ensemble_config.get('enabled', False):
+        logger.info("Training XGBoost ensemble...")
+        ensemble = train_xgboost_ensemble(
+            X_train_scaled, y_train, str(models_dir / MODEL_FILES['ensemble']), feature_names=feature_names,
+            method=ensemble_config.get('method', 'bootstrap'),
+            members=ensemble_config.get('members', 16),
+            quantiles=ensemble_config.get('quantiles', [0.05, 0.5, 0.95]),
+            n_jobs=ensemble_config.get('n_jobs') or None,
+        )
     logger.info("Models trained and saved.")
 
-    # Automated evaluation (train/test RMSE)
-    for model_name_pkl in ['linear_regression_model.pkl', 'xgboost_model.pkl']:
+    # Automated evaluation (train/test metrics). The metrics and the global feature importance are
+    # stored with each model so the API can serve them without recomputing anything.
+    for model_name_pkl in ['linear_regression_model.pkl', 'xgboost_model.pkl', MODEL_FILES['ensemble']]:
         model_path = models_dir / model_name_pkl
         if not model_path.exists():
             logger.warning(f"Model file {model_path} not found for evaluation.")
@@ -61,11 +95,29 @@ if __name__ == "__main__":
             logger.error(f"Could not extract model from {model_path}")
             continue
 
+        model_metrics = {}
         for split, Xs, ys in [
             ("Train", X_train_scaled, y_train),
             ("Test", X_test_scaled, y_test)
         ]: 
-            preds = model.predict(Xs)
-            rmse = np.sqrt(mean_squared_error(ys, preds))
-            r2 = r2_score(ys, preds)
-            logger.info(f"{model_name_pkl} {split} RMSE: {rmse:.2f}")
\ No newline at end of file
+            split_metrics = evaluate_model(model, Xs, ys)
+            model_metrics.update({f"{split.lower()}_{name}": value for name, value in split_metrics.items()})
+            logger.info(f"{model_name_pkl} {split} RMSE: {split_metrics['rmse']:.2f} R2: {split_metrics['r2']:.4f}")
+        loaded_data['metrics'] = model_metrics
+        if supports_contributions(model):
+            loaded_data['importance'] = global_importance(model, X_train_scaled, feature_names)
+            logger.info(f"{model_name_pkl} global importance: {loaded_data['importance']}")
+        joblib.dump(loaded_data, model_path)
+
+    # Consolidate models and scaler into one mmap-able bundle for fast API start-up
+    build_bundle_from_files(models_dir, config['model'].get('bundle_path'))
+
+    # How often the test targets fall inside the ensemble's outermost trained interval
+    if ensemble is not None:
+        if ensemble.method == 'quantile':
+            low, high = float(ensemble.levels[0]), float(ensemble.levels[-1])
+        else:
+            low, high = 0.05, 0.95
+        bounds = ensemble.predict_quantiles(X_test_scaled, [low, high])
+        inside = (y_test.to_numpy() >= bounds[:, 0]) & (y_test.to_numpy() <= bounds[:, 1])
+        logger.info(f"Ensemble Test coverage of the {low:g}-{high:g} interval: {inside.mean():.1%} (nominal {high - low:.0%})")
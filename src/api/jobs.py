@@ -0,0 +1,420 @@
+"""Asynchronous batch scoring jobs backed by a local SQLite table.
+
+A submitted CSV is stored under ``jobs.directory`` and a ``queued`` row is inserted into the job
+table. The database runs in WAL mode, so status reads never wait for a worker's writes. Every API
+process runs ``jobs.workers`` background threads that claim queued jobs inside a write transaction,
+so each job goes to exactly one worker even when several pre-forked processes share the database.
+
+A worker reads the upload ``chunk_rows`` rows at a time, scores each chunk and appends the
+predictions to ``<id>.csv.part``, which becomes ``<id>.csv`` when the job succeeds. Each result
+line carries the input row number (0-based, header excluded) with its ``Store`` and ``Date``. Progress is
+committed after every chunk; that is also when cancellation and shutdown are noticed. An attempt
+that fails unexpectedly is requeued until ``max_attempts`` is reached (invalid input and other
+deterministic errors fail at once),
+and a running job whose heartbeat stops for ``stale_after`` seconds (its process died) is requeued
+by the next worker that looks for work. The heartbeat is refreshed while a chunk is being scored, so a
+chunk that takes longer than ``stale_after`` is not mistaken for a dead worker.
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from fastapi import HTTPException
+
+try:
+    from ..data.schema import iter_sales_csv
+    from ..utils import metrics
+except ImportError:  # imported as top-level ``api`` package by the API
+    from data.schema import iter_sales_csv
+    from utils import metrics
+
+logger = logging.getLogger("jobs")
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+JOB_STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model TEXT NOT NULL,
+    quantiles TEXT,
+    filename TEXT,
+    rows_total INTEGER,
+    rows_read INTEGER NOT NULL DEFAULT 0,
+    rows_scored INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """The job was cancelled while it was running."""
+
+
+class WorkerStopping(Exception):
+    """The worker is shutting down; the job goes back to the queue without using up an attempt."""
+
+
+def _count_rows(path) -> int:
+    """Number of data rows in the CSV at ``path``, header excluded.
+
+    Counted with the csv module, so quoted fields spanning several lines count once and blank lines
+    (which pandas skips) not at all.
+    """
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)
+
+
+class JobQueue:
+    """The job table, the uploaded and result files, and this process's worker threads.
+
+    ``score(df, model, quantiles)`` scores one chunk of raw rows and returns ``(predictions,
+    {level: values}, rows)`` (``None`` instead of the dict without quantiles), where ``rows`` are
+    the ``df`` index labels of the scored rows, or ``None`` when preprocessing leaves no rows.
+    It raises ``ValueError`` or ``HTTPException`` for errors that a retry cannot fix.
+    """
+
+    def __init__(self, directory, score, workers: int = 1, chunk_rows: int = 100_000,
+                 max_attempts: int = 3, stale_after: float = 300, poll_interval: float = 1.0,
+                 retention_hours: float = 168):
+        self.directory = Path(directory)
+        self.db_path = self.directory / 'jobs.db'
+        self.score = score
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.retention_hours = retention_hours
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._last_purge = 0.0
+        for sub in ('uploads', 'results'):
+            (self.directory / sub).mkdir(parents=True, exist_ok=True)
+        with self._db() as conn:
+            # WAL is a property of the database file, so setting it once covers every connection
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    # Storage -----------------------------------------------------------------------
+
+    @contextmanager
+    def _db(self, write: bool = False):
+        """A short-lived connection (they cannot cross threads or forks); ``write`` wraps it in
+        a ``BEGIN IMMEDIATE`` transaction so concurrent claims are serialised."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if write:
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _path(self, job_id: str, kind: str) -> Path:
+        # IDs are generated hex strings; refuse anything that could escape the directory
+        if not job_id.isalnum():
+            raise KeyError(job_id)
+        if kind == 'upload':
+            return self.directory / 'uploads' / f"{job_id}.csv"
+        return self.directory / 'results' / (f"{job_id}.csv.part" if kind == 'partial' else f"{job_id}.csv")
+
+    def result_path(self, job_id: str) -> Path:
+        return self._path(job_id, 'result')
+
+    # Public API ----------------------------------------------------------------------
+
+    def submit(self, fileobj, filename: str, model: str, quantiles=None) -> dict:
+        """Store an uploaded CSV and queue it for scoring; ``ValueError`` if it has no data rows."""
+        job_id = uuid.uuid4().hex
+        upload = self._path(job_id, 'upload')
+        with open(upload, 'wb') as out:
+            shutil.copyfileobj(fileobj, out, 1 << 20)
+        rows = _count_rows(upload)
+        if rows == 0:
+            upload.unlink()
+            raise ValueError("CSV file is empty or contains no data rows.")
+        with self._db(write=True) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, model, quantiles, filename, rows_total, max_attempts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, model, json.dumps(list(quantiles)) if quantiles else None, filename,
+                 rows, self.max_attempts, time.time()))
+        self._wakeup.set()
+        logger.info("Queued job %s (%s, %d rows, model %s)", job_id, filename, rows, model)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict:
+        with self._db() as conn:
+            return self._fetch(conn, job_id)
+
+    def list(self, status: str = None, limit: int = 50) -> list:
+        """Most recent jobs first, optionally only those with ``status``."""
+        query, params = "SELECT * FROM jobs", ()
+        if status:
+            query, params = query + " WHERE status = ?", (status,)
+        with self._db() as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    def counts(self) -> dict:
+        """Number of jobs in each status."""
+        with self._db() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def cancel(self, job_id: str) -> dict:
+        """Cancel a queued job at once, or ask the worker running it to stop after its current chunk.
+
+        Raises ``ValueError`` when the job has already finished.
+        """
+        with self._db(write=True) as conn:
+            job = self._fetch(conn, job_id)
+            if job['status'] in FINISHED:
+                raise ValueError(f"Job {job_id} has already {job['status']}")
+            if job['status'] == QUEUED:
+                conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (CANCELLED, time.time(), job_id))
+            else:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        if job['status'] == QUEUED:
+            metrics.JOBS_FINISHED.inc(status=CANCELLED)
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> dict:
+        """Queue a failed or cancelled job again with a fresh set of attempts."""
+        with self._db(write=True) as conn:
+            job = self._fetch(conn, job_id)
+            if job['status'] not in (FAILED, CANCELLED):
+                raise ValueError(f"Only failed or cancelled jobs can be retried; job {job_id} is {job['status']}")
+            if not self._path(job_id, 'upload').exists():
+                raise ValueError(f"The upload of job {job_id} has been removed")
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, cancel_requested = 0, error = NULL, worker = NULL, "
+                "rows_read = 0, rows_scored = 0, started_at = NULL, finished_at = NULL WHERE id = ?",
+                (QUEUED, job_id))
+        self._wakeup.set()
+        return self.get(job_id)
+
+    # Workers -----------------------------------------------------------------------------
+
+    def start(self):
+        """Start this process's worker threads (call after forking)."""
+        if self._threads or self.workers <= 0:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %d job worker(s) on %s", self.workers, self.db_path)
+
+    def stop(self, timeout: float = 30):
+        """Stop the workers; a job in progress is requeued after its current chunk."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+                if job is None:
+                    self._purge()
+            except sqlite3.Error as e:
+                logger.error("Job table error: %s", e)
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _claim(self):
+        """Requeue jobs whose worker went silent, then take the oldest queued job."""
+        now = time.time()
+        worker = f"{os.getpid()}/{threading.current_thread().name}"
+        with self._db(write=True) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+                "error = 'Worker stopped responding', worker = NULL, "
+                "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, FAILED, now, RUNNING, now - self.stale_after))
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ?, heartbeat_at = ?, "
+                "rows_read = 0, rows_scored = 0 WHERE id = ?",
+                (RUNNING, worker, now, now, row['id']))
+        job = self._as_dict(row)
+        job['attempts'] += 1
+        return job
+
+    def _progress(self, job_id: str, rows_read: int, rows_scored: int):
+        """Record progress and raise if the job was cancelled or the worker is stopping."""
+        with self._db(write=True) as conn:
+            conn.execute("UPDATE jobs SET rows_read = ?, rows_scored = ?, heartbeat_at = ? WHERE id = ?",
+                         (rows_read, rows_scored, time.time(), job_id))
+            cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if cancelled:
+            raise JobCancelled(job_id)
+        if self._stop.is_set():
+            raise WorkerStopping(job_id)
+
+    @contextmanager
+    def _heartbeat(self, job_id: str):
+        """Refresh ``heartbeat_at`` every ``stale_after / 3`` seconds until the block exits."""
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.stale_after / 3):
+                try:
+                    with self._db(write=True) as conn:
+                        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?",
+                                     (time.time(), job_id, RUNNING))
+                except sqlite3.Error as e:
+                    logger.warning("Heartbeat of job %s failed: %s", job_id, e)
+
+        thread = threading.Thread(target=beat, name=f"{threading.current_thread().name}-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _score_file(self, job: dict):
+        """Score the upload chunk by chunk into the partial result file."""
+        quantiles = job['quantiles']
+        quantile_columns = [f"quantile_{level:g}" for level in quantiles or ()]
+        columns = ['row', 'Store', 'Date', 'prediction'] + quantile_columns
+        rows_read = rows_scored = 0
+        with open(self._path(job['id'], 'partial'), 'w', newline='') as out:
+            out.write(','.join(columns) + '\n')
+            for chunk in iter_sales_csv(self._path(job['id'], 'upload'), self.chunk_rows):
+                scored = self.score(chunk, job['model'], quantiles)
+                rows_read += len(chunk)
+                metrics.JOB_ROWS.inc(len(chunk), model=job['model'])
+                if scored is not None:
+                    preds, quantile_values, rows = scored
+                    # Chunks keep the reader's running index, i.e. the row number in the file
+                    source = chunk.reindex(index=rows, columns=['Store', 'Date'])
+                    result = {'row': rows, 'Store': source['Store'].to_numpy(), 'Date': source['Date'].to_numpy(),
+                              'prediction': preds}
+                    for level, column in zip(quantiles or (), quantile_columns):
+                        result[column] = quantile_values[f"{level:g}"]
+                    pd.DataFrame(result).to_csv(out, header=False, index=False)
+                    rows_scored += len(preds)
+                self._progress(job['id'], rows_read, rows_scored)
+        return rows_read, rows_scored
+
+    def _run(self, job: dict):
+        job_id = job['id']
+        started = time.perf_counter()
+        partial = self._path(job_id, 'partial')
+        try:
+            with self._heartbeat(job_id):
+                rows_read, rows_scored = self._score_file(job)
+        except WorkerStopping:
+            partial.unlink(missing_ok=True)
+            self._update(job_id, status=QUEUED, attempts=job['attempts'] - 1, worker=None)
+            logger.info("Job %s requeued: worker stopping", job_id)
+            return
+        except JobCancelled:
+            partial.unlink(missing_ok=True)
+            self._finish(job_id, CANCELLED)
+            logger.info("Job %s cancelled", job_id)
+            return
+        except Exception as e:
+            partial.unlink(missing_ok=True)
+            error = f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"
+            # Invalid input (and the API's own 4xx/5xx decisions) fails the same way on every attempt
+            if isinstance(e, (ValueError, HTTPException)) or job['attempts'] >= job['max_attempts']:
+                self._finish(job_id, FAILED, error)
+                logger.error("Job %s failed after %d attempt(s): %s", job_id, job['attempts'], error)
+            else:
+                self._update(job_id, status=QUEUED, error=error, worker=None)
+                metrics.JOBS_FINISHED.inc(status='retried')
+                logger.warning("Job %s attempt %d failed, requeued: %s", job_id, job['attempts'], error)
+            return
+        os.replace(partial, self.result_path(job_id))
+        self._finish(job_id, SUCCEEDED)
+        logger.info("Job %s succeeded: %d rows read, %d scored in %.1fs", job_id, rows_read, rows_scored,
+                    time.perf_counter() - started)
+
+    def _update(self, job_id: str, **values):
+        assignments = ', '.join(f"{column} = ?" for column in values)
+        with self._db(write=True) as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", tuple(values.values()) + (job_id,))
+
+    def _finish(self, job_id: str, status: str, error: str = None):
+        self._update(job_id, status=status, error=error, finished_at=time.time())
+        metrics.JOBS_FINISHED.inc(status=status)
+
+    def _purge(self):
+        """Delete finished jobs (and their files) older than ``retention_hours``, at most once a minute."""
+        now = time.time()
+        if not self.retention_hours or now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        cutoff = now - self.retention_hours * 3600
+        with self._db(write=True) as conn:
+            placeholders = ', '.join('?' * len(FINISHED))
+            rows = conn.execute(f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                                FINISHED + (cutoff,)).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row[0],) for row in rows])
+        for (job_id,) in rows:
+            for kind in ('upload', 'partial', 'result'):
+                self._path(job_id, kind).unlink(missing_ok=True)
+        if rows:
+            logger.info("Removed %d finished job(s) older than %g hours", len(rows), self.retention_hours)
+
+    # Helpers -----------------------------------------------------------------------
+
+    def _fetch(self, conn, job_id: str) -> dict:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return self._as_dict(row)
+
+    @staticmethod
+    def _as_dict(row) -> dict:
+        job = dict(row)
+        job['quantiles'] = json.loads(job['quantiles']) if job['quantiles'] else None
+        return job
@@ -1,22 +1,49 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Form
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, PlainTextResponse, JSONResponse, FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
 import pandas as pd
+import datetime
+import inspect
 import io
 import os
 import sys
-import joblib # Added for loading scikit-learn models
 import numpy as np
-from typing import Optional
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 # Fix import paths when running from src directory
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from features.preprocess import preprocess_sales_data, scale_features
+from features.preprocess import preprocess_sales_data, scale_features, fit_codebook
+from features.drift import DriftMonitor
+from features.scenario import SWEEPABLE_PARAMETERS, ScenarioGrid, grid_values, score_grid, summarize_grid
+from data.schema import read_sales_csv
+from data.load_data import load_raw_data
+from data.prediction_store import GROUP_BY, PredictionStore
+from data.chart_series import WeeklySeries
 # train.py contains load_model, predict
 from models.train import load_model as load_specific_model, predict 
-from api.schemas import PredictRequest, PredictResponse, ModelResponse, HealthResponse, VisualizeResponse, DataStats, VisualizationData, StorePerformance, TimeTrend, DepartmentSales # VisualizeResponse and others might be removed if not used by these simplified endpoints
+from models.explain import feature_contributions, group_contributions, supports as supports_contributions
+from models.ensemble import check_quantiles
+from models.bundle import BUNDLE_FILENAME, EXTRA_FILES, MODEL_FILES, compute_model_version, load_artifact, load_bundle
+from api.jobs import JOB_STATUSES, SUCCEEDED, JobQueue
+from api.schemas import PredictRequest, PredictResponse, ExplainRequest, ExplainResponse, DriftResponse, JobResponse, JobListResponse, StoredPredictionsResponse, PredictionSummaryResponse, ChartSeriesResponse, ScenarioRequest, ScenarioResponse, ModelResponse, HealthResponse, ReadyResponse, VisualizeResponse, DataStats, VisualizationData, StorePerformance, TimeTrend, DepartmentSales # VisualizeResponse and others might be removed if not used by these simplified endpoints
 from utils.config import load_config
-from utils.logging import get_logger
+from utils.logging import get_logger, configure_logging, new_request_id, request_id_var
+from utils import metrics
+from utils.metrics import timed
+from utils.cache import LRUCache, row_keys
+from utils.profiling import RequestProfiler, ProfileStore, profiled_call
+
+_MODULE_IMPORTED = time.perf_counter()
 
 app = FastAPI(
     title="Sales Forecasting API",
@@ -33,95 +60,587 @@ app.add_middleware(
     allow_headers=["*"],
 )
 config = load_config()
+configure_logging(config.get('logging'))
 logger = get_logger("api")
+metrics.set_enabled(config.get('metrics', {}).get('enabled', True))
+
+
+profiling_config = config.get('profiling', {})
+scenario_config = config.get('scenario', {})
+explain_config = config.get('explain', {})
+drift_config = config.get('drift', {})
+jobs_config = config.get('jobs', {})
+predictions_config = config.get('predictions', {})
+charts_config = config.get('charts', {})
+# Contributions per distinct feature row, keyed by model and version so a reload never serves stale ones
+explanation_cache = LRUCache("explain", maxsize=explain_config.get('cache_size', 50_000))
+# Model output per distinct scaled feature row, keyed by model and version like the explanations
+prediction_cache = LRUCache("predict", maxsize=config['model'].get('prediction_cache_size', 100_000))
+memoized_models = set(config['model'].get('prediction_cache_models', ['xgboost', 'ensemble']))
+# Downsampled chart payloads per query, cleared whenever the weekly series are rebuilt
+chart_cache = LRUCache("chart", maxsize=charts_config.get('cache_size', 256))
+profile_store = ProfileStore(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), profiling_config.get('output_dir', 'profiles')),
+    max_profiles=profiling_config.get('max_profiles', 100)
+)
+
+
+def _requested_profile_mode(request: Request) -> Optional[str]:
+    """Return the profiling mode asked for via the X-Profile header or ?profile= query parameter."""
+    value = request.headers.get("X-Profile") or request.query_params.get("profile")
+    if not value:
+        return None
+    value = value.lower()
+    if value in ("sample", "cprofile"):
+        return value
+    return profiling_config.get('mode', 'sample') if value in ("1", "true", "yes") else None
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Run a request under the profiler when asked for (or sampled), guarded by profiling.enabled."""
+    if not profiling_config.get('enabled', False):
+        return await call_next(request)
+    mode = _requested_profile_mode(request)
+    memory = profiling_config.get('memory', True)
+    if mode is None:
+        sample_rate = profiling_config.get('sample_rate', 0.0)
+        if not sample_rate or random.random() >= sample_rate:
+            return await call_next(request)
+        # Continuous profiling: sampled requests skip tracemalloc unless configured otherwise
+        mode = profiling_config.get('mode', 'sample')
+        memory = profiling_config.get('continuous_memory', False)
+
+    profiler = RequestProfiler(
+        mode=mode,
+        interval=profiling_config.get('interval_ms', 5) / 1000.0,
+        memory=memory,
+        top_n=profiling_config.get('top_allocators', 15),
+    )
+    with profiler:
+        response = await call_next(request)
+    profile_id = profile_store.save(profiler.result, meta={
+        "path": request.url.path,
+        "method": request.method,
+        "status": response.status_code,
+        "request_id": request_id_var.get(),
+        "timestamp": time.time(),
+    })
+    logger.info("Stored %s profile %s for %s %s", mode, profile_id, request.method, request.url.path)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Propagate (or create) a correlation ID so every log line of a request can be joined."""
+    request_id = request.headers.get("X-Request-ID") or new_request_id()
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        request_id_var.reset(token)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and record end-to-end latency per route template."""
+    if not metrics.is_enabled():
+        return await call_next(request)
+    start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        # Use the route template (not the raw URL) to keep label cardinality bounded
+        path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUESTS.inc(method=request.method, path=path, status=str(status))
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, path=path)
 
 # Define paths for both models
 LINEAR_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'linear_regression_model.pkl')
 XGBOOST_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'xgboost_model.pkl')
+ENSEMBLE_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', MODEL_FILES['ensemble'])
 SCALER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'standard_scaler.pkl')
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BUNDLE_PATH = os.path.join(PROJECT_ROOT, config['model'].get('bundle_path', os.path.join('src', 'models', BUNDLE_FILENAME)))
 
 available_models = {}
 loaded_scaler = None
+loaded_codebook = None  # category -> code mapping from training (see features.preprocess.fit_codebook)
+drift_monitor = None  # live input histograms vs. the training reference (see features.drift)
+job_queue = None  # asynchronous batch scoring jobs (see api.jobs), created at start-up
+prediction_store = None  # served forecasts by store, date and model version (see data.prediction_store)
+prediction_writer = None  # single thread that writes to the prediction store off the request path
+chart_series = None  # weekly sales per store of the training data (see data.chart_series)
+chart_series_mtime = None  # modification time of the CSV chart_series was built from
+chart_series_lock = threading.Lock()
+model_version = None
+startup_report = {}
+is_ready = False
 
-@app.on_event("startup")
-def load_trained_models():
-    global available_models, loaded_scaler
-    logger.info("Attempting to load trained models and scaler...")
-    model_paths = {"linear": LINEAR_MODEL_PATH, "xgboost": XGBOOST_MODEL_PATH}
+def _warmup_frame() -> pd.DataFrame:
+    """Rows pushed through the full scoring path before the worker reports ready.
+
+    They cover enough stores, months, years and holiday flags for the binary encoding
+    to produce every feature column the models expect.
+    """
+    n_rows = 36
+    dates = pd.date_range('2010-02-05', periods=n_rows, freq='4W-FRI')
+    return pd.DataFrame({
+        'Store': np.arange(n_rows) % 45 + 1,
+        'Date': dates.strftime('%d-%m-%Y'),
+        'Weekly_Sales': np.linspace(5e5, 2e6, n_rows),
+        'Holiday_Flag': np.arange(n_rows) % 2,
+        'Temperature': np.linspace(30.0, 90.0, n_rows),
+        'Fuel_Price': np.linspace(2.5, 4.2, n_rows),
+        'CPI': np.linspace(130.0, 225.0, n_rows),
+        'Unemployment': np.linspace(5.0, 10.0, n_rows),
+    })
+
+
+def _check_scaler(scaler):
+    # Validate scaler by checking its parameters
+    if hasattr(scaler, 'n_features_in_'):
+        logger.info(f"Loaded scaler was trained on {scaler.n_features_in_} features")
+        if hasattr(scaler, 'feature_names_in_'):
+            logger.info(f"Scaler feature names: {scaler.feature_names_in_.tolist()}")
+            # Check if Weekly_Sales is in the scaler's features - it shouldn't be
+            if 'Weekly_Sales' in scaler.feature_names_in_:
+                logger.warning("Warning: Scaler includes 'Weekly_Sales' which should be excluded from scaling")
+    else:
+        logger.warning("Loaded scaler doesn't have n_features_in_ attribute, might be an older version")
+
+
+def _load_scaler_file():
     try:
         if os.path.exists(SCALER_PATH):
-            loaded_scaler = joblib.load(SCALER_PATH)
+            scaler = load_artifact(SCALER_PATH)
             logger.info(f"StandardScaler loaded from {SCALER_PATH}")
-            
-            # Validate scaler by checking its parameters
-            if hasattr(loaded_scaler, 'n_features_in_'):
-                logger.info(f"Loaded scaler was trained on {loaded_scaler.n_features_in_} features")
-                if hasattr(loaded_scaler, 'feature_names_in_'):
-                    logger.info(f"Scaler feature names: {loaded_scaler.feature_names_in_.tolist()}")
-                    # Check if Weekly_Sales is in the scaler's features - it shouldn't be
-                    if 'Weekly_Sales' in loaded_scaler.feature_names_in_:
-                        logger.warning("Warning: Scaler includes 'Weekly_Sales' which should be excluded from scaling")
-            else:
-                logger.warning("Loaded scaler doesn't have n_features_in_ attribute, might be an older version")
-        else:
-            logger.warning(f"Scaler file not found at {SCALER_PATH}. Using fit_transform will be required for predictions.")
-            loaded_scaler = None
+            return scaler
+        logger.warning(f"Scaler file not found at {SCALER_PATH}. Using fit_transform will be required for predictions.")
     except Exception as e:
         logger.error(f"Failed to load scaler from {SCALER_PATH}: {e}", exc_info=True)
-        loaded_scaler = None
+    return None
+
 
-    for model_name, model_path in model_paths.items():
+def _load_extra_file(key: str):
+    """Load one of the non-model artifacts (``EXTRA_FILES``: codebook, drift reference) if present."""
+    path = os.path.join(MODELS_DIR, EXTRA_FILES[key])
+    try:
+        if os.path.exists(path):
+            return load_artifact(path)
+    except Exception as e:
+        logger.error(f"Failed to load {key} from {path}: {e}", exc_info=True)
+    return None
+
+
+def _codebook_from_training_data():
+    """Rebuild the category codebook from the training CSV for artifacts saved without one."""
+    data_path = os.path.join(PROJECT_ROOT, config['data']['path'])
+    if not os.path.exists(data_path):
+        logger.warning("No category codebook and no training data at %s; categories will be encoded per request.", data_path)
+        return None
+    logger.warning("Model artifacts have no category codebook, rebuilding it from %s", data_path)
+    return fit_codebook(load_raw_data(data_path))
+
+
+def _normalize_model_data(model_name: str, loaded_data, model_path: str) -> dict:
+    if isinstance(loaded_data, dict) and 'model' in loaded_data and 'feature_names' in loaded_data:
+        logger.info(f"{model_name.capitalize()} model loaded from {model_path} with features: {loaded_data['feature_names']}")
+        return loaded_data
+    # Fallback for old model format or if something went wrong during saving
+    logger.warning(f"{model_name.capitalize()} model at {model_path} is not in the expected dictionary format (with 'model' and 'feature_names').")
+    # Attempt to load as a raw model object and extract features if possible (old way)
+    raw_model_obj = loaded_data
+    feature_names_old = None
+    if model_name == "linear":
+        if hasattr(raw_model_obj, 'feature_names_in_'):
+            feature_names_old = raw_model_obj.feature_names_in_.tolist()
+    elif model_name == "xgboost":
+        if hasattr(raw_model_obj, 'get_booster') and hasattr(raw_model_obj.get_booster(), 'feature_names'):
+            feature_names_old = raw_model_obj.get_booster().feature_names
+        elif hasattr(raw_model_obj, 'feature_names_in_'): # Scikit-learn wrapper
+            feature_names_old = raw_model_obj.feature_names_in_.tolist()
+
+    if feature_names_old:
+        logger.info(f"Loaded old format {model_name.capitalize()} model. Extracted feature names: {feature_names_old}")
+    else:
+        logger.warning(f"Loaded old format {model_name.capitalize()} model, but could not extract feature names. Ensure preprocess_sales_data aligns columns correctly or retrain model to include feature names.")
+    return {"model": raw_model_obj, "feature_names": feature_names_old}
+
+
+def _load_model_file(model_name: str, model_path: str) -> Optional[dict]:
+    try:
+        if os.path.exists(model_path):
+            loaded_data = load_specific_model(model_path)  # joblib.load, mapping src.models.* to models.*
+            return _normalize_model_data(model_name, loaded_data, model_path)
+        logger.warning(f"{model_name.capitalize()} model file not found at {model_path}.")
+    except Exception as e:
+        logger.error(f"Failed to load {model_name} model from {model_path}: {e}", exc_info=True)
+    return None
+
+
+def _load_from_bundle():
+    """Load every model and the scaler from the consolidated bundle, memory-mapping its arrays."""
+    bundle = load_bundle(BUNDLE_PATH, mmap_mode=config['model'].get('mmap_mode', 'r'))
+    models = {name: _normalize_model_data(name, data, BUNDLE_PATH) for name, data in bundle['models'].items()}
+    for name in ("linear", "xgboost", "ensemble"):
+        if name not in models:
+            logger.warning(f"{name.capitalize()} model not present in bundle {BUNDLE_PATH}.")
+            models[name] = None
+    logger.info(f"Models and scaler loaded from bundle {BUNDLE_PATH} (version {bundle['model_version']})")
+    return models, bundle['scaler'], {key: bundle.get(key) for key in EXTRA_FILES}, bundle['model_version']
+
+
+def _load_from_files(parallel: bool = True):
+    """Load the scaler, the extra artifacts and each model from their own files, concurrently when ``parallel``."""
+    model_paths = {"linear": LINEAR_MODEL_PATH, "xgboost": XGBOOST_MODEL_PATH, "ensemble": ENSEMBLE_MODEL_PATH}
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(model_paths) + 1, thread_name_prefix="model-loader") as pool:
+            scaler_future = pool.submit(_load_scaler_file)
+            model_futures = {name: pool.submit(_load_model_file, name, path) for name, path in model_paths.items()}
+            models = {name: future.result() for name, future in model_futures.items()}
+            scaler = scaler_future.result()
+    else:
+        scaler = _load_scaler_file()
+        models = {name: _load_model_file(name, path) for name, path in model_paths.items()}
+    extras = {key: _load_extra_file(key) for key in EXTRA_FILES}
+    version = compute_model_version({name: data for name, data in models.items() if data is not None}, scaler)
+    return models, scaler, extras, version
+
+
+def _warm_up():
+    """Score a few rows with every loaded model so lazy imports and first-call caches are primed."""
+    warmup_df = _warmup_frame()
+    for model_name, model_data in available_models.items():
+        if model_data is None:
+            continue
         try:
-            if os.path.exists(model_path):
-                loaded_data = load_specific_model(model_path)  # load_specific_model is joblib.load
-
-                if isinstance(loaded_data, dict) and 'model' in loaded_data and 'feature_names' in loaded_data:
-                    available_models[model_name] = loaded_data
-                    logger.info(f"{model_name.capitalize()} model loaded from {model_path} with features: {loaded_data['feature_names']}")
-                else:
-                    # Fallback for old model format or if something went wrong during saving
-                    logger.warning(f"{model_name.capitalize()} model at {model_path} is not in the expected dictionary format (with 'model' and 'feature_names').")
-                    # Attempt to load as a raw model object and extract features if possible (old way)
-                    raw_model_obj = loaded_data 
-                    feature_names_old = None
-                    if model_name == "linear":
-                        if hasattr(raw_model_obj, 'feature_names_in_'):
-                            feature_names_old = raw_model_obj.feature_names_in_.tolist()
-                    elif model_name == "xgboost":
-                        if hasattr(raw_model_obj, 'get_booster') and hasattr(raw_model_obj.get_booster(), 'feature_names'):
-                            feature_names_old = raw_model_obj.get_booster().feature_names
-                        elif hasattr(raw_model_obj, 'feature_names_in_'): # Scikit-learn wrapper
-                            feature_names_old = raw_model_obj.feature_names_in_.tolist()
-                    
-                    available_models[model_name] = {"model": raw_model_obj, "feature_names": feature_names_old}
-                    if feature_names_old:
-                        logger.info(f"Loaded old format {model_name.capitalize()} model. Extracted feature names: {feature_names_old}")
-                    else:
-                        logger.warning(f"Loaded old format {model_name.capitalize()} model, but could not extract feature names. Ensure preprocess_sales_data aligns columns correctly or retrain model to include feature names.")
-            else:
-                logger.warning(f"{model_name.capitalize()} model file not found at {model_path}.")
-                available_models[model_name] = None
+            _score_dataframe(warmup_df, model_name, model_data, memoize=False)
         except Exception as e:
-            logger.error(f"Failed to load {model_name} model from {model_path}: {e}", exc_info=True)
-            available_models[model_name] = None
+            logger.warning(f"Warm-up inference failed for {model_name} model: {e}")
+
+
+def load_trained_models():
+    global available_models, loaded_scaler, loaded_codebook, drift_monitor, model_version, startup_report, is_ready
+    is_ready = False
+    report = {}
+    started = time.perf_counter()
+    report['import_s'] = round(_MODULE_IMPORTED - _IMPORT_STARTED, 3)
+    logger.info("Attempting to load trained models and scaler...")
+
+    models = None
+    if os.path.exists(BUNDLE_PATH):
+        try:
+            models, scaler, extras, version = _load_from_bundle()
+            report['source'] = 'bundle'
+        except Exception as e:
+            logger.error(f"Failed to load model bundle from {BUNDLE_PATH}: {e}. Falling back to individual files.", exc_info=True)
+    if models is None:
+        models, scaler, extras, version = _load_from_files(parallel=config['model'].get('parallel_load', True))
+        report['source'] = 'files'
+    report['load_s'] = round(time.perf_counter() - started, 3)
+
+    available_models = models
+    loaded_scaler = scaler
+    explanation_cache.clear()
+    prediction_cache.clear()
+    loaded_codebook = extras.get('codebook')
+    if loaded_codebook is None:
+        loaded_codebook = _codebook_from_training_data()
+    drift_monitor = None
+    model_version = version
+    if loaded_scaler is not None:
+        _check_scaler(loaded_scaler)
 
     if not any(m is not None for m in available_models.values()):
         logger.error("No models could be loaded. Prediction and relevant endpoints might not work.")
+    elif available_models.get("ensemble") is None and config.get('ensemble', {}).get('enabled', False):
+        logger.error("Ensemble model could not be loaded although ensemble.enabled is set; every request for "
+                     "prediction quantiles and the 'ensemble' model will fail with 503 until it is retrained.")
     logger.info(f"Available models after startup: {list(available_models.keys())}")
 
+    if config['model'].get('warmup', True):
+        warmup_started = time.perf_counter()
+        _warm_up()
+        report['warmup_s'] = round(time.perf_counter() - warmup_started, 3)
+
+    # Created after the warm-up so that its synthetic rows are not counted as traffic
+    if drift_config.get('enabled', True):
+        if extras.get('drift_reference'):
+            drift_monitor = DriftMonitor(extras['drift_reference'],
+                                         psi_thresholds=drift_config.get('psi_thresholds', (0.1, 0.25)),
+                                         min_rows=drift_config.get('min_rows', 100))
+        else:
+            logger.warning("No drift reference histograms in the model artifacts; input drift is not monitored. Retrain to create them.")
+
+    report['startup_s'] = round(time.perf_counter() - started, 3)
+    report['model_version'] = model_version
+    startup_report = report
+    is_ready = any(m is not None for m in available_models.values())
+    logger.info("Startup report: %s", report, extra={"startup": report})
+
+# Set by the pre-fork server (src/api/serve.py) when the models were loaded once in the parent process
+models_preloaded = False
+
+@app.on_event("startup")
+def on_startup():
+    if models_preloaded:
+        logger.info("Using models preloaded by the parent process (version %s)", model_version)
+    else:
+        load_trained_models()
+    _open_prediction_store()
+    _start_job_workers()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if job_queue is not None:
+        job_queue.stop(timeout=jobs_config.get('stop_timeout', 30))
+    if prediction_writer is not None:
+        prediction_writer.shutdown(wait=True)
+
+
+def _open_prediction_store():
+    """Open the prediction store and its writer thread (in each pre-forked worker)."""
+    global prediction_store, prediction_writer
+    if not predictions_config.get('enabled', True) or prediction_store is not None:
+        return
+    try:
+        prediction_store = PredictionStore(os.path.join(PROJECT_ROOT, predictions_config.get('path', os.path.join('predictions', 'predictions.db'))))
+    except Exception as e:
+        logger.error(f"Could not open the prediction store: {e}. Forecasts will not be stored.", exc_info=True)
+        return
+    prediction_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prediction-store")
+
+
+def _start_job_workers():
+    """Open the job table and start this process's job workers (in each pre-forked worker)."""
+    global job_queue
+    if not jobs_config.get('enabled', True) or job_queue is not None:
+        return
+    job_queue = JobQueue(
+        os.path.join(PROJECT_ROOT, jobs_config.get('directory', 'jobs')),
+        score=_score_job_chunk,
+        workers=jobs_config.get('workers', 1),
+        chunk_rows=jobs_config.get('chunk_rows', 100_000),
+        max_attempts=jobs_config.get('max_attempts', 3),
+        stale_after=jobs_config.get('stale_after', 300),
+        poll_interval=jobs_config.get('poll_interval', 1.0),
+        retention_hours=jobs_config.get('retention_hours', 168),
+    )
+    job_queue.start()
+
 # Removed old /predict endpoint
 # @app.post("/predict", response_model=PredictResponse)
 # def predict_sales_endpoint(request: PredictRequest):
 #    ... (old implementation)
 
+# Core scoring path shared by the prediction endpoints and start-up warm-up
+def _prepare_features(input_df: pd.DataFrame, model_name: str, selected_model_data: dict, drop_rows: bool = True,
+                      observe_drift: bool = False) -> Optional[tuple]:
+    """
+    Preprocess, scale and align ``input_df`` into the feature matrix the model expects.
+    Returns ``(X, rows)``, where ``rows`` holds the ``input_df`` index label of each row of ``X``
+    (preprocessing drops duplicates and outliers), or None when no rows are left to predict on.
+    ``observe_drift`` adds the rows to the drift monitor; only the scoring endpoints set it, once
+    per request, so explanations and re-preparation for a second model are not counted as traffic.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Original DataFrame for preprocessing (first 5 rows):\n%s", input_df.head())
+    # Preprocess the data - preprocess_sales_data leaves input_df untouched. The training codebook
+    # makes each row's encoding independent of the other rows in the request.
+    df_proc = preprocess_sales_data(input_df, codebook=loaded_codebook, keep_index=True, drop_rows=drop_rows)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Preprocessed DataFrame columns after preprocess_sales_data: %s", df_proc.columns.tolist())
+    if observe_drift and drift_monitor is not None:
+        with timed("drift"):
+            drift_monitor.observe(df_proc)
+    
+    if 'Weekly_Sales' in df_proc.columns:
+        logger.debug("Input data contains 'Weekly_Sales' column - it is left unscaled and not used for prediction")
+
+    # Scale features using the loaded scaler or create a new one if none is loaded.
+    # scale_features returns a new frame, so the fallbacks can simply reuse df_proc.
+    df_proc_scaled = df_proc
+    
+    if loaded_scaler is not None:
+        # Use the pre-trained scaler from training (transform only, not fit_transform)
+        try:
+            # Use scale_features with the loaded scaler for consistency
+            # The scale_features function will handle Weekly_Sales properly now
+            df_proc_scaled, _ = scale_features(df_proc, loaded_scaler)
+            logger.debug("Successfully scaled features using the pre-trained scaler")
+        except Exception as e:
+            logger.error("Error using pre-trained scaler: %s", e)
+            logger.warning("Falling back to unscaled features due to scaler error")
+            metrics.SCALER_FALLBACKS.inc(len(df_proc), reason="scaler_error")
+            df_proc_scaled = df_proc
+    else:
+        # If no scaler was loaded, we have to fit a new one (not ideal for production)
+        logger.warning("No pre-trained scaler was loaded. Creating and fitting a new scaler (not recommended for production).")
+        metrics.SCALER_FALLBACKS.inc(len(df_proc), reason="no_scaler")
+        try:
+            df_proc_scaled, temp_scaler = scale_features(df_proc)
+            logger.info("Successfully created and fit a new scaler as fallback")
+        except Exception as e:
+            logger.error("Error creating new scaler: %s", e)
+            # In case of error, use unscaled features
+            df_proc_scaled = df_proc
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Preprocessed DataFrame columns after preprocess_sales_data and scaling: %s", df_proc_scaled.columns.tolist())
+        logger.debug("Preprocessed DataFrame for prediction (first 5 rows):\n%s", df_proc_scaled.head())
+
+    if df_proc.empty:
+        logger.warning("Preprocessing resulted in an empty DataFrame from non-empty input.")
+        return None
+
+    expected_features = selected_model_data.get('feature_names')
+    
+    # Keep track of both unscaled and scaled versions
+    df_aligned = df_proc
+    df_aligned_scaled = df_proc_scaled
+
+    align_start = time.perf_counter()
+    if expected_features:
+        logger.debug("Model '%s' expects features: %s", model_name, expected_features)
+        
+        # Check for missing features
+        missing_features = set(expected_features) - set(df_proc.columns)
+        if missing_features:
+            logger.error("Missing features in preprocessed data for model '%s': %s. Expected: %s, Got: %s", model_name, missing_features, expected_features, df_proc.columns.tolist())
+            raise HTTPException(status_code=500, detail=f"Internal server error: Preprocessing did not produce required features for model '{model_name}'. Missing: {missing_features}")
+
+        # Check for extra features (and log them)
+        extra_features = set(df_proc.columns) - set(expected_features)
+        if extra_features:
+            logger.debug("Extra features in preprocessed data not used by model '%s': %s. These will be dropped.", model_name, extra_features)
+        
+        # Align both dataframes to expected_features
+        try:
+            df_aligned = df_proc[expected_features]
+            df_aligned_scaled = df_proc_scaled[expected_features]  # Keep the scaled version aligned too
+            df_aligned_values = df_aligned_scaled.values  # Convert to numpy array for prediction
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("DataFrame columns aligned to expected features for model '%s'. Aligned columns: %s", model_name, df_aligned.columns.tolist())
+        except KeyError as e:
+            logger.error("KeyError during feature alignment for model '%s': %s. This should have been caught by missing_features check.", model_name, e)
+            raise HTTPException(status_code=500, detail=f"Internal server error: Feature alignment failed for model '{model_name}'.")
+    else:
+        logger.warning("No explicit feature names found for model '%s'. "
+                       "Predicting based on the column order from preprocess_sales_data. "
+                       "Ensure preprocess_sales_data output (%s) "
+                       "matches the training data structure for this model implicitly.", model_name, df_proc.columns.tolist())
+        df_aligned_values = df_proc_scaled.values  # Default to use all scaled features as values
+    metrics.STAGE_LATENCY.observe(time.perf_counter() - align_start, stage="align")
+    return df_aligned_values, df_proc.index
+
+
+def _score_dataframe(input_df: pd.DataFrame, model_name: str, selected_model_data: dict, memoize: bool = True,
+                     drop_rows: bool = True, observe_drift: bool = False) -> Optional[tuple]:
+    """
+    Preprocess, scale and align ``input_df`` and run the model on it.
+    Returns ``(preds, rows)`` (see ``_prepare_features``), or None when preprocessing leaves no rows to predict on.
+    """
+    prepared = _prepare_features(input_df, model_name, selected_model_data, drop_rows, observe_drift)
+    if prepared is None:
+        return None
+    df_aligned_values, rows = prepared
+    preds = _predict_rows(model_name, selected_model_data, df_aligned_values, memoize)
+    return preds, rows
+
+
+def _memoized(model_name: str, key: str, X: np.ndarray, compute, memoize: bool = True) -> np.ndarray:
+    """
+    ``compute(X)`` row by row through the prediction cache: each row of ``X`` is looked up by the
+    hash of its bytes (namespaced by ``key``, the model and output being memoized, and the model
+    version) and only the misses are passed to ``compute``, as one batch.
+    """
+    if not memoize or prediction_cache.maxsize <= 0 or model_name not in memoized_models:
+        return compute(X)
+    with timed("memo.lookup"):
+        keys = row_keys(X, namespace=f"{key}:{model_version}")
+        values = prediction_cache.get_many(keys)
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        # As Python floats (or lists of them): rows of the computed array would keep the whole batch alive
+        computed = np.asarray(compute(X[missing])).tolist()
+        prediction_cache.put_many([keys[i] for i in missing], computed)
+        for i, value in zip(missing, computed):
+            values[i] = value
+    metrics.MEMO_ROWS.inc(len(X) - len(missing), model=model_name, result="hit")
+    metrics.MEMO_ROWS.inc(len(missing), model=model_name, result="miss")
+    return np.asarray(values)
+
+
+def _predict_rows(model_name: str, selected_model_data: dict, X: np.ndarray, memoize: bool = True) -> np.ndarray:
+    """Point predictions of ``model_name`` for the feature rows ``X``, memoized per distinct row."""
+    def compute(batch):
+        # Make predictions using the function from models.train - using the NumPy array values like in training
+        metrics.MODEL_ROWS.observe(len(batch), model=model_name)
+        with metrics.MODEL_LATENCY.time(model=model_name):
+            return predict(selected_model_data, batch)
+    return _memoized(model_name, model_name, X, compute, memoize)
+
+
+def _score_with_quantiles(input_df: pd.DataFrame, model_name: str, selected_model_data: dict, quantiles, memoize: bool = True,
+                          drop_rows: bool = True, observe_drift: bool = False) -> Optional[tuple]:
+    """
+    Point predictions of ``model_name`` plus the requested quantiles from the ensemble, as
+    ``(preds, {level: values}, rows)``. The feature matrix is built once and shared by every model
+    that was trained on the same features; None when preprocessing leaves no rows.
+    """
+    ensemble_data = available_models.get("ensemble")
+    if ensemble_data is None or ensemble_data.get('model') is None:
+        raise HTTPException(status_code=503, detail="Prediction quantiles need the trained ensemble (ensemble.enabled in config/config.yaml); retrain the models.")
+    # Validated as sent, before the ensemble's own median is added below
+    check_quantiles(quantiles)
+    prepared = _prepare_features(input_df, model_name, selected_model_data, drop_rows, observe_drift)
+    if prepared is None:
+        return None
+    X, rows = prepared
+    ensemble = ensemble_data['model']
+    if ensemble_data.get('feature_names') != selected_model_data.get('feature_names'):
+        X_ensemble, _ = _prepare_features(input_df, "ensemble", ensemble_data, drop_rows)
+    else:
+        X_ensemble = X
+
+    levels = list(quantiles)
+    # The ensemble's own point forecast (its median) comes from the same member predictions
+    if model_name == "ensemble":
+        levels.append(0.5)
+
+    def compute(batch):
+        metrics.MODEL_ROWS.observe(len(batch), model="ensemble")
+        with metrics.MODEL_LATENCY.time(model="ensemble"):
+            return ensemble.quantiles_from_members(ensemble.predict_members(batch), levels)
+    values = _memoized("ensemble", f"ensemble:{levels}", X_ensemble, compute, memoize)
+    if model_name == "ensemble":
+        preds = values[:, -1]
+    else:
+        preds = _predict_rows(model_name, selected_model_data, X, memoize)
+    return preds, {f"{level:g}": values[:, i].tolist() for i, level in enumerate(quantiles)}, rows
+
+
 # Helper function for core prediction logic
-async def _perform_prediction(input_df: pd.DataFrame, model_name: str) -> PredictResponse:
+async def _perform_prediction(input_df: pd.DataFrame, model_name: str, quantiles=None) -> PredictResponse:
     """
     Internal helper to preprocess data, make predictions, and format response.
+    With ``quantiles`` the response also carries those quantiles of each row from the ensemble.
     """
     selected_model_data = available_models.get(model_name.lower())
     if selected_model_data is None or selected_model_data.get('model') is None:
-        logger.error(f"Model '{model_name}' not loaded or not available for prediction helper.")
+        logger.error("Model '%s' not loaded or not available for prediction helper.", model_name)
         raise HTTPException(status_code=503, detail=f"Model '{model_name}' not available.")
 
     if input_df.empty:
@@ -129,104 +648,33 @@ async def _perform_prediction(input_df: pd.DataFrame, model_name: str) -> Predic
         return PredictResponse(predictions=[], success=True, message="No data provided for prediction, so no predictions made.")
 
     try:
-        logger.info(f"Original DataFrame for preprocessing (first 5 rows):\n{input_df.head()}")
-          # Preprocess the data - ensure preprocess_sales_data is robust
-        df_proc = preprocess_sales_data(input_df.copy())  # Pass a copy
-        logger.info(f"Preprocessed DataFrame columns after preprocess_sales_data: {df_proc.columns.tolist()}")
-        
-        # Check if Weekly_Sales exists in the input and handle appropriately
-        has_weekly_sales = 'Weekly_Sales' in df_proc.columns
-        if has_weekly_sales:
-            logger.info("Input data contains 'Weekly_Sales' column - this will be preserved unscaled")
-            # We'll preserve it for response but not use it for prediction
-            weekly_sales_original = df_proc['Weekly_Sales'].copy()
-        
-        # Scale features using the loaded scaler or create a new one if none is loaded
-        df_proc_scaled = df_proc.copy()
-        
-        if loaded_scaler is not None:
-            # Use the pre-trained scaler from training (transform only, not fit_transform)
-            try:
-                # Use scale_features with the loaded scaler for consistency
-                # The scale_features function will handle Weekly_Sales properly now
-                df_proc_scaled, _ = scale_features(df_proc, loaded_scaler)
-                logger.info("Successfully scaled features using the pre-trained scaler")
-            except Exception as e:
-                logger.error(f"Error using pre-trained scaler: {str(e)}")
-                logger.warning("Falling back to unscaled features due to scaler error")
-                df_proc_scaled = df_proc.copy()
+        quantile_values = None
+        if quantiles:
+            scored = _score_with_quantiles(input_df, model_name, selected_model_data, quantiles, observe_drift=True)
+            preds, quantile_values, rows = scored if scored is not None else (None, None, None)
         else:
-            # If no scaler was loaded, we have to fit a new one (not ideal for production)
-            logger.warning("No pre-trained scaler was loaded. Creating and fitting a new scaler (not recommended for production).")
-            try:
-                df_proc_scaled, temp_scaler = scale_features(df_proc)
-                logger.info("Successfully created and fit a new scaler as fallback")
-            except Exception as e:
-                logger.error(f"Error creating new scaler: {str(e)}")
-                # In case of error, use unscaled features
-                df_proc_scaled = df_proc.copy()
-        
-        df_proc_values = df_proc_scaled.values  # Convert to numpy array like in training
-        
-        logger.info(f"Preprocessed DataFrame columns after preprocess_sales_data and scaling: {df_proc_scaled.columns.tolist()}")
-        logger.info(f"Preprocessed DataFrame for prediction (first 5 rows):\n{df_proc_scaled.head()}")
-
-        if df_proc.empty and not input_df.empty:
-            logger.warning("Preprocessing resulted in an empty DataFrame from non-empty input.")
+            preds, rows = _score_dataframe(input_df, model_name, selected_model_data, observe_drift=True) or (None, None)
+        if preds is None:
             return PredictResponse(predictions=[], success=True, message="Data preprocessed to empty, no predictions made.")
-        elif df_proc.empty and input_df.empty:
-             return PredictResponse(predictions=[], success=True, message="No data provided, no predictions made.")
-
-        expected_features = selected_model_data.get('feature_names')
-        
-        # Keep track of both unscaled and scaled versions
-        df_aligned = df_proc
-        df_aligned_scaled = df_proc_scaled
-        df_aligned_values = df_proc_values  # Default to use all scaled features as values
+        _record_predictions(input_df, rows, preds, model_name)
 
-        if expected_features:
-            logger.info(f"Model '{model_name}' expects features: {expected_features}")
-            
-            # Check for missing features
-            missing_features = set(expected_features) - set(df_proc.columns)
-            if missing_features:
-                logger.error(f"Missing features in preprocessed data for model '{model_name}': {missing_features}. Expected: {expected_features}, Got: {df_proc.columns.tolist()}")
-                raise HTTPException(status_code=500, detail=f"Internal server error: Preprocessing did not produce required features for model '{model_name}'. Missing: {missing_features}")
-
-            # Check for extra features (and log them)
-            extra_features = set(df_proc.columns) - set(expected_features)
-            if extra_features:
-                logger.warning(f"Extra features in preprocessed data not used by model '{model_name}': {extra_features}. These will be dropped.")
-            
-            # Align both dataframes to expected_features
-            try:
-                df_aligned = df_proc[expected_features]
-                df_aligned_scaled = df_proc_scaled[expected_features]  # Keep the scaled version aligned too
-                df_aligned_values = df_aligned_scaled.values  # Convert to numpy array for prediction
-                logger.info(f"DataFrame columns aligned to expected features for model '{model_name}'. Aligned columns: {df_aligned.columns.tolist()}")
-            except KeyError as e:
-                logger.error(f"KeyError during feature alignment for model '{model_name}': {e}. This should have been caught by missing_features check.")
-                raise HTTPException(status_code=500, detail=f"Internal server error: Feature alignment failed for model '{model_name}'.")
-        else:
-            logger.warning(f"No explicit feature names found for model '{model_name}'. "
-                           f"Predicting based on the column order from preprocess_sales_data. "
-                           f"Ensure preprocess_sales_data output ({df_proc.columns.tolist()}) "
-                           f"matches the training data structure for this model implicitly.")        # Make predictions using the function from models.train - using the NumPy array values
-        preds = predict(selected_model_data, df_aligned_values)  # Using the numpy array values like in training
-        
         predictions_list = preds.tolist() if hasattr(preds, 'tolist') else list(preds)
 
-        logger.info(f"Prediction successful for {len(predictions_list)} records using {model_name} model. Predictions (first 5): {predictions_list[:5]}")
+        logger.info("Prediction successful for %d records using %s model", len(predictions_list), model_name, extra={"rows": len(predictions_list), "model": model_name})
+        logger.debug("Predictions (first 5): %s", predictions_list[:5])
         return PredictResponse(
             predictions=predictions_list,
+            quantiles=quantile_values,
             success=True,
             message=f"Successfully predicted {len(predictions_list)} records using {model_name} model."
         )
+    except HTTPException:
+        raise
     except ValueError as ve: # Catch specific errors from preprocessing or data conversion
-        logger.error(f"ValueError during _perform_prediction: {ve}", exc_info=True)
+        logger.error("ValueError during _perform_prediction: %s", ve, exc_info=True)
         raise HTTPException(status_code=400, detail=f"Invalid data format or value during processing: {str(ve)}")
     except Exception as e: # Catch other errors during prediction logic
-        logger.error(f"Error in _perform_prediction: {e}", exc_info=True)
+        logger.error("Error in _perform_prediction: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error during prediction processing: {str(e)}")
 
 
@@ -236,7 +684,7 @@ async def predict_from_json(request: PredictRequest):
     Predict sales from JSON data.
     Expects a list of records and a model name.
     """
-    logger.info(f"Received JSON prediction request for model: {request.model}")
+    logger.info("Received JSON prediction request for model: %s", request.model)
     model_name = request.model.lower() if request.model else "xgboost"  # Default to xgboost
 
     # Model availability check (can be done here or within _perform_prediction,
@@ -253,14 +701,16 @@ async def predict_from_json(request: PredictRequest):
         if not isinstance(request.data, list) or not all(isinstance(item, dict) for item in request.data):
             raise HTTPException(status_code=400, detail="Input data must be a list of records (dictionaries).")
         
-        df = pd.DataFrame(request.data)
+        with timed("parse"):
+            df = pd.DataFrame(request.data)
+        metrics.ROWS_PER_REQUEST.observe(len(df), endpoint="predict_json")
         if df.empty:
             logger.info("Received empty data list in JSON request.")
             # Consistent with _perform_prediction, return success with empty predictions
             return PredictResponse(predictions=[], success=True, message="No data provided in the list for prediction.")
 
         # Call the helper function for actual prediction logic
-        return await _perform_prediction(df, model_name)
+        return await _perform_prediction(df, model_name, request.quantiles)
 
     except HTTPException as he: # Re-raise known HTTP exceptions
         logger.error(f"HTTP Exception during JSON prediction: {he.detail}")
@@ -270,15 +720,24 @@ async def predict_from_json(request: PredictRequest):
         raise HTTPException(status_code=500, detail=f"Error processing JSON request: {str(e)}")
 
 
+def _parse_quantiles(quantiles: Optional[str]) -> Optional[list]:
+    """Quantile levels from a comma-separated form field (400 if malformed)."""
+    try:
+        return [float(q) for q in quantiles.split(',') if q.strip()] if quantiles else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid quantiles '{quantiles}'; expected comma-separated numbers.")
+
+
 @app.post("/api/predict_csv", response_model=PredictResponse, tags=["Predictions"])
 async def predict_from_csv(
-    model_name: str = Form(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost')"),
-    file: UploadFile = File(..., description="CSV file containing sales data for prediction")
+    model_name: str = Form(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost', 'ensemble')"),
+    file: UploadFile = File(..., description="CSV file containing sales data for prediction"),
+    quantiles: Optional[str] = Form(default=None, description="Comma-separated quantile levels to return per row (e.g. '0.05,0.5,0.95')")
 ):
     """
     Predict sales from an uploaded CSV file.
     """
-    logger.info(f"Received CSV prediction request for model: {model_name}")
+    logger.info("Received CSV prediction request for model: %s", model_name)
     
     # Model availability check
     if model_name.lower() not in available_models or available_models.get(model_name.lower()) is None or available_models.get(model_name.lower()).get('model') is None:
@@ -289,20 +748,24 @@ async def predict_from_csv(
         logger.warning(f"Invalid file type uploaded: {file.filename}")
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV file.")
 
+    quantile_levels = _parse_quantiles(quantiles)
+
     try:
         contents = await file.read()
         if not contents:
             logger.warning("Uploaded CSV file is empty.")
             raise HTTPException(status_code=400, detail="CSV file is empty.")
             
-        df = pd.read_csv(io.BytesIO(contents))
+        with timed("parse"):
+            df = read_sales_csv(io.BytesIO(contents))
+        metrics.ROWS_PER_REQUEST.observe(len(df), endpoint="predict_csv")
         
         if df.empty:
             logger.info("CSV file parsed to an empty DataFrame.")
             return PredictResponse(predictions=[], success=True, message="CSV file is empty or contains no data rows.")
 
         # Call the helper function for actual prediction logic
-        return await _perform_prediction(df, model_name)
+        return await _perform_prediction(df, model_name, quantile_levels)
 
     except HTTPException as he: # Re-raise known HTTP exceptions
         logger.error(f"HTTP Exception during CSV prediction: {he.detail}")
@@ -319,6 +782,454 @@ async def predict_from_csv(
     finally:
         await file.close()
 
+def _write_predictions(stores, dates, preds, model_name: str, version: str, served_at: float):
+    try:
+        with timed("store"):
+            written = prediction_store.write(stores, dates, preds, model_name, version, served_at=served_at)
+        metrics.PREDICTIONS_STORED.inc(written, model=model_name)
+    except Exception as e:
+        logger.error("Could not store %d predictions: %s", len(preds), e)
+
+
+def _record_predictions(input_df: pd.DataFrame, rows, preds, model_name: str):
+    """
+    Hand the forecasts of the scored ``rows`` of ``input_df`` to the prediction store's writer
+    thread, keyed by the rows' Store and Date. Returns the pending write, or None if nothing is stored.
+    """
+    if prediction_store is None or rows is None or 'Store' not in input_df.columns or 'Date' not in input_df.columns:
+        return None
+    positions = input_df.index.get_indexer(rows)
+    stores = input_df['Store'].to_numpy()[positions]
+    dates = input_df['Date'].to_numpy()[positions]
+    return prediction_writer.submit(_write_predictions, stores, dates, np.asarray(preds), model_name, model_version or "unknown",
+                                    time.time())
+
+
+def _score_job_chunk(input_df: pd.DataFrame, model_name: str, quantiles=None) -> Optional[tuple]:
+    """
+    Score one chunk of a batch job through the same path as /api/predict_csv (see api.jobs).
+    Every row is scored: dropping duplicates and outliers per chunk would make the result depend
+    on the chunk size. Bulk files rarely repeat rows, so they bypass the prediction cache rather
+    than flush it.
+    """
+    selected_model_data = available_models.get(model_name)
+    if selected_model_data is None or selected_model_data.get('model') is None:
+        raise RuntimeError(f"Model '{model_name}' not available.")
+    if quantiles:
+        scored = _score_with_quantiles(input_df, model_name, selected_model_data, quantiles, memoize=False, drop_rows=False,
+                                      observe_drift=True)
+        if scored is None:
+            return None
+        preds, quantile_values, rows = scored
+    else:
+        scored = _score_dataframe(input_df, model_name, selected_model_data, memoize=False, drop_rows=False, observe_drift=True)
+        if scored is None:
+            return None
+        (preds, rows), quantile_values = scored, None
+    # Waiting for the write keeps a fast job from queueing up unbounded inserts
+    pending = _record_predictions(input_df, rows, preds, model_name)
+    if pending is not None:
+        pending.result()
+    return preds, quantile_values, rows
+
+
+def _require_jobs() -> JobQueue:
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="Batch jobs are disabled (jobs.enabled in config/config.yaml).")
+    return job_queue
+
+
+def _job_response(job: dict) -> JobResponse:
+    if job['status'] == SUCCEEDED:
+        progress = 1.0
+    else:
+        progress = min(job['rows_read'] / job['rows_total'], 1.0) if job['rows_total'] else 0.0
+    return JobResponse(**dict(
+        job,
+        cancel_requested=bool(job['cancel_requested']),
+        progress=progress,
+        result_url=f"/api/jobs/{job['id']}/result" if job['status'] == SUCCEEDED else None,
+    ))
+
+
+def _job_counts() -> dict:
+    if job_queue is None:
+        return {}
+    try:
+        return {(status,): count for status, count in job_queue.counts().items()}
+    except Exception as e:
+        logger.warning("Could not count jobs: %s", e)
+        return {}
+
+
+JOB_COUNTS = metrics.gauge("sales_jobs", "Batch scoring jobs in the job table, by status.", ("status",), function=_job_counts)
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202, tags=["Jobs"])
+def submit_job(
+    model_name: str = Form(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost', 'ensemble')"),
+    file: UploadFile = File(..., description="CSV file containing sales data for prediction"),
+    quantiles: Optional[str] = Form(default=None, description="Comma-separated quantile levels to write next to each prediction (e.g. '0.05,0.5,0.95')")
+):
+    """
+    Queue an uploaded CSV for scoring in the background and return its job ID right away.
+    Poll GET /api/jobs/{job_id} for progress and download the predictions from its result_url.
+    """
+    queue = _require_jobs()
+    model_name = model_name.lower()
+    if available_models.get(model_name) is None or available_models[model_name].get('model') is None:
+        raise HTTPException(status_code=503, detail=f"Model '{model_name}' not available.")
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV file.")
+    quantile_levels = _parse_quantiles(quantiles)
+    if quantile_levels:
+        try:
+            check_quantiles(quantile_levels)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if available_models.get("ensemble") is None:
+            raise HTTPException(status_code=503, detail="Prediction quantiles need the trained ensemble (ensemble.enabled in config/config.yaml); retrain the models.")
+    try:
+        return _job_response(queue.submit(file.file, file.filename, model_name, quantile_levels))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        file.file.close()
+
+
+@app.get("/api/jobs", response_model=JobListResponse, tags=["Jobs"])
+def list_jobs(status: Optional[str] = Query(None, description="Only jobs with this status"),
+              limit: int = Query(50, ge=1, le=1000, description="Most recent jobs to return")):
+    """List recent batch jobs and the number of jobs in each status."""
+    queue = _require_jobs()
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Unknown status '{status}'; expected one of {list(JOB_STATUSES)}.")
+    return JobListResponse(jobs=[_job_response(job) for job in queue.list(status, limit)], counts=queue.counts())
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse, tags=["Jobs"])
+def get_job(job_id: str):
+    """Status and progress of a batch job."""
+    try:
+        return _job_response(_require_jobs().get(job_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+
+@app.get("/api/jobs/{job_id}/result", tags=["Jobs"])
+def download_job_result(job_id: str):
+    """Download the predictions of a finished job as CSV (one row per scored input row)."""
+    queue = _require_jobs()
+    try:
+        job = queue.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if job['status'] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job['status']}; results are available once it has succeeded.")
+    path = queue.result_path(job_id)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail=f"The results of job '{job_id}' have been removed.")
+    return FileResponse(path, media_type="text/csv", filename=f"predictions_{job_id}.csv")
+
+
+@app.post("/api/jobs/{job_id}/cancel", response_model=JobResponse, tags=["Jobs"])
+def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one after its current chunk."""
+    try:
+        return _job_response(_require_jobs().cancel(job_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/api/jobs/{job_id}/retry", response_model=JobResponse, tags=["Jobs"])
+def retry_job(job_id: str):
+    """Queue a failed or cancelled job again."""
+    try:
+        return _job_response(_require_jobs().retry(job_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+def _require_prediction_store() -> PredictionStore:
+    if prediction_store is None:
+        raise HTTPException(status_code=503, detail="The prediction store is disabled (predictions.enabled in config/config.yaml).")
+    return prediction_store
+
+
+def _prediction_filters(store, start, end, model, version) -> dict:
+    """Validated query filters; ``version`` defaults to the loaded models and 'all' drops it."""
+    for name, value in (("start", start), ("end", end)):
+        if value is not None:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name} date '{value}'; expected YYYY-MM-DD.")
+    if version is None:
+        version = model_version
+    elif version == "all":
+        version = None
+    return {"stores": store, "start": start, "end": end, "model": model.lower() if model else None, "model_version": version}
+
+
+@app.get("/api/predictions", response_model=StoredPredictionsResponse, tags=["Predictions"])
+def get_stored_predictions(
+    store: Optional[List[int]] = Query(None, description="Store IDs (repeat the parameter for several stores)"),
+    start: Optional[str] = Query(None, description="First date, inclusive (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Last date, inclusive (YYYY-MM-DD)"),
+    model: Optional[str] = Query(None, description="Only forecasts of this model"),
+    model_version: Optional[str] = Query(None, description="Model version; defaults to the loaded models, 'all' for every version"),
+    limit: int = Query(10_000, ge=1, description="Most forecasts to return"),
+):
+    """
+    Forecasts served earlier, looked up in the prediction store instead of scoring again.
+    """
+    store_db = _require_prediction_store()
+    filters = _prediction_filters(store, start, end, model, model_version)
+    limit = min(limit, predictions_config.get('max_query_rows', 100_000))
+    with timed("store.query"):
+        rows = store_db.query(limit=limit + 1, **filters)
+    return StoredPredictionsResponse(model_version=filters["model_version"], count=min(len(rows), limit),
+                                     truncated=len(rows) > limit, predictions=rows[:limit])
+
+
+@app.get("/api/predictions/summary", response_model=PredictionSummaryResponse, tags=["Predictions"])
+def summarize_stored_predictions(
+    group_by: str = Query("store", description=f"One of {list(GROUP_BY)}"),
+    store: Optional[List[int]] = Query(None, description="Store IDs (repeat the parameter for several stores)"),
+    start: Optional[str] = Query(None, description="First date, inclusive (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Last date, inclusive (YYYY-MM-DD)"),
+    model: Optional[str] = Query(None, description="Only forecasts of this model"),
+    model_version: Optional[str] = Query(None, description="Model version; defaults to the loaded models, 'all' for every version"),
+):
+    """
+    Count, sum, mean, min and max of the stored forecasts per store, date, month, year or model version.
+    """
+    store_db = _require_prediction_store()
+    filters = _prediction_filters(store, start, end, model, model_version)
+    try:
+        with timed("store.query"):
+            groups = store_db.summarize(group_by, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PredictionSummaryResponse(group_by=group_by, model_version=filters["model_version"], groups=groups)
+
+
+def _scenario_axes(request: ScenarioRequest) -> list:
+    """Grid axes of a scenario request: the stores first, then the swept parameters in request order."""
+    unknown = set(request.grid) - set(SWEEPABLE_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Cannot sweep {sorted(unknown)}; sweepable parameters are {list(SWEEPABLE_PARAMETERS)}")
+    grid = {name: spec.model_dump() if hasattr(spec, 'model_dump') else spec for name, spec in request.grid.items()}
+    if request.stores:
+        if 'Store' in grid:
+            raise ValueError("Give the stores either in 'stores' or in grid['Store'], not both")
+        grid = {'Store': request.stores, **grid}
+    axes = [(name, grid_values(spec)) for name, spec in grid.items()]
+    axes.sort(key=lambda axis: axis[0] != 'Store')
+    for name, values in axes:
+        if name in ('Store', 'Holiday_Flag') and not np.array_equal(values, np.round(values)):
+            raise ValueError(f"{name} values must be whole numbers")
+    return axes
+
+
+@app.post("/api/scenario", response_model=ScenarioResponse, tags=["Predictions"])
+def run_scenario(request: ScenarioRequest):
+    """
+    Sweep a base row over a grid of parameter values and summarise the predictions.
+
+    The grid is scored as one encoded feature matrix (in chunks) rather than as individual rows.
+    """
+    model_name = request.model.lower()
+    selected_model_data = available_models.get(model_name)
+    if selected_model_data is None or selected_model_data.get('model') is None:
+        raise HTTPException(status_code=503, detail=f"Model '{request.model}' not available.")
+    if loaded_codebook is None:
+        raise HTTPException(status_code=503, detail="Scenario sweeps need the category codebook; retrain the models or restore data/Walmart.csv.")
+    expected_features = selected_model_data.get('feature_names')
+    if not expected_features:
+        raise HTTPException(status_code=503, detail=f"Model '{request.model}' has no stored feature names.")
+
+    started = time.perf_counter()
+    try:
+        axes = _scenario_axes(request)
+        grid = ScenarioGrid(request.base, axes, expected_features, loaded_scaler, loaded_codebook)
+        base_grid = ScenarioGrid(request.base, [], expected_features, loaded_scaler, loaded_codebook)
+    except (ValueError, TypeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid scenario: {e}")
+    max_points = scenario_config.get('max_points', 5_000_000)
+    if grid.size > max_points:
+        raise HTTPException(status_code=400, detail=f"Scenario grid has {grid.size} points; the limit is {max_points}.")
+    logger.info("Scoring %d-point scenario grid %s with %s model", grid.size, [name for name, _ in axes], model_name)
+    metrics.ROWS_PER_REQUEST.observe(grid.size, endpoint="scenario")
+
+    def predict_chunk(X):
+        metrics.MODEL_ROWS.observe(len(X), model=model_name)
+        with metrics.MODEL_LATENCY.time(model=model_name):
+            return predict(selected_model_data, X)
+
+    base_prediction = float(score_grid(base_grid, predict_chunk))
+    predictions = score_grid(grid, predict_chunk, chunk_rows=scenario_config.get('chunk_rows', 262_144))
+    summary = summarize_grid(grid, predictions)
+    return ScenarioResponse(
+        model_name=model_name,
+        model_version=model_version,
+        base_prediction=base_prediction,
+        elapsed_ms=round((time.perf_counter() - started) * 1e3, 2),
+        **summary,
+    )
+
+def _explain_rows(model_name: str, model, X: np.ndarray, approximate: bool) -> tuple:
+    """
+    Contributions ``(rows, features + 1)`` for the feature rows ``X``. Each distinct row is looked up
+    in the cache and only the misses are sent to the model, as one batch. Returns the contributions
+    and the number of rows served from the cache.
+    """
+    unique_rows, inverse = np.unique(X, axis=0, return_inverse=True)
+    keys = [(model_name, model_version, approximate, row.tobytes()) for row in unique_rows]
+    contribs = np.empty((len(unique_rows), X.shape[1] + 1), dtype=np.float32)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = explanation_cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            contribs[i] = cached
+    if missing:
+        with metrics.MODEL_LATENCY.time(model=f"{model_name}.explain"):
+            computed = feature_contributions(model, unique_rows[missing], approximate=approximate)
+        contribs[missing] = computed
+        for i, row in zip(missing, computed):
+            explanation_cache.put(keys[i], row.copy())  # not a view pinning the whole batch
+    inverse = inverse.reshape(-1)
+    cached_rows = int(np.count_nonzero(~np.isin(inverse, missing)))
+    return contribs[inverse], cached_rows
+
+
+@app.post("/api/explain", response_model=ExplainResponse, tags=["Predictions"])
+def explain_predictions(request: ExplainRequest):
+    """
+    Explain predictions: the contribution of each feature (or source column) to each row's forecast.
+
+    Uses XGBoost's native TreeSHAP contributions on the whole batch, or coefficient x value for the
+    linear model. The contributions of a row plus its base value add up to its prediction. There is
+    one entry per input row, in request order: duplicates and outliers are explained, not dropped.
+    """
+    model_name = request.model.lower()
+    selected_model_data = available_models.get(model_name)
+    if selected_model_data is None or selected_model_data.get('model') is None:
+        raise HTTPException(status_code=503, detail=f"Model '{request.model}' not available.")
+    model = selected_model_data['model']
+    if not supports_contributions(model):
+        raise HTTPException(status_code=400, detail=f"Explanations are available for the linear and xgboost models, not '{request.model}'.")
+    feature_names = selected_model_data.get('feature_names')
+    if not feature_names:
+        raise HTTPException(status_code=503, detail=f"Model '{request.model}' has no stored feature names.")
+    if not request.data:
+        raise HTTPException(status_code=400, detail="No data provided for explanation.")
+
+    with timed("parse"):
+        df = pd.DataFrame(request.data)
+    metrics.ROWS_PER_REQUEST.observe(len(df), endpoint="explain")
+    try:
+        # No row is dropped, so the i-th explanation belongs to the i-th input row
+        prepared = _prepare_features(df, model_name, selected_model_data, drop_rows=False)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=f"Invalid data format or value during processing: {ve}")
+    if prepared is None:
+        return ExplainResponse(model_name=model_name, model_version=model_version, features=[], predictions=[], base_values=[], contributions=[])
+    X, _ = prepared
+
+    approximate = request.approximate if request.approximate is not None else explain_config.get('approximate', False)
+    with timed("explain"):
+        contribs, cached_rows = _explain_rows(model_name, model, np.ascontiguousarray(X, dtype=np.float32), approximate)
+        if request.group_categories:
+            names, values = group_contributions(contribs, feature_names)
+        else:
+            names, values = list(feature_names), contribs[:, :-1]
+    base_values = contribs[:, -1].astype(np.float64)
+    predictions = base_values + values.sum(axis=1, dtype=np.float64)
+    logger.info("Explained %d rows with %s model (%d from cache)", len(contribs), model_name, cached_rows)
+    return ExplainResponse(
+        model_name=model_name,
+        model_version=model_version,
+        features=names,
+        predictions=predictions.tolist(),
+        base_values=base_values.tolist(),
+        contributions=values.astype(np.float64).tolist(),
+        cached_rows=cached_rows,
+    )
+
+_DRIFT_SEVERITY = ('insufficient_data', 'stable', 'moderate', 'significant')
+
+
+def _drift_psi() -> dict:
+    if drift_monitor is None:
+        return {}
+    # Features without enough live rows yet have no meaningful PSI and are left out
+    return {(name,): feature['psi'] for name, feature in drift_monitor.report()['features'].items()
+            if feature['status'] != 'insufficient_data'}
+
+
+DRIFT_PSI = metrics.gauge("sales_input_drift_psi", "Population stability index of each model input against the training data.", ("feature",), function=_drift_psi)
+
+
+@app.get("/monitoring/drift", response_model=DriftResponse, tags=["Monitoring"])
+def get_input_drift():
+    """
+    Compare the inputs scored since the last reset with the training data (PSI and KS per feature)
+    and report how many values were filled with defaults or scored without the trained scaler.
+    """
+    counters = {
+        "default_fills": {labels[0]: value for labels, value in metrics.DEFAULT_FILLS.items()},
+        "scaler_fallbacks": {labels[0]: value for labels, value in metrics.SCALER_FALLBACKS.items()},
+    }
+    if drift_monitor is None:
+        return DriftResponse(monitoring=False, model_version=model_version, **counters)
+    report = drift_monitor.report()
+    statuses = [feature['status'] for feature in report['features'].values()]
+    status = max(statuses, key=_DRIFT_SEVERITY.index) if statuses else 'insufficient_data'
+    return DriftResponse(monitoring=True, model_version=model_version, status=status, **report, **counters)
+
+
+@app.post("/monitoring/drift/reset", response_model=DriftResponse, tags=["Monitoring"])
+def reset_input_drift():
+    """Start a new observation window (e.g. after a deployment or an acknowledged shift)."""
+    if drift_monitor is not None:
+        drift_monitor.reset()
+    return get_input_drift()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Expose request counts, stage latencies and cache statistics in Prometheus text format."""
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+def _require_profiling():
+    if not profiling_config.get('enabled', False):
+        raise HTTPException(status_code=404, detail="Profiling is disabled.")
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+def list_profiles():
+    """List stored profile IDs, newest first."""
+    _require_profiling()
+    return {"profiles": profile_store.list_ids() if profile_store.directory.exists() else []}
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, format: str = Query("json", description="'json' for the summary and memory allocators, 'collapsed' for flame-graph stacks")):
+    """Return a stored profile summary, or its collapsed stacks for flamegraph.pl / speedscope."""
+    _require_profiling()
+    try:
+        if format == "collapsed":
+            return PlainTextResponse(profile_store.load_collapsed(profile_id))
+        return profile_store.load(profile_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.")
+
 @app.get("/model_info", response_model=ModelResponse)
 def get_model_info(model_name: str = Query("xgboost", description="Name of the model to get info for (e.g., 'linear', 'xgboost')")):
     model_name = model_name.lower()
@@ -343,9 +1254,11 @@ def get_model_info(model_name: str = Query("xgboost", description="Name of the m
 
     model_info_response = {
         "model_name": model_actual_name,
+        "model_version": model_version,
         "model_type": "Regression", # This is generic, could be more specific if known
-        "metrics": {"r2_score": "N/A"}, # Placeholder, actual metrics should be stored with the model
-        "features": features
+        "metrics": selected_model_data_dict.get('metrics') or {}, # Stored by scripts/train.py
+        "features": features,
+        "importance": selected_model_data_dict.get('importance'),
     }
     return ModelResponse(**model_info_response)
 
@@ -363,7 +1276,65 @@ def health_check():
         version="1.0.0"
     )
 
+@app.get("/ready", response_model=ReadyResponse)
+def readiness_check():
+    """Readiness probe: 200 once models are loaded and warmed up, 503 before that."""
+    body = ReadyResponse(ready=is_ready, model_version=model_version, startup=startup_report)
+    if not is_ready:
+        return JSONResponse(status_code=503, content=jsonable_encoder(body))
+    return body
+
 # Add new endpoint for data visualization
+def _weekly_chart_series() -> WeeklySeries:
+    """The weekly series of the training data, rebuilt only when the CSV changes."""
+    global chart_series, chart_series_mtime
+    data_path = os.path.join(PROJECT_ROOT, config['data']['path'])
+    try:
+        mtime = os.path.getmtime(data_path)
+    except OSError:
+        raise HTTPException(status_code=503, detail=f"No sales data at {config['data']['path']} to chart.")
+    with chart_series_lock:
+        if chart_series is None or mtime != chart_series_mtime:
+            with timed("chart.build"):
+                chart_series = WeeklySeries.from_csv(data_path, chunk_rows=charts_config.get('chunk_rows', 500_000))
+            chart_series_mtime = mtime
+            chart_cache.clear()
+        return chart_series
+
+
+@app.get("/api/charts/weekly_sales", response_model=ChartSeriesResponse, tags=["Data Analysis"])
+def get_weekly_sales_chart(
+    width: int = Query(800, ge=3, description="Chart width in pixels: the most points returned per series"),
+    store: Optional[List[int]] = Query(None, description="Store IDs to include (repeat the parameter for several stores)"),
+    start: Optional[str] = Query(None, description="First week, inclusive (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Last week, inclusive (YYYY-MM-DD)"),
+    total: bool = Query(True, description="Include the weekly total over all stores"),
+):
+    """
+    Weekly sales of the training data, downsampled with Largest-Triangle-Three-Buckets to at most `width`
+    points per series, so the payload does not grow with the history.
+    """
+    for name, value in (("start", start), ("end", end)):
+        if value is not None:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {name} date '{value}'; expected YYYY-MM-DD.")
+    width = min(width, charts_config.get('max_width', 4000))
+    series = _weekly_chart_series()
+    key = (width, tuple(store or ()), start, end, total)
+    response = chart_cache.get(key)
+    if response is None:
+        try:
+            with timed("chart.downsample"):
+                chart = series.downsample(width, stores=store, start=start, end=end, total=total)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = ChartSeriesResponse(width=width, stores=series.stores.tolist(), **chart)
+        chart_cache.put(key, response)
+    return response
+
+
 @app.post("/api/visualize_data", response_model=VisualizeResponse, tags=["Data Analysis"])
 async def visualize_data(file: UploadFile = File(...)):
     df = None
@@ -379,10 +1350,10 @@ async def visualize_data(file: UploadFile = File(...)):
         try:
             # Try decoding with utf-8, then latin-1 as a fallback
             try:
-                df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+                df = read_sales_csv(io.StringIO(contents.decode('utf-8')))
             except UnicodeDecodeError:
                 logger.warning("UTF-8 decoding failed for CSV, trying latin-1.")
-                df = pd.read_csv(io.StringIO(contents.decode('latin-1')))
+                df = read_sales_csv(io.StringIO(contents.decode('latin-1')))
         except pd.errors.EmptyDataError:
             logger.error(f"Uploaded CSV {file.filename} is empty or unparseable (EmptyDataError).", exc_info=True)
             raise HTTPException(status_code=400, detail="Uploaded CSV file is empty or could not be parsed.")
@@ -394,6 +1365,7 @@ async def visualize_data(file: UploadFile = File(...)):
             raise HTTPException(status_code=500, detail=f"Error reading CSV file: {str(e)}")
 
 
+        metrics.ROWS_PER_REQUEST.observe(len(df), endpoint="visualize_data")
         if df.empty:
             logger.info(f"CSV file {file.filename} parsed to an empty DataFrame.")
             return VisualizeResponse(
@@ -403,13 +1375,14 @@ async def visualize_data(file: UploadFile = File(...)):
                 message="CSV file is empty or contains no data rows."
             )
 
-        logger.info(f"Original columns in uploaded CSV for visualization: {df.columns.tolist()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Original columns in uploaded CSV for visualization: %s", df.columns.tolist())
         
         # ...existing code...
         if 'Date' in df.columns:
             try:
                 # Attempt to parse with specific format first, then infer
-                original_dates = df['Date'].copy() # Keep original for fallback if needed
+                original_dates = df['Date'] # Keep original for fallback if needed
                 try:
                     df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='raise')
                     logger.info("Parsed 'Date' column with format '%d-%m-%Y' for visualization.")
@@ -429,20 +1402,19 @@ async def visualize_data(file: UploadFile = File(...)):
             except Exception as e:
                 logger.warning(f"Could not convert 'Date' column to datetime for visualization: {e}. Time-based aggregations might be affected.")
         
-        # Preprocess a copy of the data for statistics
-        df_for_stats = df.copy()
-        df_proc = preprocess_sales_data(df_for_stats) # preprocess_sales_data handles its own date parsing if 'Date' is present
+        # Preprocess the data for statistics (df itself is left untouched)
+        df_proc = preprocess_sales_data(df, codebook=loaded_codebook) # preprocess_sales_data handles its own date parsing if 'Date' is present
         
         # Check if Weekly_Sales exists in the input and handle appropriately
         has_weekly_sales = 'Weekly_Sales' in df_proc.columns
         if has_weekly_sales:
             logger.info("Visualization data contains 'Weekly_Sales' column - this will be preserved separately during scaling")
             # Preserve it before scaling
-            weekly_sales_original = df_proc['Weekly_Sales'].copy()
+            weekly_sales_original = df_proc['Weekly_Sales']
             # Remove from DataFrame that will be scaled to avoid scaler errors
             df_proc_for_scaling = df_proc.drop('Weekly_Sales', axis=1)
         else:
-            df_proc_for_scaling = df_proc.copy()
+            df_proc_for_scaling = df_proc
         
         # Scale features with the loaded scaler if available, otherwise fit a new one
         if loaded_scaler is not None:
@@ -464,8 +1436,9 @@ async def visualize_data(file: UploadFile = File(...)):
         else:
             # No scaler loaded - fit a new one for this data
             df_proc, scaler = scale_features(df_proc) # Scale features and get the scaler
-        logger.info(f"Preprocessed DataFrame for stats (first 5 rows):\n{df_proc.head() if not df_proc.empty else 'Empty'}")
-        logger.info(f"Preprocessed DataFrame columns for stats: {df_proc.columns.tolist() if not df_proc.empty else 'Empty'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Preprocessed DataFrame for stats (first 5 rows):\n%s", df_proc.head() if not df_proc.empty else 'Empty')
+            logger.debug("Preprocessed DataFrame columns for stats: %s", df_proc.columns.tolist() if not df_proc.empty else 'Empty')
 
         stats_data: Optional[DataStats]
         source_for_stats = df_proc if not df_proc.empty else df # Fallback to original df if preprocessing yields empty
@@ -566,3 +1539,17 @@ async def visualize_data(file: UploadFile = File(...)):
                 logger.debug(f"File {file.filename} closed.")
             except Exception as e_close:
                 logger.error(f"Error closing file {file.filename}: {e_close}", exc_info=True)
+
+
+def _profile_sync_endpoints():
+    """Let profiled requests follow sync endpoints onto the threadpool thread that runs them.
+
+    Routes that are already wrapped are left alone, so this can be called again after adding routes.
+    """
+    for route in app.routes:
+        call = getattr(route, 'dependant', None) and route.dependant.call
+        if isinstance(route, APIRoute) and not inspect.iscoroutinefunction(call) and not getattr(call, 'profiled', False):
+            route.dependant.call = profiled_call(call)
+
+
+_profile_sync_endpoints()
@@ -1,16 +1,65 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from enum import Enum
 
 class PredictRequest(BaseModel):
     data: List[Dict[str, Any]] = Field(..., description="List of dictionaries representing sales data rows")
-    model: str = Field(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost')")
+    model: str = Field(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost', 'ensemble')")
+    quantiles: Optional[List[float]] = Field(default=None, description="Quantile levels to return per row from the ensemble (e.g. [0.05, 0.5, 0.95])")
 
 class PredictResponse(BaseModel):
     predictions: List[float] = Field(..., description="List of predicted sales values")
+    quantiles: Optional[Dict[str, List[float]]] = Field(default=None, description="Predicted quantiles per row, keyed by quantile level")
     success: bool = Field(default=True, description="Whether the prediction was successful")
     message: Optional[str] = Field(default=None, description="Additional information about the prediction")
 
+class ScenarioRange(BaseModel):
+    start: float = Field(..., description="First value of the range")
+    stop: float = Field(..., description="Last value of the range (included when reached)")
+    num: Optional[int] = Field(default=None, ge=1, le=100000, description="Number of evenly spaced values")
+    step: Optional[float] = Field(default=None, gt=0, description="Spacing between values (alternative to num)")
+
+class ScenarioRequest(BaseModel):
+    base: Dict[str, Any] = Field(default_factory=dict, description="Base row (Store, Date, Temperature, ...); parameters that are not swept keep these values")
+    grid: Dict[str, Union[List[float], ScenarioRange]] = Field(default_factory=dict, description="Values or range per swept parameter (Temperature, Fuel_Price, CPI, Unemployment, Holiday_Flag, Store)")
+    stores: Optional[List[int]] = Field(default=None, description="Stores to evaluate the sweep for (shorthand for a Store grid axis)")
+    model: str = Field(default="xgboost", description="Name of the model to use (e.g., 'linear', 'xgboost')")
+
+class SensitivityCurve(BaseModel):
+    parameter: str = Field(..., description="Swept parameter")
+    values: List[float] = Field(..., description="Grid values of the parameter")
+    mean: List[float] = Field(..., description="Mean prediction at each value over all other parameters")
+    min: List[float] = Field(..., description="Lowest prediction at each value")
+    max: List[float] = Field(..., description="Highest prediction at each value")
+
+class ScenarioResponse(BaseModel):
+    model_name: str = Field(..., description="Model used for the sweep")
+    model_version: Optional[str] = Field(default=None, description="Content hash of the loaded model artifacts")
+    points: int = Field(..., description="Number of grid points scored")
+    base_prediction: float = Field(..., description="Prediction for the base row itself")
+    min_prediction: float = Field(..., description="Lowest prediction on the grid")
+    max_prediction: float = Field(..., description="Highest prediction on the grid")
+    mean_prediction: float = Field(..., description="Mean prediction over the grid")
+    min_scenario: Dict[str, float] = Field(..., description="Parameter values of the lowest prediction")
+    max_scenario: Dict[str, float] = Field(..., description="Parameter values of the highest prediction")
+    curves: List[SensitivityCurve] = Field(default_factory=list, description="Sensitivity curve per swept parameter")
+    elapsed_ms: float = Field(..., description="Time spent building and scoring the grid")
+
+class ExplainRequest(BaseModel):
+    data: List[Dict[str, Any]] = Field(..., description="List of dictionaries representing sales data rows")
+    model: str = Field(default="xgboost", description="Name of the model to explain ('linear' or 'xgboost')")
+    group_categories: bool = Field(default=True, description="Sum the binary-encoded bit columns back into their source column (Store, month, ...)")
+    approximate: Optional[bool] = Field(default=None, description="Use the fast approximate tree contributions instead of exact TreeSHAP (default from config)")
+
+class ExplainResponse(BaseModel):
+    model_name: str = Field(..., description="Name of the explained model")
+    model_version: Optional[str] = Field(default=None, description="Content hash of the loaded model artifacts")
+    features: List[str] = Field(..., description="Column order of each row in 'contributions'")
+    predictions: List[float] = Field(..., description="Prediction per row (bias plus the sum of its contributions)")
+    base_values: List[float] = Field(..., description="Bias per row: the prediction for an average row")
+    contributions: List[List[float]] = Field(..., description="Contribution of each feature to each row's prediction")
+    cached_rows: int = Field(default=0, description="Rows whose contributions came from the cache")
+
 class ModelType(str, Enum):
     REGRESSION = "Regression"
     CLASSIFICATION = "Classification"
@@ -18,15 +67,107 @@ class ModelType(str, Enum):
 
 class ModelResponse(BaseModel):
     model_name: str = Field(..., description="Name of the model")
+    model_version: Optional[str] = Field(default=None, description="Content hash of the loaded model artifacts")
     model_type: ModelType = Field(..., description="Type of the model")
-    metrics: Dict[str, float] = Field(..., description="Performance metrics of the model")
+    metrics: Dict[str, float] = Field(..., description="Train/test metrics of the model, computed at training time")
     features: Optional[List[str]] = Field(default=None, description="Features used by the model")
+    importance: Optional[Dict[str, float]] = Field(default=None, description="Mean absolute contribution of each source column on the training data")
 
 class HealthResponse(BaseModel):
     status: str = Field(..., description="Health status of the API")
     model_loaded: bool = Field(..., description="Whether the model is loaded")
     version: str = Field(default="1.0.0", description="API version")
 
+class ReadyResponse(BaseModel):
+    ready: bool = Field(..., description="Whether models are loaded and warmed up")
+    model_version: Optional[str] = Field(default=None, description="Content hash of the loaded model artifacts")
+    startup: Dict[str, Any] = Field(default_factory=dict, description="Start-up timing report in seconds")
+
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Job ID")
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    model: str = Field(..., description="Model that scores the job")
+    quantiles: Optional[List[float]] = Field(default=None, description="Quantile levels written next to each prediction")
+    filename: Optional[str] = Field(default=None, description="Name of the uploaded file")
+    rows_total: Optional[int] = Field(default=None, description="Data rows in the upload")
+    rows_read: int = Field(default=0, description="Rows read and scored so far")
+    rows_scored: int = Field(default=0, description="Predictions written so far (jobs score every row, duplicates and outliers included)")
+    progress: float = Field(default=0.0, description="Fraction of the upload processed")
+    attempts: int = Field(default=0, description="Attempts started so far")
+    max_attempts: int = Field(..., description="Attempts before the job is marked failed")
+    cancel_requested: bool = Field(default=False, description="Whether cancellation was requested while running")
+    error: Optional[str] = Field(default=None, description="Error of the last failed attempt")
+    created_at: float = Field(..., description="Unix time the job was submitted")
+    started_at: Optional[float] = Field(default=None, description="Unix time the current attempt started")
+    finished_at: Optional[float] = Field(default=None, description="Unix time the job finished")
+    result_url: Optional[str] = Field(default=None, description="Where to download the predictions once the job succeeded")
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse] = Field(default_factory=list, description="Jobs, most recent first")
+    counts: Dict[str, int] = Field(default_factory=dict, description="Number of jobs in each status")
+
+class StoredPrediction(BaseModel):
+    store: int = Field(..., description="Store ID")
+    date: str = Field(..., description="Week date (YYYY-MM-DD)")
+    model: str = Field(..., description="Model that made the forecast")
+    model_version: str = Field(..., description="Content hash of the model artifacts that made the forecast")
+    prediction: float = Field(..., description="Forecast weekly sales")
+    created_at: float = Field(..., description="Unix time the forecast was stored")
+
+class StoredPredictionsResponse(BaseModel):
+    model_version: Optional[str] = Field(default=None, description="Model version filtered on (None for all versions)")
+    count: int = Field(..., description="Number of forecasts returned")
+    truncated: bool = Field(default=False, description="Whether more forecasts matched than the limit")
+    predictions: List[StoredPrediction] = Field(default_factory=list, description="Forecasts ordered by store and date")
+
+class PredictionGroup(BaseModel):
+    key: Union[int, str] = Field(..., description="Value of the grouping column (store ID, date, month, year or model version)")
+    count: int = Field(..., description="Number of forecasts in the group")
+    sum: float = Field(..., description="Sum of the forecasts")
+    mean: float = Field(..., description="Mean forecast")
+    min: float = Field(..., description="Smallest forecast")
+    max: float = Field(..., description="Largest forecast")
+
+class PredictionSummaryResponse(BaseModel):
+    group_by: str = Field(..., description="Grouping column")
+    model_version: Optional[str] = Field(default=None, description="Model version filtered on (None for all versions)")
+    groups: List[PredictionGroup] = Field(default_factory=list, description="One aggregate per group, ordered by key")
+
+class ChartSeries(BaseModel):
+    name: str = Field(..., description="'total' or 'Store <id>'")
+    store: Optional[int] = Field(default=None, description="Store ID (None for the all-store total)")
+    dates: List[str] = Field(default_factory=list, description="Week dates kept by the downsampling (YYYY-MM-DD)")
+    values: List[float] = Field(default_factory=list, description="Weekly sales at those dates")
+
+class ChartSeriesResponse(BaseModel):
+    width: int = Field(..., description="Most points returned per series")
+    start: Optional[str] = Field(default=None, description="First week in the requested range")
+    end: Optional[str] = Field(default=None, description="Last week in the requested range")
+    weeks: int = Field(..., description="Weeks in the requested range before downsampling")
+    stores: List[int] = Field(default_factory=list, description="Every store ID with sales data")
+    series: List[ChartSeries] = Field(default_factory=list, description="The total first (if requested), then the requested stores")
+
+class FeatureDrift(BaseModel):
+    kind: str = Field(..., description="'numeric' (quantile bins of the training data) or 'categorical' (one bin per training category plus 'unknown')")
+    rows: int = Field(..., description="Rows observed for this feature since the last reset")
+    psi: float = Field(..., description="Population stability index against the training histogram")
+    ks: Optional[float] = Field(default=None, description="Kolmogorov-Smirnov distance between the binned distributions (numeric features)")
+    status: str = Field(..., description="stable, moderate, significant or insufficient_data")
+    edges: Optional[List[float]] = Field(default=None, description="Interior bin edges (numeric features)")
+    labels: Optional[List[str]] = Field(default=None, description="Bin labels (categorical features)")
+    reference_share: List[float] = Field(..., description="Share of the training rows in each bin")
+    live_share: List[float] = Field(..., description="Share of the observed rows in each bin")
+
+class DriftResponse(BaseModel):
+    monitoring: bool = Field(..., description="Whether drift is being monitored (needs the reference histograms saved by training)")
+    model_version: Optional[str] = Field(default=None, description="Content hash of the loaded model artifacts")
+    rows: int = Field(default=0, description="Rows observed since the last reset")
+    since: Optional[float] = Field(default=None, description="Unix time of the last reset")
+    status: str = Field(default="insufficient_data", description="Worst status over all features")
+    features: Dict[str, FeatureDrift] = Field(default_factory=dict, description="Drift statistics per model input")
+    default_fills: Dict[str, float] = Field(default_factory=dict, description="Values filled with defaults during preprocessing, per column, since start-up")
+    scaler_fallbacks: Dict[str, float] = Field(default_factory=dict, description="Rows scored without the trained scaler, per reason, since start-up")
+
 class ColumnStatistics(BaseModel):
     min: Optional[float] = Field(None, description="Minimum value")
     max: Optional[float] = Field(None, description="Maximum value")
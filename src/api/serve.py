@@ -0,0 +1,257 @@
+"""Pre-fork production server.
+
+Models and the scaler are loaded (and warmed up) once in the parent process, their NumPy
+buffers are made read-only and every live object is moved out of the garbage collector's
+reach with ``gc.freeze()``. Workers are then forked and share those pages copy-on-write,
+so total memory grows far slower than the worker count.
+
+    python -m src.api.serve --workers 4 --port 8000
+
+Signals sent to the parent:
+    SIGHUP   reload models in the parent and replace the workers without dropping connections
+    SIGUSR1  log the proportional (shared-aware) memory of each worker
+    SIGTERM / SIGINT  graceful shutdown
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import numpy as np
+import uvicorn
+
+# Import the API the way it imports its own modules (top-level ``api``, ``utils``, ...), so the
+# logging listener, metrics and loaded models used here are the instances main.py configured
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api import main as api_main
+from utils.logging import flush_logging
+
+logger = logging.getLogger("serve")
+
+
+def _freeze_arrays(obj, seen=None, depth=0) -> int:
+    """Mark every NumPy array reachable from ``obj`` read-only; returns the number of arrays."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or depth > 6:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        if obj.flags.writeable and obj.base is None:
+            obj.setflags(write=False)
+        return 1
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif hasattr(obj, '__dict__'):
+        values = vars(obj).values()
+    else:
+        return 0
+    return sum(_freeze_arrays(value, seen, depth + 1) for value in values)
+
+
+def preload_models():
+    """Load and warm up models in this process, then freeze them for copy-on-write sharing."""
+    gc.unfreeze()
+    api_main.load_trained_models()
+    api_main.models_preloaded = True
+    frozen = _freeze_arrays((api_main.available_models, api_main.loaded_scaler))
+    # Collect once, then park every surviving object in the permanent generation so that
+    # collections in the workers never write to (and thereby copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded models (version %s), %d arrays made read-only, %d objects frozen",
+                api_main.model_version, frozen, gc.get_freeze_count())
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def proportional_memory_mb(pid: int) -> float:
+    """PSS of a process: shared pages are divided among the processes that map them."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def _exit_worker(signum, frame):
+    raise SystemExit(0)
+
+
+class PreforkServer:
+    def __init__(self, host: str, port: int, workers: int, cpu_affinity: bool = True,
+                 graceful_timeout: int = 30, log_level: str = 'info'):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.cpu_affinity = cpu_affinity and hasattr(os, 'sched_setaffinity')
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.workers = {}  # pid -> slot
+        self.sock = None
+        self._running = True
+        self._reload_requested = False
+        self._report_requested = False
+        self._cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+
+    # Worker side -----------------------------------------------------------------
+
+    def _run_worker(self, slot: int):
+        for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        # uvicorn re-raises the shutdown signal once it has stopped; turn that into a normal
+        # exit so the worker still flushes its logs
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, _exit_worker)
+        if self.cpu_affinity and self._cpus:
+            cpu = self._cpus[slot % len(self._cpus)]
+            os.sched_setaffinity(0, {cpu})
+        config = uvicorn.Config(
+            api_main.app,
+            log_config=None,  # keep the application's logging configuration
+            log_level=self.log_level,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+        server = uvicorn.Server(config)
+        server.run(sockets=[self.sock])
+
+    def _spawn(self, slot: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                self._run_worker(slot)
+            except SystemExit as exc:
+                exit_code = exc.code or 0
+            except BaseException:
+                logger.exception("Worker %d crashed", slot)
+                exit_code = 1
+            finally:
+                flush_logging()
+                os._exit(exit_code)
+        self.workers[pid] = slot
+        logger.info("Started worker %d (pid %d)", slot, pid)
+        return pid
+
+    # Parent side -----------------------------------------------------------------
+
+    def _stop_workers(self, pids, timeout: float):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+                    self.workers.pop(pid, None)
+            time.sleep(0.1)
+        for pid in remaining:
+            logger.warning("Worker pid %d did not stop in %ss, killing it", pid, timeout)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self.workers.pop(pid, None)
+
+    def _reload(self):
+        """Load new models in the parent, start a fresh generation of workers, retire the old one."""
+        logger.info("Reloading models")
+        old_pids = list(self.workers)
+        try:
+            preload_models()
+        except Exception:
+            logger.exception("Model reload failed; keeping the current workers")
+            return
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+        # The listening socket is shared, so old workers finish their in-flight requests while new ones accept
+        self._stop_workers(old_pids, self.graceful_timeout)
+
+    def _report_memory(self):
+        sizes = {pid: proportional_memory_mb(pid) for pid in self.workers}
+        total = sum(sizes.values()) + proportional_memory_mb(os.getpid())
+        logger.info("Memory (PSS MB) parent=%.1f workers=%s total=%.1f",
+                    proportional_memory_mb(os.getpid()),
+                    {pid: round(mb, 1) for pid, mb in sizes.items()}, total)
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        elif signum == signal.SIGUSR1:
+            self._report_requested = True
+        else:
+            self._running = False
+
+    def run(self):
+        preload_models()
+        self.sock = bind_socket(self.host, self.port)
+        logger.info("Listening on %s:%d with %d workers", self.host, self.port, self.num_workers)
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+
+        for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_signal)
+
+        while self._running:
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            if self._report_requested:
+                self._report_requested = False
+                self._report_memory()
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in self.workers:
+                slot = self.workers.pop(pid)
+                if self._running:
+                    logger.warning("Worker %d (pid %d) exited with status %d, restarting", slot, pid, status)
+                    self._spawn(slot)
+            time.sleep(0.2)
+
+        logger.info("Shutting down %d workers", len(self.workers))
+        self._stop_workers(list(self.workers), self.graceful_timeout)
+        self.sock.close()
+
+
+def main(argv=None):
+    server_config = api_main.config.get('server', {})
+    parser = argparse.ArgumentParser(description="Pre-fork Sales Forecasting API server")
+    parser.add_argument('--host', default=server_config.get('host', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=server_config.get('port', 8000))
+    parser.add_argument('--workers', type=int, default=server_config.get('workers') or os.cpu_count() or 1)
+    parser.add_argument('--no-cpu-affinity', dest='cpu_affinity', action='store_false',
+                        default=server_config.get('cpu_affinity', True), help="Do not pin each worker to one CPU")
+    parser.add_argument('--graceful-timeout', type=int, default=server_config.get('graceful_timeout', 30))
+    args = parser.parse_args(argv)
+
+    PreforkServer(args.host, args.port, args.workers, cpu_affinity=args.cpu_affinity,
+                  graceful_timeout=args.graceful_timeout).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
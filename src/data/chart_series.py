@@ -0,0 +1,148 @@
+"""Weekly sales series for charts, downsampled on the server.
+
+The weekly sales of every store (and of all stores together) are aggregated once into a
+``stores x weeks`` matrix on a shared week axis. A chart request slices a date range out of it and
+reduces each series to about one point per pixel with Largest-Triangle-Three-Buckets (LTTB), which
+keeps the peaks and troughs a plain every-n-th sample drops. The payload is bounded by the chart
+width, not by the length of the history.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .schema import DATE_COLUMN, DATE_FORMAT, TARGET_COLUMN, iter_sales_csv
+
+logger = logging.getLogger(__name__)
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the ``n_out`` points Largest-Triangle-Three-Buckets keeps from each series.
+
+    ``x`` is the shared, increasing x axis of length ``n``; ``y`` is one series of length ``n`` or a
+    ``series x n`` matrix, downsampled all at once (the loop is over buckets, not series). The first
+    and last points are always kept and every other bucket contributes the point forming the
+    largest triangle with the previously kept point and the mean of the next bucket. NaN marks a
+    missing point: it is only kept when its whole bucket is missing. Returns an
+    ``(series, min(n, n_out))`` int array of increasing indices.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.tile(np.arange(n), (y.shape[0], 1))
+
+    # Interior buckets [starts[i], starts[i + 1]); the last one ends before the final point
+    starts = (np.arange(n_out - 2) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    sizes = np.diff(np.append(starts, n - 1))
+    missing = np.isnan(y)
+    sums = np.add.reduceat(np.where(missing, 0.0, y)[:, :n - 1], starts, axis=1)
+    counts = np.add.reduceat(~missing[:, :n - 1], starts, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means_y = sums / counts
+    means_x = np.add.reduceat(x[:n - 1], starts) / sizes
+    # The triangle's third vertex: the mean of the next bucket, or the last point for the last bucket
+    next_x = np.append(means_x[1:], x[-1])
+    next_y = np.concatenate([means_y[:, 1:], y[:, -1:]], axis=1)
+
+    rows = np.arange(y.shape[0])
+    picked = np.empty((y.shape[0], n_out), dtype=np.int64)
+    picked[:, 0], picked[:, -1] = 0, n - 1
+    previous = picked[:, 0].copy()
+    for i, (lo, size) in enumerate(zip(starts, sizes)):
+        hi = lo + size
+        ax, ay = x[previous][:, None], y[rows, previous][:, None]
+        area = np.abs((ax - next_x[i]) * (y[:, lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[:, i:i + 1] - ay))
+        # A valid point beats a missing one even when the triangle is undefined (missing neighbour)
+        area = np.where(np.isnan(area), np.where(missing[:, lo:hi], -1.0, 0.0), area)
+        previous = lo + area.argmax(axis=1)
+        picked[:, i + 1] = previous
+    return picked
+
+
+class WeeklySeries:
+    """Weekly sales per store and in total, on one sorted week axis.
+
+    ``sales`` is a ``stores x weeks`` float64 matrix with NaN where a store has no row for a week;
+    ``total`` sums the stores that have one.
+    """
+
+    def __init__(self, weeks: np.ndarray, stores: np.ndarray, sales: np.ndarray):
+        self.weeks = np.asarray(weeks, dtype='datetime64[D]')
+        self.stores = np.asarray(stores, dtype=np.int64)
+        self.sales = np.asarray(sales, dtype=np.float64)
+        reported = ~np.isnan(self.sales)
+        self.total = np.where(reported.any(axis=0), np.nansum(self.sales, axis=0), np.nan) if len(self.stores) else np.full(len(self.weeks), np.nan)
+        self._store_rows = {store: row for row, store in enumerate(self.stores.tolist())}
+
+    @classmethod
+    def from_totals(cls, totals: pd.Series) -> 'WeeklySeries':
+        """Build from weekly sales indexed by ``(Store, Date)`` (dates as datetime64)."""
+        matrix = totals.unstack(DATE_COLUMN).sort_index().sort_index(axis=1)
+        return cls(matrix.columns.to_numpy(dtype='datetime64[D]'), matrix.index.to_numpy(), matrix.to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'WeeklySeries':
+        """Aggregate raw rows (``Store``, ``Date``, ``Weekly_Sales``); rows for the same store and week are summed."""
+        return cls.from_totals(_weekly_totals(df))
+
+    @classmethod
+    def from_csv(cls, path, chunk_rows: int = 500_000) -> 'WeeklySeries':
+        """Aggregate a sales CSV chunk by chunk, so only the per-store weekly totals are ever held in memory."""
+        partials = [_weekly_totals(chunk) for chunk in iter_sales_csv(path, chunk_rows, usecols=['Store', DATE_COLUMN, TARGET_COLUMN])]
+        if not partials:
+            return cls(np.array([], dtype='datetime64[D]'), np.array([], dtype=np.int64), np.empty((0, 0)))
+        totals = pd.concat(partials).groupby(level=['Store', DATE_COLUMN], sort=False).sum()
+        series = cls.from_totals(totals)
+        logger.info("Weekly chart series built from %s: %d stores x %d weeks", path, len(series.stores), len(series.weeks))
+        return series
+
+    def _window(self, start=None, end=None) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.weeks, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.weeks) if end is None else int(np.searchsorted(self.weeks, np.datetime64(end, 'D'), side='right'))
+        return slice(lo, max(lo, hi))
+
+    def downsample(self, width: int, stores=None, start: str = None, end: str = None, total: bool = True) -> dict:
+        """The series to draw in a chart ``width`` points wide.
+
+        ``stores`` selects store series (none by default), ``total`` adds the all-store total, and
+        ``start``/``end`` (inclusive ISO dates) restrict the weeks. Raises ``ValueError`` for
+        unknown stores.
+        """
+        stores = list(dict.fromkeys(int(store) for store in stores or ()))
+        unknown = [store for store in stores if store not in self._store_rows]
+        if unknown:
+            raise ValueError(f"Unknown store IDs {unknown}")
+        window = self._window(start, end)
+        names = (['total'] if total else []) + [f"Store {store}" for store in stores]
+        matrix = self.sales[[self._store_rows[store] for store in stores], window]
+        if total:
+            matrix = np.vstack([self.total[window], matrix])
+        weeks = self.weeks[window]
+        picked = lttb(weeks.astype(np.int64), matrix, width) if len(weeks) else np.empty((len(names), 0), dtype=np.int64)
+
+        series = []
+        for name, store, values, idx in zip(names, ([None] if total else []) + stores, matrix, picked):
+            idx = idx[~np.isnan(values[idx])]
+            series.append({
+                'name': name,
+                'store': store,
+                'dates': np.datetime_as_string(weeks[idx], unit='D').tolist(),
+                'values': values[idx].tolist(),
+            })
+        return {
+            'start': str(weeks[0]) if len(weeks) else None,
+            'end': str(weeks[-1]) if len(weeks) else None,
+            'weeks': len(weeks),
+            'series': series,
+        }
+
+
+def _weekly_totals(df: pd.DataFrame) -> pd.Series:
+    dates = df[DATE_COLUMN]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, format=DATE_FORMAT, errors='coerce')
+    frame = pd.DataFrame({'Store': df['Store'], DATE_COLUMN: dates, TARGET_COLUMN: df[TARGET_COLUMN].astype(np.float64)})
+    frame = frame.dropna(subset=['Store', DATE_COLUMN, TARGET_COLUMN])
+    frame['Store'] = frame['Store'].astype(np.int64)
+    return frame.groupby(['Store', DATE_COLUMN], sort=False)[TARGET_COLUMN].sum()
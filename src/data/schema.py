@@ -0,0 +1,123 @@
+"""Column schema for the Walmart sales data.
+
+Every frame that flows through loading, preprocessing and the API is kept in these compact dtypes:
+int16 store IDs, uint8 flags and date parts, float32 measures. Compared with pandas' default
+int64/float64/str columns this takes roughly a quarter of the memory per row.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMN = 'Date'
+DATE_FORMAT = '%d-%m-%Y'
+TARGET_COLUMN = 'Weekly_Sales'
+
+MEASURE_COLUMNS = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
+CATEGORICAL_COLUMNS = ['Store', 'month', 'weekday', 'year', 'Holiday_Flag']
+
+RAW_DTYPES = {
+    'Store': 'int16',
+    'Holiday_Flag': 'uint8',
+    **{col: 'float32' for col in MEASURE_COLUMNS},
+}
+DATE_FEATURE_DTYPES = {'weekday': 'uint8', 'month': 'uint8', 'year': 'uint16'}
+SCHEMA = {**RAW_DTYPES, **DATE_FEATURE_DTYPES}
+# What read_sales_csv parses RAW_DTYPES columns as before narrowing them
+_PARSE_DTYPES = {col: 'int64' if np.dtype(dtype).kind in 'iu' else dtype for col, dtype in RAW_DTYPES.items()}
+
+# Dtype of the binary-encoded category bits produced by preprocessing
+ENCODED_DTYPE = 'uint8'
+# Dtype of the scaled feature matrix handed to the models
+FEATURE_DTYPE = np.float32
+
+
+def feature_source(name: str) -> tuple:
+    """``(source column, bit index)`` of a model feature.
+
+    Measures map to themselves with bit ``None``; binary-encoded bits such as ``Store_3`` map to
+    ``('Store', 3)``. Anything else is ``(None, None)``.
+    """
+    if name in MEASURE_COLUMNS and name != TARGET_COLUMN:
+        return name, None
+    prefix, _, bit = name.rpartition('_')
+    if prefix in CATEGORICAL_COLUMNS and bit.isdigit():
+        return prefix, int(bit)
+    return None, None
+
+
+def coerce_column(values: pd.Series, dtype: str) -> pd.Series:
+    """Cast one column to ``dtype``.
+
+    Non-numeric input is parsed first (unparseable values become NaN). Values outside the range of
+    an integer dtype become NaN too, instead of wrapping around. Integer dtypes cannot hold NaN, so a
+    column with missing values falls back to float32 rather than failing.
+    """
+    if values.dtype == dtype:
+        return values
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values, errors='coerce')
+    if np.dtype(dtype).kind in 'iu':
+        limits = np.iinfo(dtype)
+        out_of_range = (values < limits.min) | (values > limits.max)
+        if out_of_range.any():
+            logger.warning("Column %s has %d values outside the %s range, treating them as missing",
+                           values.name, int(out_of_range.sum()), dtype)
+            values = values.mask(out_of_range)
+        if values.isna().any():
+            logger.debug("Column %s has missing values, keeping it as float32 instead of %s", values.name, dtype)
+            return values.astype('float32')
+    return values.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame, dtypes: dict = None) -> pd.DataFrame:
+    """Downcast the schema columns present in ``df`` in place and return it."""
+    for col, dtype in (dtypes or SCHEMA).items():
+        if col in df.columns:
+            df[col] = coerce_column(df[col], dtype)
+    return df
+
+
+def read_sales_csv(source, parse_dates: bool = False, **kwargs) -> pd.DataFrame:
+    """Read a Walmart-shaped CSV directly into the compact dtypes.
+
+    ``source`` is a path or a file-like object. With ``parse_dates`` the ``Date`` column is parsed
+    (``dd-mm-YYYY``) to datetime64; otherwise it is left as text for the caller to parse.
+    """
+    seekable = hasattr(source, 'seek')
+    start = source.tell() if seekable else None
+    try:
+        # Integer columns are parsed as int64 and narrowed by apply_schema, which range-checks them;
+        # parsing straight into int16/uint8 would wrap out-of-range values around
+        df = apply_schema(pd.read_csv(source, dtype=_PARSE_DTYPES, **kwargs), RAW_DTYPES)
+    except ValueError:
+        # Missing or malformed values in an integer column: read loosely and coerce column by column
+        if seekable:
+            source.seek(start)
+        df = apply_schema(pd.read_csv(source, **kwargs), RAW_DTYPES)
+    if parse_dates and DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT)
+    return df
+
+
+def iter_sales_csv(source, chunk_rows: int, parse_dates: bool = False, **kwargs):
+    """Read a Walmart-shaped CSV ``chunk_rows`` rows at a time, each chunk in the compact dtypes.
+
+    Chunks are read loosely and coerced column by column, so a missing value far into the file
+    cannot fail the strict read after earlier chunks have been consumed.
+    """
+    with pd.read_csv(source, chunksize=chunk_rows, **kwargs) as reader:
+        for chunk in reader:
+            chunk = apply_schema(chunk, RAW_DTYPES)
+            if parse_dates and DATE_COLUMN in chunk.columns:
+                chunk[DATE_COLUMN] = pd.to_datetime(chunk[DATE_COLUMN], format=DATE_FORMAT)
+            yield chunk
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    """Deep memory footprint of ``df`` per row (including Python string payloads)."""
+    if len(df) == 0:
+        return 0.0
+    return float(df.memory_usage(deep=True, index=False).sum()) / len(df)
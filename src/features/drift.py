@@ -0,0 +1,155 @@
+"""Input drift monitoring against histograms of the training data.
+
+At training time ``build_reference`` bins every model input of the preprocessed (unscaled) training
+frame: measures into quantile bins with open-ended outer bins, categoricals into one bin per
+category of the codebook plus an "unknown" bin (values the codebook has not seen encode as all-zero
+bits). At serving time ``DriftMonitor.observe`` adds each scored batch to histograms with the same
+bins, which costs one ``searchsorted``/``bincount`` per column per batch. The counts are computed
+outside the lock; the lock only guards the addition into the running totals.
+
+``DriftMonitor.report`` compares the two with the population stability index (PSI) and, for
+measures, the Kolmogorov-Smirnov distance between the binned distributions.
+"""
+import logging
+import threading
+import time
+
+import numpy as np
+
+try:
+    from ..data.schema import CATEGORICAL_COLUMNS, MEASURE_COLUMNS, TARGET_COLUMN, feature_source
+except ImportError:  # imported as top-level ``features`` package by the API
+    from data.schema import CATEGORICAL_COLUMNS, MEASURE_COLUMNS, TARGET_COLUMN, feature_source
+
+logger = logging.getLogger("drift")
+
+DEFAULT_BINS = 20
+# Added to every bin share so that empty bins do not make the PSI infinite
+PSI_EPSILON = 1e-4
+UNKNOWN = 'unknown'
+
+
+def _bit_columns(columns, name: str) -> list:
+    """The binary-encoded bit columns of categorical ``name`` in bit order (most significant first)."""
+    bits = {}
+    for col in columns:
+        source, bit = feature_source(col)
+        if source == name and bit is not None:
+            bits[bit] = col
+    return [bits[bit] for bit in sorted(bits)]
+
+
+def _decode_bits(df, bit_columns) -> np.ndarray:
+    """Category ordinals (0 = unknown) from binary-encoded bit columns."""
+    ordinals = np.zeros(len(df), dtype=np.int64)
+    for col in bit_columns:
+        ordinals <<= 1
+        ordinals |= df[col].to_numpy()
+    return ordinals
+
+
+def _bin_numeric(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+
+def build_reference(df, codebook: dict, bins: int = DEFAULT_BINS) -> dict:
+    """Reference histograms of the preprocessed training frame ``df`` (unscaled measures, encoded bits).
+
+    Returns ``{feature: {'kind', 'edges' or 'labels', 'counts'}}``.
+    """
+    reference = {}
+    for col in MEASURE_COLUMNS:
+        if col == TARGET_COLUMN or col not in df.columns:
+            continue
+        values = df[col].to_numpy(dtype=np.float64)
+        # Interior edges at the training quantiles; the outer bins are open-ended
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        reference[col] = {'kind': 'numeric', 'edges': edges, 'counts': _bin_numeric(values, edges)}
+    for col in CATEGORICAL_COLUMNS:
+        bit_columns = _bit_columns(df.columns, col)
+        if not bit_columns or col not in (codebook or {}):
+            continue
+        labels = [UNKNOWN] + [str(value) for value in codebook[col]]
+        ordinals = _decode_bits(df, bit_columns)
+        counts = np.bincount(np.minimum(ordinals, len(labels) - 1), minlength=len(labels))
+        reference[col] = {'kind': 'categorical', 'labels': labels, 'bits': bit_columns, 'counts': counts}
+    return reference
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population stability index between two histograms with the same bins."""
+    p = expected / max(expected.sum(), 1) + PSI_EPSILON
+    q = actual / max(actual.sum(), 1) + PSI_EPSILON
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_distance(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Largest gap between the two cumulative distributions, evaluated at the bin edges."""
+    p = np.cumsum(expected) / max(expected.sum(), 1)
+    q = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(q - p)))
+
+
+class DriftMonitor:
+    """Running histograms of scored inputs, binned like the training reference."""
+
+    def __init__(self, reference: dict, psi_thresholds=(0.1, 0.25), min_rows: int = 100):
+        self.reference = reference
+        self.psi_thresholds = tuple(psi_thresholds)
+        self.min_rows = min_rows
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {name: np.zeros_like(ref['counts']) for name, ref in self.reference.items()}
+            self.rows = 0
+            self.since = time.time()
+
+    def observe(self, df):
+        """Add a preprocessed batch (before scaling) to the live histograms."""
+        if len(df) == 0:
+            return
+        batch = {}
+        for name, ref in self.reference.items():
+            if ref['kind'] == 'numeric':
+                if name in df.columns:
+                    batch[name] = _bin_numeric(df[name].to_numpy(), ref['edges'])
+            elif all(col in df.columns for col in ref['bits']):
+                ordinals = _decode_bits(df, ref['bits'])
+                batch[name] = np.bincount(np.minimum(ordinals, len(ref['labels']) - 1), minlength=len(ref['labels']))
+        with self._lock:
+            for name, counts in batch.items():
+                self._counts[name] += counts
+            self.rows += len(df)
+
+    def _status(self, value: float, rows: int) -> str:
+        if rows < self.min_rows:
+            return 'insufficient_data'
+        moderate, significant = self.psi_thresholds
+        return 'significant' if value >= significant else 'moderate' if value >= moderate else 'stable'
+
+    def report(self) -> dict:
+        """PSI (and KS for measures) of every feature, plus the live and reference bin shares."""
+        with self._lock:
+            counts = {name: values.copy() for name, values in self._counts.items()}
+            rows, since = self.rows, self.since
+        features = {}
+        for name, ref in self.reference.items():
+            live = counts[name]
+            value = psi(ref['counts'], live)
+            entry = {
+                'kind': ref['kind'],
+                'rows': int(live.sum()),
+                'psi': value,
+                'ks': ks_distance(ref['counts'], live) if ref['kind'] == 'numeric' else None,
+                'status': self._status(value, int(live.sum())),
+                'reference_share': (ref['counts'] / max(ref['counts'].sum(), 1)).tolist(),
+                'live_share': (live / max(live.sum(), 1)).tolist(),
+            }
+            if ref['kind'] == 'numeric':
+                entry['edges'] = ref['edges'].tolist()
+            else:
+                entry['labels'] = ref['labels']
+            features[name] = entry
+        return {'rows': rows, 'since': since, 'features': features}
@@ -1,179 +1,283 @@
 import pandas as pd
 import numpy as np
-import category_encoders as ce
 import logging
-from sklearn.preprocessing import StandardScaler
+from typing import TYPE_CHECKING
+
+# StandardScaler (which pulls in most of sklearn) is imported on first use so that importing
+# this module stays cheap for API workers
+if TYPE_CHECKING:
+    from sklearn.preprocessing import StandardScaler
+
+try:
+    from ..data.schema import (CATEGORICAL_COLUMNS, DATE_COLUMN, DATE_FORMAT, ENCODED_DTYPE, FEATURE_DTYPE,
+                               MEASURE_COLUMNS, SCHEMA, TARGET_COLUMN, coerce_column)
+    from ..utils.metrics import DEFAULT_FILLS, SCALER_FALLBACKS, timed
+except ImportError:  # imported as top-level ``features`` package by the API
+    from data.schema import (CATEGORICAL_COLUMNS, DATE_COLUMN, DATE_FORMAT, ENCODED_DTYPE, FEATURE_DTYPE,
+                             MEASURE_COLUMNS, SCHEMA, TARGET_COLUMN, coerce_column)
+    from utils.metrics import DEFAULT_FILLS, SCALER_FALLBACKS, timed
 
 logger = logging.getLogger("preprocessor")
 
-def remove_outliers_iqr(df: pd.DataFrame, columns=None) -> pd.DataFrame:
-    """Remove outliers from specified columns using the IQR method."""
-    df_clean = df.copy()
-    
+def _outlier_mask(df: pd.DataFrame, columns, bounds: dict = None) -> tuple:
+    """Rows inside the IQR fences of every column, and the ``{column: (low, high)}`` fences used."""
+    # Columns are filtered one after another (each column's quartiles are computed on the rows kept
+    # so far), but only a boolean mask is updated; the frame itself is sliced once at the end
+    keep = np.ones(len(df), dtype=bool)
+    fences = {}
     for col in columns:
         if col not in df.columns:
-            logger.warning(f"Column {col} not found in dataframe")
+            logger.warning("Column %s not found in dataframe", col)
             continue
-            
-        Q1 = df_clean[col].quantile(0.25)
-        Q3 = df_clean[col].quantile(0.75)
-        IQR = Q3 - Q1
-        mask = (df_clean[col] >= Q1 - 1.5 * IQR) & (df_clean[col] <= Q3 + 1.5 * IQR)
-        df_clean = df_clean[mask]
-    
-    logger.info(f"Removed outliers, shape after: {df_clean.shape}")
-    return df_clean.reset_index(drop=True)
-
-def preprocess_sales_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Preprocess the Walmart sales data: datetime, features, encoding, cleaning."""
-    logger.info(f"Starting preprocessing, initial shape: {df.shape}")
-    logger.info(f"Input columns: {df.columns.tolist()}")
-    
-    # Make a copy to avoid modifying the original
-    df = df.copy()
-    
-    # Handle date conversion
-    if 'Date' in df.columns:
-        logger.info("Converting Date column for preprocessing")
-        try:
-            original_dates = df['Date'].copy() # Keep original for fallback
+
+        values = df[col].to_numpy()
+        if bounds is not None:
+            if col not in bounds:
+                continue
+            low, high = bounds[col]
+        else:
+            Q1, Q3 = np.nanquantile(values[keep], [0.25, 0.75]) if keep.any() else (np.nan, np.nan)
+            IQR = Q3 - Q1
+            low, high = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+        keep &= (values >= low) & (values <= high)
+        fences[col] = (float(low), float(high))
+    return keep, fences
+
+
+def iqr_bounds(df: pd.DataFrame, columns) -> dict:
+    """The ``{column: (low, high)}`` fences ``remove_outliers_iqr`` would apply to ``df``.
+
+    Computed once on the whole data (or a sample of it), they let chunks of a larger dataset be
+    filtered consistently (see ``preprocess_sales_data(outlier_bounds=...)``).
+    """
+    return _outlier_mask(df, columns)[1]
+
+
+@timed("preprocess.outliers")
+def remove_outliers_iqr(df: pd.DataFrame, columns=None, keep_index: bool = False, bounds: dict = None) -> pd.DataFrame:
+    """Remove outliers from specified columns using the IQR method.
+
+    The fences are computed from ``df`` unless fixed ``bounds`` (from ``iqr_bounds``) are given.
+    The result is renumbered from 0 unless ``keep_index`` is set, in which case the kept rows
+    keep their labels from ``df``.
+    """
+    keep, _ = _outlier_mask(df, columns, bounds)
+    df_clean = df[keep] if not keep.all() else df
+    logger.debug("Removed outliers, shape after: %s", df_clean.shape)
+    return df_clean if keep_index else df_clean.reset_index(drop=True)
+
+def binary_encode(values: pd.Series, categories=None) -> dict:
+    """Binary-encode one categorical column into ``{name}_0 .. {name}_k`` uint8 bit columns.
+
+    With ``categories`` (the column's entry in a codebook from ``fit_codebook``) category ``i`` gets
+    code ``i + 1`` and unknown or missing values encode as all zeros, so a row's bits do not depend
+    on the other rows. Without it the categories are fitted on ``values`` themselves, exactly as
+    ``category_encoders.BinaryEncoder(cols=[name]).fit_transform`` did on the string-converted
+    column (codes 1..n in order of first appearance, missing values as one extra category after
+    all others). Codes are written most significant bit first.
+    """
+    if categories is not None:
+        codes = pd.Index(categories).get_indexer(values)
+        n_categories = len(categories)
+    else:
+        codes, uniques = pd.factorize(values)
+        n_categories = len(uniques)
+        missing = codes < 0
+        if missing.any():
+            codes[missing] = n_categories
+            n_categories += 1
+    ordinals = codes.astype(np.int64) + 1
+    digits = n_categories.bit_length()
+    shifts = np.arange(digits - 1, -1, -1, dtype=np.int64)
+    bits = ((ordinals[:, None] >> shifts) & 1).astype(ENCODED_DTYPE)
+    return {f"{values.name}_{i}": bits[:, i] for i in range(digits)}
+
+# Values used when a required input column is missing altogether
+_COLUMN_DEFAULTS = {'Store': 1, 'Temperature': 70.0, 'Fuel_Price': 3.5, 'CPI': 210.0, 'Unemployment': 6.5, 'Holiday_Flag': 0}
+_DATE_DEFAULTS = {'weekday': 0, 'month': 1, 'year': 2023}
+
+def _date_features(df: pd.DataFrame) -> dict:
+    """Extract weekday/month/year from the Date column, falling back to constants on failure."""
+    if DATE_COLUMN not in df.columns:
+        logger.warning("No Date column found for preprocessing.")
+        DEFAULT_FILLS.inc(len(df), column=DATE_COLUMN)
+        return {}
+    logger.debug("Converting Date column for preprocessing")
+    try:
+        dates = df[DATE_COLUMN]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
             try:
-                df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='raise')
-                logger.info("Parsed 'Date' column with format '%d-%m-%Y' for preprocessing.")
+                with timed("preprocess.dates"):
+                    dates = pd.to_datetime(dates, format=DATE_FORMAT, errors='raise')
+                logger.debug("Parsed 'Date' column with format '%d-%m-%Y' for preprocessing.")
             except ValueError:
                 logger.warning("Failed to parse 'Date' with format '%d-%m-%Y' for preprocessing")
-            
-            if df['Date'].isna().any():
-                logger.warning("Some dates could not be parsed to datetime for preprocessing")
-            
-            # Extract date features
-            df['weekday'] = df['Date'].dt.weekday
-            df['month'] = df['Date'].dt.month
-            df['year'] = df['Date'].dt.year
-            df.drop(['Date'], axis=1, inplace=True) # Drop the original 'Date' column after extracting features
-            logger.info("Date conversion and feature extraction for preprocessing successful.")
-        except Exception as e:
-            logger.error(f"Error in date conversion during preprocessing: {str(e)}")
-            # Fallback: if date processing fails, ensure columns exist to prevent downstream errors
-            if 'weekday' not in df.columns: df['weekday'] = 0
-            if 'month' not in df.columns: df['month'] = 1
-            if 'year' not in df.columns: df['year'] = 2023 # Or some other default
-            if 'Date' in df.columns: # If 'Date' still exists and caused error, drop it
-                df.drop(['Date'], axis=1, inplace=True, errors='ignore')
-    else:
-        logger.warning("No Date column found for preprocessing.")
-    
-    # Ensure required columns exist
-    required_columns = ['Store', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment', 'Holiday_Flag']
-    for col in required_columns:
+
+        if dates.isna().any():
+            logger.warning("Some dates could not be parsed to datetime for preprocessing")
+            DEFAULT_FILLS.inc(int(dates.isna().sum()), column=DATE_COLUMN)
+
+        features = {name: getattr(dates.dt, name).rename(name) for name in ('weekday', 'month', 'year')}
+        logger.debug("Date conversion and feature extraction for preprocessing successful.")
+        return features
+    except Exception as e:
+        logger.error("Error in date conversion during preprocessing: %s", e)
+        # Fallback: if date processing fails, use constants to prevent downstream errors
+        DEFAULT_FILLS.inc(len(df), column=DATE_COLUMN)
+        return dict(_DATE_DEFAULTS)
+
+def _source_columns(df: pd.DataFrame) -> dict:
+    """The measure, target and categorical columns of ``df`` (defaults filled in), in schema dtypes."""
+    # Gather only the columns that are used, already downcast; nothing else of the input is copied
+    columns = {}
+    for col, default in _COLUMN_DEFAULTS.items():
         if col not in df.columns:
-            logger.warning(f"Required column {col} not found, adding with default values")
-            if col == 'Store':
-                df[col] = 1
-            elif col == 'Temperature':
-                df[col] = 70.0
-            elif col == 'Fuel_Price':
-                df[col] = 3.5
-            elif col == 'CPI':
-                df[col] = 210.0
-            elif col == 'Unemployment':
-                df[col] = 6.5
-            elif col == 'Holiday_Flag':
-                df[col] = 0
-    
-    # Convert categorical features
-    cf = ['Store', 'month', 'weekday', 'year', 'Holiday_Flag']
-
-    for col in cf:
-        if col in df.columns:
-            logger.info(f"Converting {col} to string for Binary encoding")
-            df[col] = df[col].astype(str)
-    
+            logger.warning("Required column %s not found, adding with default values", col)
+            DEFAULT_FILLS.inc(len(df), column=col)
+            columns[col] = pd.Series(default, index=df.index, name=col)
+        else:
+            columns[col] = df[col]
+    if TARGET_COLUMN in df.columns:
+        columns[TARGET_COLUMN] = df[TARGET_COLUMN]
+    for col, values in _date_features(df).items():
+        columns[col] = values if isinstance(values, pd.Series) else pd.Series(values, index=df.index, name=col)
+    return {col: coerce_column(values, SCHEMA[col]) for col, values in columns.items()}
+
+def fit_codebook(df: pd.DataFrame) -> dict:
+    """Categories of every categorical column in order of first appearance.
+
+    Fitted on the training data and stored with the models, it pins the binary encoding used
+    at training time for everything scored later (see ``binary_encode``).
+    """
+    columns = _source_columns(df)
+    return {col: pd.unique(columns[col].dropna().to_numpy()) for col in CATEGORICAL_COLUMNS if col in columns}
+
+@timed("preprocess")
+def preprocess_sales_data(df: pd.DataFrame, codebook: dict = None, keep_index: bool = False,
+                          outlier_bounds: dict = None, drop_rows: bool = True) -> pd.DataFrame:
+    """Preprocess the Walmart sales data: datetime, features, encoding, cleaning.
+
+    The input frame is not modified. Measures come out as float32 and the binary-encoded
+    category bits as uint8 (see ``data.schema``). ``codebook`` (from ``fit_codebook``) fixes
+    the category encoding; without it the encoding is fitted on ``df``. Duplicate and outlier
+    rows are dropped; with ``keep_index`` every output row keeps the index label of the input
+    row it came from, otherwise the output is renumbered from 0. ``outlier_bounds`` (from
+    ``iqr_bounds``) replaces the outlier fences computed from ``df`` itself. With ``drop_rows=False``
+    no row is dropped, so every input row is scored whatever the other rows are.
+    """
+    logger.debug("Starting preprocessing, initial shape: %s", df.shape)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Input columns: %s", df.columns.tolist())
+
+    columns = _source_columns(df)
+    cf = [col for col in CATEGORICAL_COLUMNS if col in columns]
+    nf = [col for col in MEASURE_COLUMNS if col in columns]
+
+    # Remove duplicates before encoding: the encoding is one-to-one and keeps the order in which
+    # categories first appear, so this drops the same rows as deduplicating the encoded frame while
+    # hashing 10 compact columns instead of ~20 encoded ones
+    logger.debug("Removing duplicates and handling missing values")
+    index = df.index
+    if drop_rows:
+        unique_rows = ~pd.DataFrame({col: columns[col] for col in nf + cf}).duplicated().to_numpy()
+        if not unique_rows.all():
+            columns = {col: values[unique_rows] for col, values in columns.items()}
+            index = index[unique_rows]
+    for col in nf:
+        if columns[col].hasnans:
+            DEFAULT_FILLS.inc(int(columns[col].isna().sum()), column=col)
+            columns[col] = columns[col].fillna(0)
+
     # Binary encoding categorical features
-    logger.info("Performing Binary encoding")
-    nf = ['Weekly_Sales', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment']
-
-    df3 = df.copy(deep=True)
-    encoder = ce.BinaryEncoder(cols=cf, drop_invariant=False)
-    df_encoded = encoder.fit_transform(df3[cf])
-    df3 = pd.concat([df3[nf], df_encoded], axis=1)
-    df = df3.copy(deep=True)
-    
-    # Handle duplicates and missing values
-    logger.info("Removing duplicates and handling missing values")
-    df = df.drop_duplicates()
-    df = df.fillna(0)
-    
+    logger.debug("Performing Binary encoding")
+    with timed("preprocess.encode"):
+        encoded = {}
+        for col in cf:
+            encoded.update(binary_encode(columns[col], codebook.get(col) if codebook else None))
+        df = pd.DataFrame({**{col: columns[col].to_numpy() for col in nf}, **encoded}, index=index)
+
     # Remove outliers from numerical columns
-    logger.info("Removing outliers")
+    logger.debug("Removing outliers")
     try:
-        numerical_cols = [col for col in nf
-                         if col in df.columns]
-        if numerical_cols:
-            df = remove_outliers_iqr(df, columns=numerical_cols)
+        if not drop_rows:
+            df = df if keep_index else df.reset_index(drop=True)
+        elif nf:
+            df = remove_outliers_iqr(df, columns=nf, keep_index=keep_index, bounds=outlier_bounds)
         else:
             logger.warning("No numerical columns for outlier removal")
     except Exception as e:
-        logger.error(f"Error in outlier removal: {str(e)}")
-        
-    logger.info(f"Preprocessing complete, final shape: {df.shape}")
-    logger.info(f"Output columns: {df.columns.tolist()}")
-    
+        logger.error("Error in outlier removal: %s", e)
+
+    logger.info("Preprocessing complete, final shape: %s", df.shape)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Output columns: %s", df.columns.tolist())
+
     return df
 
-def scale_features(df: pd.DataFrame, scaler: StandardScaler = None) -> tuple[pd.DataFrame, StandardScaler]:
-    """Scale numerical features using StandardScaler."""
-    logger.info("Scaling numerical features")
-    
-    # Create a copy to avoid modifying the original
-    df_scaled = df.copy()
-    
+@timed("scale")
+def scale_features(df: pd.DataFrame, scaler: "StandardScaler" = None) -> tuple[pd.DataFrame, "StandardScaler"]:
+    """Scale numerical features using StandardScaler.
+
+    Returns a new float32 frame (``Weekly_Sales``, if present, is carried over unscaled as the
+    last column); the input frame is not modified.
+    """
+    logger.debug("Scaling numerical features")
+
     # Handle the case of Weekly_Sales special - exclude it from scaling if present
-    has_weekly_sales = 'Weekly_Sales' in df_scaled.columns
+    has_weekly_sales = 'Weekly_Sales' in df.columns
     if has_weekly_sales:
-        logger.info("'Weekly_Sales' found in input data for scaling - will be preserved unscaled")
-        weekly_sales_values = df_scaled['Weekly_Sales'].copy()
-        df_scaled_without_target = df_scaled.drop('Weekly_Sales', axis=1)
+        logger.debug("'Weekly_Sales' found in input data for scaling - will be preserved unscaled")
+        df_without_target = df.drop(columns='Weekly_Sales')
     else:
-        df_scaled_without_target = df_scaled
-    
+        df_without_target = df
+
     # Select only numerical columns for scaling
-    nf = df_scaled_without_target.select_dtypes(include=np.number).columns.tolist()
-    
+    nf = df_without_target.select_dtypes(include=np.number).columns.tolist()
+
     if scaler is None:
         # Training mode: fit and transform
+        from sklearn.preprocessing import StandardScaler
         scaler = StandardScaler()
         fit_new_scaler = True
         logger.info("No scaler provided, creating and fitting a new one")
     else:
         # Prediction mode: transform only
         fit_new_scaler = False
-        logger.info("Using provided pre-fitted scaler for transformation only")
+        logger.debug("Using provided pre-fitted scaler for transformation only")
 
     if not nf:
         logger.warning("No numerical features found to scale. Returning original DataFrame and scaler.")
-        return df_scaled, scaler # Return the original DataFrame and the scaler
+        SCALER_FALLBACKS.inc(len(df), reason="no_numeric_features")
+        return df, scaler # Return the original DataFrame and the scaler
 
     try:
+        # The arithmetic is done in float64 and only the result is stored as float32: tree split
+        # thresholds sit exactly on scaled values of the 0/1 category bits, and scaling in float32
+        # can land one ULP away from them
+        X = df_without_target[nf].astype(np.float64)
         if fit_new_scaler:
             # Fit and transform the specified columns (training mode)
-            df_scaled_without_target[nf] = scaler.fit_transform(df_scaled_without_target[nf])
-            logger.info(f"Successfully fit and transformed {len(nf)} features with new scaler: {nf}")
+            scaled_values = scaler.fit_transform(X)
+            logger.info("Successfully fit and transformed %d features with new scaler: %s", len(nf), nf)
         else:
             # Transform only with existing scaler (prediction mode)
-            df_scaled_without_target[nf] = scaler.transform(df_scaled_without_target[nf])
-            logger.info(f"Successfully transformed {len(nf)} features with pre-fitted scaler: {nf}")
-        
+            scaled_values = scaler.transform(X)
+            logger.debug("Successfully transformed %d features with pre-fitted scaler: %s", len(nf), nf)
+
+        df_result = pd.DataFrame(scaled_values.astype(FEATURE_DTYPE, copy=False), columns=nf, index=df.index)
+        # Non-numeric columns (if any) pass through untouched, in their original position
+        for position, col in enumerate(df_without_target.columns):
+            if col not in df_result.columns:
+                df_result.insert(position, col, df_without_target[col])
+
         # If Weekly_Sales was in the original dataframe, add it back unscaled
         if has_weekly_sales:
-            df_result = df_scaled_without_target.copy()
-            df_result['Weekly_Sales'] = weekly_sales_values
-            logger.info("Added back 'Weekly_Sales' column unscaled")
-            return df_result, scaler
-        else:
-            return df_scaled_without_target, scaler
+            df_result['Weekly_Sales'] = df['Weekly_Sales']
+            logger.debug("Added back 'Weekly_Sales' column unscaled")
+        return df_result, scaler
     except Exception as e:
-        logger.error(f"Error in feature scaling: {str(e)}")
+        logger.error("Error in feature scaling: %s", e)
         logger.warning("Returning original DataFrame due to error during scaling.")
+        SCALER_FALLBACKS.inc(len(df), reason="scaling_error")
         # Return original dataframe and the scaler in case of error
         return df, scaler
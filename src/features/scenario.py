@@ -0,0 +1,180 @@
+"""What-if scenario sweeps scored straight from a parameter grid.
+
+The Cartesian product of the swept parameters is never built as a frame of raw rows. Every model
+feature depends on at most one grid axis (a measure on its own axis, a category bit on its
+category's axis), so its scaled values are computed once per axis value and then gathered into a
+float32 feature matrix, chunk by chunk, which is scored with one model call per chunk.
+"""
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from ..data.schema import DATE_COLUMN, DATE_FORMAT, FEATURE_DTYPE, feature_source
+    from ..utils.metrics import timed
+    from .preprocess import _COLUMN_DEFAULTS, _DATE_DEFAULTS, binary_encode
+except ImportError:  # imported as top-level ``features`` package by the API
+    from data.schema import DATE_COLUMN, DATE_FORMAT, FEATURE_DTYPE, feature_source
+    from utils.metrics import timed
+    from features.preprocess import _COLUMN_DEFAULTS, _DATE_DEFAULTS, binary_encode
+
+logger = logging.getLogger("scenario")
+
+SWEEPABLE_PARAMETERS = ('Store', 'Temperature', 'Fuel_Price', 'CPI', 'Unemployment', 'Holiday_Flag')
+MAX_AXIS_VALUES = 100_000
+
+
+def grid_values(spec) -> np.ndarray:
+    """Values of one grid axis.
+
+    ``spec`` is a list of values or a range ``{"start", "stop", "num"}`` (evenly spaced, both ends
+    included) or ``{"start", "stop", "step"}``.
+    """
+    if isinstance(spec, dict):
+        start, stop = float(spec['start']), float(spec['stop'])
+        if spec.get('num') is not None:
+            values = np.linspace(start, stop, int(spec['num']))
+        elif spec.get('step'):
+            step = float(spec['step'])
+            count = int(math.floor(abs(stop - start) / step + 1e-9)) + 1
+            if count > MAX_AXIS_VALUES:
+                raise ValueError(f"Range from {start} to {stop} in steps of {step} has more than {MAX_AXIS_VALUES} values")
+            values = start + np.sign(stop - start) * step * np.arange(count)
+        else:
+            raise ValueError("A range needs either 'num' or 'step'")
+    else:
+        values = np.asarray(list(spec), dtype=np.float64)
+    if values.size == 0:
+        raise ValueError("Grid axes must have at least one value")
+    if values.size > MAX_AXIS_VALUES:
+        raise ValueError(f"Grid axes are limited to {MAX_AXIS_VALUES} values")
+    if not np.isfinite(values).all():
+        raise ValueError("Grid values must be finite numbers")
+    return values
+
+
+def base_values(base: dict) -> dict:
+    """Raw value of every source column for the base row; missing columns get the preprocessing defaults."""
+    values = {col: float(base.get(col, default)) for col, default in _COLUMN_DEFAULTS.items()}
+    date_parts = dict(_DATE_DEFAULTS)
+    if base.get(DATE_COLUMN):
+        try:
+            date = pd.to_datetime(base[DATE_COLUMN], format=DATE_FORMAT)
+        except ValueError:
+            raise ValueError(f"Date must be formatted as dd-mm-YYYY, got {base[DATE_COLUMN]!r}") from None
+        date_parts = {'weekday': date.weekday(), 'month': date.month, 'year': date.year}
+    for part in date_parts:
+        values[part] = float(base.get(part, date_parts[part]))
+    return values
+
+
+class ScenarioGrid:
+    """A base row swept over the Cartesian product of ``axes``, as model-ready feature rows.
+
+    ``axes`` is a list of ``(parameter, values)``. Measures are rounded to float32 as when they
+    are read, then scaled exactly as ``scale_features`` does (float64 arithmetic, float32 result),
+    so each grid point scores the same as the equivalent row sent through the regular prediction
+    path.
+    """
+
+    def __init__(self, base: dict, axes, feature_names, scaler=None, codebook: dict = None):
+        if codebook is None:
+            raise ValueError("Scenario sweeps need the category codebook stored with the models")
+        self.base = base_values(base)
+        self.axes = [(name, np.asarray(values, dtype=np.float64)) for name, values in axes]
+        self.feature_names = list(feature_names)
+        self.shape = tuple(len(values) for _, values in self.axes)
+        self.size = int(np.prod(self.shape, dtype=np.int64)) if self.axes else 1
+
+        axis_index = {name: i for i, (name, _) in enumerate(self.axes)}
+        scaler_index = {}
+        if scaler is not None and hasattr(scaler, 'feature_names_in_'):
+            scaler_index = {name: i for i, name in enumerate(scaler.feature_names_in_)}
+
+        encoded = {}  # (column, on_axis) -> {bit name: bits}
+        self._tables = []  # per feature: (axis or None, float32 values per axis value, or a scalar)
+        for name in self.feature_names:
+            source, bit = feature_source(name)
+            on_axis = source in axis_index
+            values = self.axes[axis_index[source]][1] if on_axis else np.array([self.base.get(source, 0.0)])
+            if source is None:
+                raw = np.zeros(1)
+            elif bit is None:
+                # Measures are read as float32 (data.schema) before they are scaled in float64
+                raw = values.astype(FEATURE_DTYPE).astype(np.float64)
+            else:
+                if (source, on_axis) not in encoded:
+                    categories = codebook.get(source)
+                    # Swept values must be known; a base value outside the codebook encodes as
+                    # all zeros, exactly as in the regular prediction path
+                    if on_axis:
+                        self._check_categories(source, values, categories)
+                    encoded[source, on_axis] = binary_encode(pd.Series(values, name=source), categories)
+                # A bit the codebook does not produce is always zero, as in the regular path
+                raw = encoded[source, on_axis].get(name, np.zeros(len(values))).astype(np.float64)
+            if name in scaler_index:
+                i = scaler_index[name]
+                raw = (raw - scaler.mean_[i]) / scaler.scale_[i]
+            raw = raw.astype(FEATURE_DTYPE)
+            self._tables.append((axis_index[source], raw) if on_axis else (None, raw[0]))
+
+    @staticmethod
+    def _check_categories(column, values, categories):
+        if categories is None:
+            return
+        unknown = sorted(set(values.tolist()) - set(np.asarray(categories, dtype=np.float64).tolist()))
+        if unknown:
+            raise ValueError(f"{column} values not seen in training: {unknown[:10]}")
+
+    def point(self, flat_index: int) -> dict:
+        """Parameter values of one grid point given its flat (C-order) index."""
+        position = np.unravel_index(flat_index, self.shape) if self.axes else ()
+        return {name: float(values[i]) for (name, values), i in zip(self.axes, position)}
+
+    def features(self, start: int, stop: int) -> np.ndarray:
+        """Feature rows ``start:stop`` of the flattened grid, in model feature order."""
+        # Column-major like the frame values of the regular path: the linear model's dot product
+        # then sums in the same order and its predictions match to the bit
+        X = np.empty((stop - start, len(self._tables)), dtype=FEATURE_DTYPE, order='F')
+        positions = np.unravel_index(np.arange(start, stop), self.shape) if self.axes else ()
+        for j, (axis, values) in enumerate(self._tables):
+            X[:, j] = values if axis is None else values[positions[axis]]
+        return X
+
+
+def score_grid(grid: ScenarioGrid, predict_fn, chunk_rows: int = 262_144) -> np.ndarray:
+    """Score every grid point with ``predict_fn(X)``; returns predictions shaped like the grid."""
+    predictions = np.empty(grid.size, dtype=np.float32)
+    for start in range(0, grid.size, chunk_rows):
+        stop = min(start + chunk_rows, grid.size)
+        with timed("scenario.build"):
+            X = grid.features(start, stop)
+        predictions[start:stop] = predict_fn(X)
+    return predictions.reshape(grid.shape)
+
+
+def summarize_grid(grid: ScenarioGrid, predictions: np.ndarray) -> dict:
+    """Extremes of the sweep and, per swept parameter, the mean/min/max prediction at each value."""
+    flat = predictions.reshape(-1)
+    curves = []
+    for axis, (name, values) in enumerate(grid.axes):
+        others = tuple(i for i in range(predictions.ndim) if i != axis)
+        curves.append({
+            'parameter': name,
+            'values': values.tolist(),
+            'mean': predictions.mean(axis=others, dtype=np.float64).tolist(),
+            'min': predictions.min(axis=others).astype(np.float64).tolist(),
+            'max': predictions.max(axis=others).astype(np.float64).tolist(),
+        })
+    lowest, highest = int(flat.argmin()), int(flat.argmax())
+    return {
+        'points': grid.size,
+        'min_prediction': float(flat[lowest]),
+        'max_prediction': float(flat[highest]),
+        'mean_prediction': float(flat.mean(dtype=np.float64)),
+        'min_scenario': grid.point(lowest),
+        'max_scenario': grid.point(highest),
+        'curves': curves,
+    }
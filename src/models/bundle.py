@@ -0,0 +1,106 @@
+"""Consolidated model bundle: every trained model plus the scaler in a single joblib file.
+
+The bundle is written uncompressed so that ``joblib.load(..., mmap_mode='r')`` can memory-map the
+NumPy arrays it contains instead of copying them into each worker's heap.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+import joblib
+from joblib.numpy_pickle import NumpyUnpickler, _validate_fileobject_and_memmap
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILENAME = 'model_bundle.joblib'
+MODEL_FILES = {'linear': 'linear_regression_model.pkl', 'xgboost': 'xgboost_model.pkl', 'ensemble': 'xgboost_ensemble.pkl'}
+SCALER_FILE = 'standard_scaler.pkl'
+CODEBOOK_FILE = 'category_codebook.pkl'
+DRIFT_REFERENCE_FILE = 'drift_reference.pkl'
+# Artifacts besides the models and the scaler, stored in the bundle under these keys
+EXTRA_FILES = {'codebook': CODEBOOK_FILE, 'drift_reference': DRIFT_REFERENCE_FILE}
+
+# The repo's packages, and the prefix they are imported under here: '' when src/ is on sys.path
+# (the API), 'src.' when imported from the repo root (the training scripts)
+_REPO_PACKAGES = ('api', 'data', 'features', 'models', 'utils')
+_PACKAGE_PREFIX = __name__[:-len('models.bundle')]
+
+
+class _ArtifactUnpickler(NumpyUnpickler):
+    """joblib's unpickler, resolving the repo's classes to the modules this process imported.
+
+    The training scripts pickle ``QuantileEnsemble`` as ``src.models.ensemble.QuantileEnsemble``
+    while the API imports it as ``models.ensemble``; either spelling loads as the class of the
+    package that is doing the loading.
+    """
+
+    def find_class(self, module, name):
+        local = module[len('src.'):] if module.startswith('src.') else module
+        if local.split('.', 1)[0] in _REPO_PACKAGES:
+            module = _PACKAGE_PREFIX + local
+        return super().find_class(module, name)
+
+
+def load_artifact(path, mmap_mode: str = None):
+    """``joblib.load`` for the trained artifacts, through ``_ArtifactUnpickler``."""
+    path = os.fspath(path)
+    with open(path, 'rb') as f, _validate_fileobject_and_memmap(f, path, mmap_mode) as (fobj, mmap_mode):
+        if isinstance(fobj, str):  # written by joblib < 0.10, which has no unpickler to extend
+            return joblib.load(path, mmap_mode=mmap_mode)
+        return _ArtifactUnpickler(path, fobj, ensure_native_byte_order=mmap_mode is None, mmap_mode=mmap_mode).load()
+
+
+def compute_model_version(models: dict, scaler) -> str:
+    """Content hash identifying a set of trained artifacts."""
+    return joblib.hash((sorted(models.items(), key=lambda item: item[0]), scaler))[:12]
+
+
+def save_bundle(path, models: dict, scaler, extra: dict = None) -> str:
+    """Write ``models`` ({name: {'model', 'feature_names', ...}}) and ``scaler`` to one file.
+
+    Returns the model version stored in the bundle.
+    """
+    model_version = compute_model_version(models, scaler)
+    payload = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model_version': model_version,
+        'created_at': time.time(),
+        'models': models,
+        'scaler': scaler,
+    }
+    payload.update(extra or {})
+    joblib.dump(payload, path)  # uncompressed, so arrays stay mmap-able
+    logger.info("Model bundle %s written to %s", model_version, path)
+    return model_version
+
+
+def load_bundle(path, mmap_mode: str = 'r') -> dict:
+    bundle = load_artifact(path, mmap_mode=mmap_mode)
+    if not isinstance(bundle, dict) or bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"{path} is not a model bundle (format version {BUNDLE_FORMAT_VERSION})")
+    return bundle
+
+
+def build_bundle_from_files(models_dir, output=None) -> Path:
+    """Consolidate the individual ``*.pkl`` artifacts in ``models_dir`` into a bundle.
+
+    The category codebook and the drift reference histograms, when present, are stored in the
+    bundle under the keys of ``EXTRA_FILES``.
+    """
+    models_dir = Path(models_dir)
+    output = Path(output) if output else models_dir / BUNDLE_FILENAME
+    models = {}
+    for name, filename in MODEL_FILES.items():
+        path = models_dir / filename
+        if path.exists():
+            models[name] = load_artifact(path)
+        else:
+            logger.warning("%s not found, %s model left out of the bundle", path, name)
+    scaler_path = models_dir / SCALER_FILE
+    scaler = load_artifact(scaler_path) if scaler_path.exists() else None
+    extra = {key: load_artifact(models_dir / filename) for key, filename in EXTRA_FILES.items()
+             if (models_dir / filename).exists()}
+    save_bundle(output, models, scaler, extra=extra)
+    return output
@@ -0,0 +1,136 @@
+"""Prediction intervals from an ensemble of XGBoost members.
+
+Two kinds of ensemble are supported:
+
+* ``bootstrap``: every member is trained on a bootstrap resample of the training rows. The spread
+  of the member predictions reflects model (sampling) uncertainty only, so these intervals are
+  narrower than the spread of actual sales.
+* ``quantile``: one member per quantile level, trained with the pinball loss
+  (``reg:quantileerror``). The members estimate the conditional quantiles of weekly sales directly.
+
+Members are trained concurrently on threads that share one float32 feature matrix (XGBoost releases
+the GIL), and a bootstrap resample is expressed as per-row weights rather than a copy of the rows.
+At inference every member scores the same matrix into one ``(members, rows)`` array from which all
+requested quantiles are taken in a single vectorized step.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from ..data.schema import FEATURE_DTYPE
+except ImportError:  # imported as top-level ``models`` package by the API
+    from data.schema import FEATURE_DTYPE
+
+logger = logging.getLogger(__name__)
+
+ENSEMBLE_METHODS = ('bootstrap', 'quantile')
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Below this many rows the members are scored one after another; thread hand-off would cost more
+PARALLEL_MIN_ROWS = 20_000
+
+_pool = None
+_pool_pid = None
+
+
+def check_quantiles(quantiles) -> np.ndarray:
+    """Quantile levels as a float array; each must lie strictly between 0 and 1."""
+    levels = np.asarray(list(quantiles), dtype=np.float64)
+    if levels.size == 0:
+        raise ValueError("At least one quantile level is required")
+    if not ((levels > 0) & (levels < 1)).all():
+        raise ValueError(f"Quantile levels must lie strictly between 0 and 1, got {levels.tolist()}")
+    return levels
+
+
+def bootstrap_weights(n_rows: int, rng: np.random.Generator) -> np.ndarray:
+    """How often each row is drawn in one bootstrap resample, as XGBoost sample weights.
+
+    Squared-error gradients and hessians are summed per row, so weighting a row by its draw count
+    trains exactly the same trees as duplicating it, without copying the feature matrix.
+    """
+    return np.bincount(rng.integers(0, n_rows, n_rows), minlength=n_rows).astype(np.float32)
+
+
+def default_jobs(n_jobs: int = None) -> int:
+    """Worker threads for ensemble training; ``None`` or ``0`` means one per available CPU."""
+    if n_jobs:
+        return n_jobs
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def _member_pool():
+    """Thread pool for scoring members concurrently, created per process (threads do not survive fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ThreadPoolExecutor(max_workers=default_jobs(), thread_name_prefix="ensemble")
+        _pool_pid = os.getpid()
+    return _pool
+
+
+class QuantileEnsemble:
+    """Fitted ensemble members plus what is needed to turn their outputs into quantiles.
+
+    ``levels`` is the quantile level of each member for the ``quantile`` method and ``None`` for
+    ``bootstrap``. ``predict`` returns the median, so the ensemble can also serve point forecasts
+    through ``models.train.predict``.
+    """
+
+    def __init__(self, members, method: str, levels=None, feature_names=None):
+        if method not in ENSEMBLE_METHODS:
+            raise ValueError(f"Unknown ensemble method {method!r}; expected one of {ENSEMBLE_METHODS}")
+        if method == 'quantile':
+            order = np.argsort(levels)
+            members = [members[i] for i in order]
+            levels = np.asarray(levels, dtype=np.float64)[order]
+        self.members = list(members)
+        self.method = method
+        self.levels = levels
+        self.feature_names = feature_names
+
+    @property
+    def n_members(self) -> int:
+        return len(self.members)
+
+    def predict_members(self, X) -> np.ndarray:
+        """Score ``X`` with every member: a ``(members, rows)`` float32 array."""
+        X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+        stacked = np.empty((self.n_members, len(X)), dtype=np.float32)
+
+        def score(i):
+            stacked[i] = self.members[i].predict(X)
+
+        if len(X) >= PARALLEL_MIN_ROWS and default_jobs() > 1:
+            # Members are single-threaded, so scoring them side by side uses every core
+            list(_member_pool().map(score, range(self.n_members)))
+        else:
+            for i in range(self.n_members):
+                score(i)
+        return stacked
+
+    def quantiles_from_members(self, stacked: np.ndarray, quantiles) -> np.ndarray:
+        """The requested quantiles of each row from its member predictions: ``(rows, quantiles)``."""
+        levels = check_quantiles(quantiles)
+        if self.method == 'bootstrap':
+            return np.quantile(stacked, levels, axis=0).T.astype(np.float32)
+        lowest, highest = self.levels[0], self.levels[-1]
+        outside = levels[(levels < lowest - 1e-9) | (levels > highest + 1e-9)]
+        if outside.size:
+            raise ValueError(f"Quantiles {outside.tolist()} are outside the trained levels [{lowest}, {highest}]")
+        # Separately trained quantile members can cross; sorting each row restores monotone quantiles
+        ordered = np.sort(stacked, axis=0)
+        if self.n_members == 1:
+            return np.repeat(ordered.T, levels.size, axis=1)
+        # Linear interpolation between the two trained levels around each requested level
+        upper = np.clip(np.searchsorted(self.levels, levels), 1, self.n_members - 1)
+        lower = upper - 1
+        weight = ((levels - self.levels[lower]) / (self.levels[upper] - self.levels[lower])).astype(np.float32)
+        return (ordered[lower] * (1 - weight)[:, None] + ordered[upper] * weight[:, None]).T
+
+    def predict_quantiles(self, X, quantiles=DEFAULT_QUANTILES) -> np.ndarray:
+        return self.quantiles_from_members(self.predict_members(X), quantiles)
+
+    def predict(self, X) -> np.ndarray:
+        return self.predict_quantiles(X, (0.5,))[:, 0]
@@ -0,0 +1,71 @@
+"""Per-prediction feature contributions and global feature importance.
+
+XGBoost contributions come from the booster's native ``pred_contribs`` (TreeSHAP, or the Saabas
+approximation with ``approximate=True``, about a hundred times cheaper); linear contributions are
+exactly ``coef * x``. Either way a row's contributions plus its bias add up to its prediction, and
+because the features are standardised the bias is the prediction for an average row.
+"""
+import logging
+
+import numpy as np
+
+try:
+    from ..data.schema import FEATURE_DTYPE, feature_source
+except ImportError:  # imported as top-level ``models`` package by the API
+    from data.schema import FEATURE_DTYPE, feature_source
+
+logger = logging.getLogger(__name__)
+
+BIAS = 'bias'
+
+
+def supports(model) -> bool:
+    """Whether contributions can be computed for ``model`` (XGBoost or a linear model)."""
+    return hasattr(model, 'get_booster') or hasattr(model, 'coef_')
+
+
+def feature_contributions(model, X, approximate: bool = False) -> np.ndarray:
+    """Contribution of every feature to every prediction: ``(rows, features + 1)``, bias last."""
+    X = np.ascontiguousarray(X, dtype=FEATURE_DTYPE)
+    if hasattr(model, 'get_booster'):
+        from xgboost import DMatrix
+        return model.get_booster().predict(DMatrix(X), pred_contribs=True, approx_contribs=approximate)
+    if hasattr(model, 'coef_'):
+        contribs = np.empty((len(X), X.shape[1] + 1), dtype=np.float32)
+        np.multiply(X, np.ravel(model.coef_), out=contribs[:, :-1], casting='unsafe')
+        contribs[:, -1] = np.ravel(model.intercept_)[0]
+        return contribs
+    raise ValueError(f"Feature contributions are not available for {type(model).__name__} models")
+
+
+def group_matrix(feature_names) -> tuple:
+    """Source column names and the 0/1 ``(features, sources)`` matrix that sums bits into them."""
+    groups = {}
+    for name in feature_names:
+        source, _ = feature_source(name)
+        groups.setdefault(source or name, len(groups))
+    membership = np.zeros((len(feature_names), len(groups)), dtype=np.float32)
+    for i, name in enumerate(feature_names):
+        membership[i, groups[feature_source(name)[0] or name]] = 1.0
+    return list(groups), membership
+
+
+def group_contributions(contribs: np.ndarray, feature_names) -> tuple:
+    """Sum binary-encoded bit contributions into their source column (``Store_0..5`` -> ``Store``).
+
+    ``contribs`` is ``(rows, features + 1)`` as returned by ``feature_contributions``; the result is
+    ``(source names, (rows, sources))`` without the bias column.
+    """
+    names, membership = group_matrix(feature_names)
+    return names, contribs[:, :-1] @ membership
+
+
+def global_importance(model, X, feature_names, max_rows: int = 2000, seed: int = 0) -> dict:
+    """Mean absolute contribution of each source column over (a sample of) ``X``, largest first."""
+    X = np.asarray(X)
+    if len(X) > max_rows:
+        X = X[np.random.default_rng(seed).choice(len(X), max_rows, replace=False)]
+    names, grouped = group_contributions(feature_contributions(model, X), feature_names)
+    mean_abs = np.abs(grouped).mean(axis=0, dtype=np.float64)
+    order = np.argsort(-mean_abs)
+    return {names[i]: float(mean_abs[i]) for i in order}
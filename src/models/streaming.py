@@ -0,0 +1,337 @@
+"""Out-of-core training: the models are fitted from chunks of the CSV, never the whole table.
+
+``train_streaming`` makes a few sequential passes over the file, each holding one chunk at a time:
+
+1. Fit the category codebook (union of the chunks' categories) and take a reservoir sample of the
+   measures, from which the outlier fences are computed once for the whole dataset.
+2. Preprocess every chunk with that codebook and those fences, split rows into train and test with
+   a seeded draw per row, ``partial_fit`` the scaler on the train rows and accumulate their Gram
+   matrix ``[1, x]' [1, x]`` and ``[1, x]' y``. The linear model is solved from these normal
+   equations (transformed into the scaled feature space), so it never sees the rows again.
+3. Stream the scaled train rows through an ``xgboost.DataIter`` into a ``QuantileDMatrix``, which
+   keeps only the quantized (1 byte per value) matrix, or an ``ExtMemQuantileDMatrix`` that pages it
+   to disk, and boost the XGBoost model (and the quantile ensemble members) from it.
+4. Score the train and test rows chunk by chunk and accumulate RMSE, MAE and R².
+
+Duplicates are only removed within a chunk. The artifacts are the same files ``scripts/train.py``
+writes in memory, so the API serves them unchanged.
+"""
+import logging
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+try:
+    from ..data.schema import FEATURE_DTYPE, MEASURE_COLUMNS, TARGET_COLUMN, iter_sales_csv
+    from ..features.drift import build_reference
+    from ..features.preprocess import fit_codebook, iqr_bounds, preprocess_sales_data, scale_features
+    from .bundle import CODEBOOK_FILE, DRIFT_REFERENCE_FILE, MODEL_FILES
+    from .ensemble import QuantileEnsemble, check_quantiles
+    from .explain import global_importance, supports as supports_contributions
+except ImportError:  # imported as top-level ``models`` package
+    from data.schema import FEATURE_DTYPE, MEASURE_COLUMNS, TARGET_COLUMN, iter_sales_csv
+    from features.drift import build_reference
+    from features.preprocess import fit_codebook, iqr_bounds, preprocess_sales_data, scale_features
+    from models.bundle import CODEBOOK_FILE, DRIFT_REFERENCE_FILE, MODEL_FILES
+    from models.ensemble import QuantileEnsemble, check_quantiles
+    from models.explain import global_importance, supports as supports_contributions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 500_000
+DEFAULT_SAMPLE_ROWS = 200_000
+XGBOOST_ROUNDS = 100
+
+
+class Reservoir:
+    """A uniform random sample of at most ``size`` rows from a stream of frames.
+
+    Every row gets a random key and the ``size`` rows with the smallest keys are kept, which is a
+    uniform sample of everything added so far.
+    """
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self._rng = np.random.default_rng(seed)
+        self._keys = np.empty(0)
+        self.frame = None
+
+    def add(self, df: pd.DataFrame):
+        if len(df) == 0:
+            return
+        keys = np.concatenate([self._keys, self._rng.random(len(df))])
+        frame = df if self.frame is None else pd.concat([self.frame, df], ignore_index=True)
+        if len(keys) > self.size:
+            chosen = np.sort(np.argpartition(keys, self.size - 1)[:self.size])
+            keys, frame = keys[chosen], frame.iloc[chosen]
+        self._keys, self.frame = keys, frame.reset_index(drop=True)
+
+
+def merge_codebook(codebook: dict, update: dict) -> dict:
+    """Append the categories of ``update`` that ``codebook`` has not seen, keeping first-appearance order."""
+    merged = dict(codebook)
+    for col, values in update.items():
+        if col not in merged:
+            merged[col] = values
+        else:
+            new = values[~np.isin(values, merged[col])]
+            if len(new):
+                merged[col] = np.concatenate([merged[col], new])
+    return merged
+
+
+def linear_from_normal_equations(gram: np.ndarray, xty: np.ndarray, mean: np.ndarray, scale: np.ndarray):
+    """A fitted ``LinearRegression`` on standardised features from the Gram matrix of unscaled ``[1, x]``.
+
+    With ``z = (x - mean) / scale``, ``[1, z] = [1, x] T``, so the normal equations of the scaled
+    problem are ``T' G T`` and ``T' b``. They are solved with least squares, which gives the
+    minimum-norm solution when a feature is constant (like scikit-learn's ``LinearRegression``).
+    """
+    from sklearn.linear_model import LinearRegression
+
+    n_features = len(mean)
+    T = np.zeros((n_features + 1, n_features + 1))
+    T[0, 0] = 1.0
+    T[0, 1:] = -mean / scale
+    T[1:, 1:] = np.diag(1.0 / scale)
+    theta = np.linalg.lstsq(T.T @ gram @ T, T.T @ xty, rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = theta[1:]
+    model.intercept_ = float(theta[0])
+    model.n_features_in_ = n_features
+    return model
+
+
+class RunningMetrics:
+    """RMSE, MAE and R² accumulated batch by batch (R² from merged per-batch means and variances)."""
+
+    def __init__(self):
+        self.n = 0
+        self.sse = 0.0
+        self.sae = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, y: np.ndarray, pred: np.ndarray):
+        if len(y) == 0:
+            return
+        y = np.asarray(y, dtype=np.float64)
+        errors = y - np.asarray(pred, dtype=np.float64)
+        self.sse += float(errors @ errors)
+        self.sae += float(np.abs(errors).sum())
+        n, mean = len(y), float(y.mean())
+        m2 = float(((y - mean) ** 2).sum())
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+
+    def result(self) -> dict:
+        if self.n == 0:
+            return {}
+        return {
+            'rmse': float(np.sqrt(self.sse / self.n)),
+            'mae': self.sae / self.n,
+            'r2': 1.0 - self.sse / self.m2 if self.m2 > 0 else 0.0,
+        }
+
+
+class StreamingTrainer:
+    """The passes of out-of-core training over one CSV file (see the module docstring)."""
+
+    def __init__(self, path, chunk_rows: int = DEFAULT_CHUNK_ROWS, sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                 test_size: float = 0.2, seed: int = 1):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.sample_rows = sample_rows
+        self.test_size = test_size
+        self.seed = seed
+        self.codebook = {}
+        self.bounds = None
+        self.scaler = None
+        self.feature_names = None
+        self.sample = None  # preprocessed, unscaled train rows
+        self.rows = 0
+
+    def _chunks(self):
+        return iter_sales_csv(self.path, self.chunk_rows)
+
+    def scan(self):
+        """Pass 1: codebook and outlier fences."""
+        reservoir = Reservoir(self.sample_rows, self.seed)
+        for chunk in self._chunks():
+            self.rows += len(chunk)
+            self.codebook = merge_codebook(self.codebook, fit_codebook(chunk))
+            measures = [col for col in MEASURE_COLUMNS if col in chunk.columns]
+            # Preprocessing fills missing measures with 0 before removing outliers
+            reservoir.add(chunk[measures].fillna(0))
+        self.bounds = iqr_bounds(reservoir.frame, list(reservoir.frame.columns)) if reservoir.frame is not None else {}
+        logger.info("Scanned %d rows; outlier fences %s", self.rows, self.bounds)
+
+    def _preprocessed(self):
+        """Preprocessed chunks with a boolean test-row mask, identical on every pass."""
+        rng = np.random.default_rng(self.seed)
+        for chunk in self._chunks():
+            # Drawn per input row before preprocessing drops any, so the split never depends on the chunking
+            is_test = rng.random(len(chunk)) < self.test_size
+            df_proc = preprocess_sales_data(chunk, codebook=self.codebook, keep_index=True, outlier_bounds=self.bounds)
+            yield df_proc, is_test[chunk.index.get_indexer(df_proc.index)]
+
+    def fit_scaler(self):
+        """Pass 2: scaler, normal equations of the linear model and a sample of the train rows."""
+        from sklearn.preprocessing import StandardScaler
+
+        self.scaler = StandardScaler()
+        reservoir = Reservoir(self.sample_rows, self.seed)
+        gram = xty = None
+        for df_proc, is_test in self._preprocessed():
+            train = df_proc[~is_test]
+            if len(train) == 0:
+                continue
+            X = train.drop(columns=TARGET_COLUMN)
+            if self.feature_names is None:
+                self.feature_names = X.columns.tolist()
+            values = X.to_numpy(dtype=np.float64)
+            self.scaler.partial_fit(X.astype(np.float64))
+            ones_x = np.hstack([np.ones((len(values), 1)), values])
+            y = train[TARGET_COLUMN].to_numpy(dtype=np.float64)
+            gram = ones_x.T @ ones_x if gram is None else gram + ones_x.T @ ones_x
+            xty = ones_x.T @ y if xty is None else xty + ones_x.T @ y
+            reservoir.add(X)
+        if gram is None:
+            raise ValueError(f"No training rows left in {self.path} after preprocessing")
+        self.sample = reservoir.frame
+        self._gram, self._xty = gram, xty
+
+    def batches(self, split: str = 'train'):
+        """Scaled float32 feature matrices and targets of the ``train``, ``test`` or ``all`` rows."""
+        for df_proc, is_test in self._preprocessed():
+            rows = {'train': ~is_test, 'test': is_test, 'all': np.ones(len(is_test), dtype=bool)}[split]
+            part = df_proc[rows]
+            if len(part) == 0:
+                continue
+            X, _ = scale_features(part.drop(columns=TARGET_COLUMN), self.scaler)
+            yield (np.ascontiguousarray(X[self.feature_names].to_numpy(), dtype=FEATURE_DTYPE),
+                   part[TARGET_COLUMN].to_numpy(dtype=np.float32), is_test[rows])
+
+    def train_linear(self):
+        return linear_from_normal_equations(self._gram, self._xty, self.scaler.mean_, self.scaler.scale_)
+
+    def quantile_dmatrix(self, external_memory: bool = False, cache_dir=None):
+        """Pass 3: the quantized training matrix, built from the train batches."""
+        import xgboost as xgb
+
+        trainer = self
+
+        class TrainBatches(xgb.DataIter):
+            def __init__(self):
+                self._batches = None
+                super().__init__(cache_prefix=str(Path(cache_dir or '.') / 'xgb-cache') if external_memory else None)
+
+            def next(self, input_data):
+                if self._batches is None:
+                    self._batches = trainer.batches('train')
+                batch = next(self._batches, None)
+                if batch is None:
+                    return False
+                X, y, _ = batch
+                input_data(data=X, label=y)
+                return True
+
+            def reset(self):
+                self._batches = None
+
+        started = time.perf_counter()
+        if external_memory:
+            dmatrix = xgb.ExtMemQuantileDMatrix(TrainBatches(), max_bin=256)
+        else:
+            dmatrix = xgb.QuantileDMatrix(TrainBatches(), max_bin=256)
+        logger.info("Built %s of %d train rows in %.1fs", type(dmatrix).__name__, dmatrix.num_row(),
+                    time.perf_counter() - started)
+        return dmatrix
+
+    @staticmethod
+    def boost(dmatrix, params: dict = None, rounds: int = XGBOOST_ROUNDS):
+        """Boost on ``dmatrix`` and wrap the booster as an ``XGBRegressor`` like the in-memory models."""
+        import xgboost as xgb
+
+        booster = xgb.train({'objective': 'reg:squarederror', 'seed': 0, **(params or {})}, dmatrix, num_boost_round=rounds)
+        model = xgb.XGBRegressor()
+        model.load_model(bytearray(booster.save_raw('ubj')))
+        return model
+
+    def evaluate(self, models: dict, interval=None) -> tuple:
+        """Pass 4: train and test metrics of every model, and the ensemble's ``interval`` coverage."""
+        running = {name: {'train': RunningMetrics(), 'test': RunningMetrics()} for name in models}
+        inside = total = 0
+        for X, y, is_test in self.batches('all'):
+            for name, model in models.items():
+                pred = model.predict(X)
+                running[name]['train'].update(y[~is_test], pred[~is_test])
+                running[name]['test'].update(y[is_test], pred[is_test])
+            if interval is not None and is_test.any():
+                ensemble, levels = interval
+                bounds = ensemble.predict_quantiles(X[is_test], levels)
+                inside += int(((y[is_test] >= bounds[:, 0]) & (y[is_test] <= bounds[:, 1])).sum())
+                total += int(is_test.sum())
+        metrics = {name: {f"{split}_{key}": value for split, acc in splits.items() for key, value in acc.result().items()}
+                   for name, splits in running.items()}
+        return metrics, (inside / total if total else None)
+
+
+def train_streaming(path, models_dir, config: dict, chunk_rows: int = None) -> dict:
+    """Train and save every model from ``path`` chunk by chunk; returns the metrics per model file."""
+    training_config = config.get('training', {})
+    ensemble_config = config.get('ensemble', {})
+    if ensemble_config.get('enabled', False) and ensemble_config.get('method', 'bootstrap') != 'quantile':
+        # Bootstrap members need resampled copies of the rows, which are never held in memory here
+        raise ValueError(f"Streaming training supports only ensemble.method 'quantile', not "
+                         f"{ensemble_config.get('method', 'bootstrap')!r}; change it or disable the ensemble")
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    trainer = StreamingTrainer(path, chunk_rows=chunk_rows or training_config.get('chunk_rows', DEFAULT_CHUNK_ROWS),
+                               sample_rows=training_config.get('sample_rows', DEFAULT_SAMPLE_ROWS),
+                               test_size=training_config.get('test_size', 0.2), seed=training_config.get('seed', 1))
+    started = time.perf_counter()
+    trainer.scan()
+    trainer.fit_scaler()
+    feature_names = trainer.feature_names
+    joblib.dump(trainer.scaler, models_dir / 'standard_scaler.pkl')
+    joblib.dump(trainer.codebook, models_dir / CODEBOOK_FILE)
+    joblib.dump(build_reference(trainer.sample, trainer.codebook, bins=config.get('drift', {}).get('bins', 20)),
+                models_dir / DRIFT_REFERENCE_FILE)
+
+    models = {'linear_regression_model.pkl': trainer.train_linear()}
+    dmatrix = trainer.quantile_dmatrix(training_config.get('external_memory', False), cache_dir=models_dir)
+    models['xgboost_model.pkl'] = trainer.boost(dmatrix)
+    interval = None
+    if ensemble_config.get('enabled', False):
+        levels = np.unique(check_quantiles(ensemble_config.get('quantiles', [0.05, 0.5, 0.95])))
+        if not np.isclose(levels, 0.5).any():
+            levels = np.sort(np.append(levels, 0.5))
+        members = [trainer.boost(dmatrix, {'objective': 'reg:quantileerror', 'quantile_alpha': float(level)})
+                   for level in levels]
+        ensemble = QuantileEnsemble(members, 'quantile', levels=levels, feature_names=feature_names)
+        models[MODEL_FILES['ensemble']] = ensemble
+        interval = (ensemble, [float(levels[0]), float(levels[-1])])
+    del dmatrix
+
+    model_metrics, coverage = trainer.evaluate(models, interval)
+    sample = trainer.scaler.transform(trainer.sample.astype(np.float64)).astype(FEATURE_DTYPE)
+    for filename, model in models.items():
+        saved = {'model': model, 'feature_names': feature_names, 'metrics': model_metrics[filename]}
+        if supports_contributions(model):
+            saved['importance'] = global_importance(model, sample, feature_names)
+        joblib.dump(saved, models_dir / filename)
+        logger.info(f"{filename} (streaming) Test RMSE: {model_metrics[filename].get('test_rmse', float('nan')):.2f} "
+                    f"R2: {model_metrics[filename].get('test_r2', float('nan')):.4f}")
+    if coverage is not None:
+        low, high = interval[1]
+        logger.info(f"Ensemble Test coverage of the {low:g}-{high:g} interval: {coverage:.1%} (nominal {high - low:.0%})")
+    logger.info(f"Streaming training of {trainer.rows} rows in chunks of {trainer.chunk_rows} took "
+                f"{time.perf_counter() - started:.1f}s")
+    return model_metrics
@@ -1,33 +1,97 @@
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from xgboost import XGBRegressor
 import joblib
 import numpy as np
 import logging
 
+try:
+    from ..utils.metrics import timed
+    from .bundle import load_artifact
+    from .ensemble import DEFAULT_QUANTILES, QuantileEnsemble, bootstrap_weights, check_quantiles, default_jobs
+except ImportError:  # imported as top-level ``models`` package by the API
+    from utils.metrics import timed
+    from models.bundle import load_artifact
+    from models.ensemble import DEFAULT_QUANTILES, QuantileEnsemble, bootstrap_weights, check_quantiles, default_jobs
+
 logger = logging.getLogger(__name__)
 
 def train_linear_regression(X: pd.DataFrame, y: pd.Series, model_path: str = None, feature_names: list = None):
+    from sklearn.linear_model import LinearRegression
     model = LinearRegression()
     model.fit(X, y)
     if model_path is not None:
         model_data_to_save = {'model': model, 'feature_names': feature_names}
         joblib.dump(model_data_to_save, model_path)
-        logger.info(f"Linear Regression model and feature names saved to {model_path}")
+        logger.info("Linear Regression model and feature names saved to %s", model_path)
     return model
 
 def train_xgboost(X: pd.DataFrame, y: pd.Series, model_path: str = None, feature_names: list = None):
+    from xgboost import XGBRegressor
     model = XGBRegressor(objective='reg:squarederror', n_estimators=100)
     model.fit(X, y)
     if model_path is not None:
         model_data_to_save = {'model': model, 'feature_names': feature_names}
         joblib.dump(model_data_to_save, model_path)
-        logger.info(f"XGBoost model and feature names saved to {model_path}")
+        logger.info("XGBoost model and feature names saved to %s", model_path)
     return model
 
+def train_xgboost_ensemble(X, y, model_path: str = None, feature_names: list = None, method: str = 'bootstrap',
+                           members: int = 16, quantiles=DEFAULT_QUANTILES, n_jobs: int = None, seed: int = 0):
+    """Train a ``QuantileEnsemble`` of XGBoost members concurrently.
+
+    ``method='bootstrap'`` trains ``members`` models on bootstrap resamples; ``method='quantile'``
+    trains one pinball-loss model per level in ``quantiles`` (the median is always included so the
+    ensemble has a point forecast). Members run on ``n_jobs`` threads (default: one per CPU), each
+    single-threaded, and all read the same float32 copy of ``X``.
+    """
+    from joblib import Parallel, delayed
+    from xgboost import XGBRegressor
+
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    if method == 'quantile':
+        levels = np.unique(check_quantiles(quantiles))
+        if not np.isclose(levels, 0.5).any():
+            levels = np.sort(np.append(levels, 0.5))
+        specs = [({'objective': 'reg:quantileerror', 'quantile_alpha': float(level)}, None) for level in levels]
+    elif method == 'bootstrap':
+        levels = None
+        rng = np.random.default_rng(seed)
+        specs = [({'objective': 'reg:squarederror'}, bootstrap_weights(len(X), rng)) for _ in range(members)]
+    else:
+        raise ValueError(f"Unknown ensemble method {method!r}")
+
+    def fit_member(i, params, weights):
+        model = XGBRegressor(n_estimators=100, n_jobs=1, random_state=seed + i, **params)
+        model.fit(X, y, sample_weight=weights)
+        return model
+
+    n_jobs = min(default_jobs(n_jobs), len(specs))
+    # Threads rather than processes: XGBoost releases the GIL while training, and the members
+    # share X instead of each worker receiving a pickled copy
+    fitted = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(fit_member)(i, params, weights) for i, (params, weights) in enumerate(specs))
+    ensemble = QuantileEnsemble(fitted, method, levels=levels, feature_names=feature_names)
+    logger.info("Trained %s ensemble of %d XGBoost members on %d threads", method, ensemble.n_members, n_jobs)
+    if model_path is not None:
+        joblib.dump({'model': ensemble, 'feature_names': feature_names}, model_path)
+        logger.info("XGBoost ensemble and feature names saved to %s", model_path)
+    return ensemble
+
+def evaluate_model(model, X, y) -> dict:
+    """RMSE, MAE and R² of ``model`` on ``(X, y)``."""
+    y = np.asarray(y, dtype=np.float64)
+    residuals = y - np.asarray(model.predict(X), dtype=np.float64)
+    total = ((y - y.mean()) ** 2).sum()
+    return {
+        'rmse': float(np.sqrt(np.mean(residuals ** 2))),
+        'mae': float(np.mean(np.abs(residuals))),
+        'r2': float(1 - (residuals ** 2).sum() / total) if total else 0.0,
+    }
+
 def load_model(model_path: str):
-    return joblib.load(model_path)
+    return load_artifact(model_path)
 
+@timed("predict")
 def predict(model_data: dict, X) -> np.ndarray:
     """Make predictions using the model and preprocessed data."""
     model = model_data.get('model')
@@ -37,25 +101,26 @@ def predict(model_data: dict, X) -> np.ndarray:
 
     # Check if X is a numpy array
     if isinstance(X, np.ndarray):
-        logger.debug(f"Input for prediction is a numpy array with shape {X.shape}")
+        logger.debug("Input for prediction is a numpy array with shape %s", X.shape)
         
         # For numpy arrays, we assume columns are already aligned to model's expectations
         if X.size == 0:  # Handle empty arrays
-            logger.info("Input numpy array for prediction is empty.")
+            logger.debug("Input numpy array for prediction is empty.")
             return np.array([])
             
         try:
             predictions_output = model.predict(X)
             return predictions_output
         except Exception as e:
-            logger.error(f"Error during model.predict call with numpy array: {e}", exc_info=True)
+            logger.error("Error during model.predict call with numpy array: %s", e, exc_info=True)
             raise
     
     # If X is a DataFrame, proceed with column alignment
     model_feature_names = model_data.get('feature_names')
     
-    logger.debug(f"DataFrame columns before alignment for prediction: {X.columns.tolist()}")
-    logger.debug(f"Expected model features based on loaded model: {model_feature_names}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("DataFrame columns before alignment for prediction: %s", X.columns.tolist())
+        logger.debug("Expected model features based on loaded model: %s", model_feature_names)
 
     if model_feature_names:
         # Ensure all expected features are in X's columns, add if missing (with 0)
@@ -63,18 +128,19 @@ def predict(model_data: dict, X) -> np.ndarray:
         for col in model_feature_names:
             if col not in X.columns:
                 missing_features.append(col)
-                logger.warning(f"Input data for prediction is missing expected feature: '{col}'. Adding it with value 0.")
+                logger.warning("Input data for prediction is missing expected feature: '%s'. Adding it with value 0.", col)
                 X[col] = 0
         
         if missing_features:
-            logger.warning(f"Added missing features for prediction: {missing_features}. Current X columns: {X.columns.tolist()}")
+            logger.warning("Added missing features for prediction: %s. Current X columns: %s", missing_features, X.columns.tolist())
 
         # Select and reorder columns to match model's training features
         try:
             X_aligned = X[model_feature_names]
-            logger.debug(f"DataFrame columns after alignment for prediction: {X_aligned.columns.tolist()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("DataFrame columns after alignment for prediction: %s", X_aligned.columns.tolist())
         except KeyError as e:
-            logger.error(f"KeyError during feature alignment for prediction. This should not happen if missing features were added. Model features: {model_feature_names}, DataFrame columns: {X.columns.tolist()}", exc_info=True)
+            logger.error("KeyError during feature alignment for prediction. This should not happen if missing features were added. Model features: %s, DataFrame columns: %s", model_feature_names, X.columns.tolist(), exc_info=True)
             raise ValueError(f"DataFrame for prediction is missing critical features or has a mismatch despite attempts to fix: {e}")
     else:
         logger.warning("No feature names found stored with the loaded model. Assuming input DataFrame columns are correctly ordered and all necessary features are present. This is risky.")
@@ -84,14 +150,14 @@ def predict(model_data: dict, X) -> np.ndarray:
         if not X.empty:
             logger.warning("Aligned DataFrame for prediction (X_aligned) is empty, but original preprocessed DataFrame (X) was not. This might indicate all relevant features were missing or an issue with feature names list.")
         else:
-            logger.info("Input DataFrame for prediction (X_aligned) is empty because the preprocessed input (X) was empty.")
+            logger.debug("Input DataFrame for prediction (X_aligned) is empty because the preprocessed input (X) was empty.")
         return np.array([]) # Return empty array if no data to predict on
 
     try:
         predictions_output = model.predict(X_aligned)
         return predictions_output
     except Exception as e:
-        logger.error(f"Error during model.predict(X_aligned) call: {e}", exc_info=True)
-        logger.error(f"Details of X_aligned fed to model.predict - Shape: {X_aligned.shape}, Dtypes:\n{X_aligned.dtypes}, Head:\n{X_aligned.head()}")
+        logger.error("Error during model.predict(X_aligned) call: %s", e, exc_info=True)
+        logger.error("Details of X_aligned fed to model.predict - Shape: %s, Dtypes:\n%s, Head:\n%s", X_aligned.shape, X_aligned.dtypes, X_aligned.head())
         raise  # Re-raise the exception to be caught by the API layer
 
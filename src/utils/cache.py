@@ -0,0 +1,96 @@
+"""Small in-process caches with hit/miss accounting in ``sales_cache_*`` metrics."""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import CACHE_HITS, CACHE_MISSES
+
+# Two independent 64-bit FNV-1a-style lanes (odd multipliers), one 128-bit hash per row
+_HASH_MULTIPLIERS = np.array([0x100000001B3, 0x9E3779B97F4A7C15], dtype=np.uint64)
+
+
+def row_keys(X: np.ndarray, namespace: str = "") -> list:
+    """A hashable 16-byte key per row of the 2-D array ``X``, equal for rows with equal bytes.
+
+    Keys compare bytes, not values: ``-0.0`` and ``0.0`` get different keys (a harmless extra cache
+    miss), while a NaN matches the same NaN although ``nan != nan``.
+
+    Rows are hashed a column at a time across all rows (a few vectorized passes over the matrix
+    instead of one Python call per row). ``namespace`` seeds the hash, so keys of different
+    models or model versions cannot meet in a shared cache.
+    """
+    seed = np.frombuffer(hashlib.blake2b(namespace.encode(), digest_size=16).digest(), dtype=np.uint64)
+    words = X.view(f'u{X.dtype.itemsize}')
+    hashes = np.tile(seed, (len(X), 1))
+    for column in words.T:
+        hashes ^= column[:, None]
+        hashes *= _HASH_MULTIPLIERS
+    return hashes.view(np.dtype((np.void, 16))).ravel().tolist()
+
+
+class LRUCache:
+    """A bounded least-recently-used mapping, safe to share between request threads.
+
+    ``name`` is the ``cache`` label of the hit/miss counters. A ``maxsize`` of 0 disables the cache.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024):
+        self.name = name
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                CACHE_MISSES.inc(cache=self.name)
+                return default
+            self._data.move_to_end(key)
+        CACHE_HITS.inc(cache=self.name)
+        return value
+
+    def get_many(self, keys) -> list:
+        """Look up several keys under one lock; misses are ``None``."""
+        values = []
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key)
+                if value is not None:
+                    self._data.move_to_end(key)
+                values.append(value)
+        misses = sum(value is None for value in values)
+        if misses < len(values):
+            CACHE_HITS.inc(len(values) - misses, cache=self.name)
+        if misses:
+            CACHE_MISSES.inc(misses, cache=self.name)
+        return values
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def put_many(self, keys, values):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
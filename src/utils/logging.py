@@ -1,10 +1,205 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+# Correlation ID of the request currently being handled (set by the API middleware)
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(request_id)s | %(message)s"
+
+# Loggers on the per-request scoring path; their debug output is sampled/rate-limited
+HOT_PATH_LOGGERS = ("api", "preprocessor", "models.train", "src.models.train")
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current correlation ID to every record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Sample and rate-limit records at or below ``max_level``, per call site.
+
+    Runs before the record is formatted, so dropped records cost only the filter check.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: int = None, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.max_level = max_level
+        self._windows = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.max_per_second:
+            key = (record.pathname, record.lineno)
+            now = time.monotonic()
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                self._windows[key] = [now, 1]
+                return True
+            if window[1] >= self.max_per_second:
+                return False
+            window[1] += 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Already rendered by NonBlockingQueueHandler.prepare
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records for the listener thread; drop (and count) when the queue is full.
+
+    Like ``QueueHandler.prepare``, the message is merged with its arguments and the traceback is
+    rendered before enqueueing, so arguments mutated later or exception frames are not held by the
+    queue. Unlike it, the record is not run through a formatter here: the listener's formatter still
+    gets the extra fields and ``request_id`` as attributes and the traceback as ``exc_text``.
+    """
+
+    dropped = 0
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def configure_logging(settings: dict = None, force: bool = False):
+    """Configure the root logger once from the ``logging`` config section.
+
+    Environment variables (``LOG_LEVEL``, ``LOG_FORMAT``, ``LOG_ASYNC``) override the config.
+    """
+    global _configured, _listener, _queue_handler
+    with _configure_lock:
+        if _configured and not force:
+            return
+        settings = settings or {}
+        level = os.getenv("LOG_LEVEL", settings.get("level", "INFO")).upper()
+        fmt = os.getenv("LOG_FORMAT", settings.get("format", "text")).lower()
+        use_async = _env_flag("LOG_ASYNC", settings.get("async", False))
+        hot_path = settings.get("hot_path", {})
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            _queue_handler = None
+
+        if use_async:
+            log_queue = queue.Queue(maxsize=int(settings.get("queue_size", 10000)))
+            handler = _queue_handler = NonBlockingQueueHandler(log_queue)
+            _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
+        else:
+            handler = stream_handler
+        # The correlation ID lives in a contextvar, so it must be captured in the calling thread
+        handler.addFilter(RequestIdFilter())
+        root.addHandler(handler)
+        root.setLevel(level)
+
+        sample_rate = float(hot_path.get("sample_rate", 1.0))
+        max_per_second = hot_path.get("max_per_second")
+        if sample_rate < 1.0 or max_per_second:
+            max_level = logging.getLevelName(str(hot_path.get("max_level", "DEBUG")).upper())
+            for name in hot_path.get("loggers", HOT_PATH_LOGGERS):
+                target = logging.getLogger(name)
+                for existing in [f for f in target.filters if isinstance(f, SamplingFilter)]:
+                    target.removeFilter(existing)
+                target.addFilter(SamplingFilter(sample_rate, max_per_second, max_level))
+        _configured = True
+
+
+def flush_logging():
+    """Drain the async queue and flush handlers; for processes that leave via ``os._exit``."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+    logging.shutdown()
+
+
+def _restart_listener_in_child():
+    # Threads do not survive fork(), and the inherited queue still references the parent's
+    # waiting listener; give a forked worker a fresh queue and its own listener thread
+    if _listener is not None:
+        fresh_queue = queue.Queue(maxsize=_listener.queue.maxsize)
+        _queue_handler.queue = _listener.queue = fresh_queue
+        _listener._thread = None
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+
 
 def get_logger(name: str = __name__):
-    level = os.getenv("LOG_LEVEL", "INFO").upper()
-    logging.basicConfig(
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        level=level
-    )
+    configure_logging()
     return logging.getLogger(name)
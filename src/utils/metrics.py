@@ -0,0 +1,259 @@
+"""Lightweight in-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are kept in plain dicts keyed by label values and
+guarded by a per-metric lock, so recording a sample costs a few microseconds.
+Use ``timed("stage")`` around hot-path work to feed the per-stage latency histogram.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+_enabled = True
+
+
+def set_enabled(enabled: bool):
+    """Globally enable or disable metric collection (rendering still works)."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labelnames, labelvalues, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def get(self, **labels):
+        """Return the current value for a label set (0 if never recorded)."""
+        return self._values.get(self._key(labels), 0)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _render_samples(self):
+        for labelvalues, value in self.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment the gauge while the block runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def items(self):
+        if self._function is not None:
+            # Callback gauges compute {labelvalues: value} lazily at scrape time
+            return list(self._function().items())
+        return super().items()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def get(self, **labels):
+        """Return ``(count, sum)`` for a label set."""
+        state = self._values.get(self._key(labels))
+        return (0, 0.0) if state is None else (state[2], state[1])
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the block in seconds."""
+        if not _enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self):
+        for labelvalues, (bucket_counts, total, count) in self.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+    def items(self):
+        with self._lock:
+            return [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-registering (e.g. after a module reload) returns the existing metric
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function=function))
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+
+def render_latest() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return REGISTRY.render()
+
+
+# Shared metrics used across the features, models and api modules
+HTTP_REQUESTS = counter("sales_api_requests_total", "HTTP requests handled by the API.", ("method", "path", "status"))
+HTTP_LATENCY = histogram("sales_api_request_duration_seconds", "End-to-end HTTP request latency.", ("method", "path"))
+IN_FLIGHT = gauge("sales_api_requests_in_flight", "HTTP requests currently being handled.")
+STAGE_LATENCY = histogram("sales_stage_duration_seconds", "Latency of individual pipeline stages.", ("stage",))
+ROWS_PER_REQUEST = histogram("sales_rows_per_request", "Number of input rows carried by a scoring request.", ("endpoint",), buckets=ROW_BUCKETS)
+MODEL_LATENCY = histogram("sales_model_predict_duration_seconds", "Latency of model.predict calls per model.", ("model",))
+MODEL_ROWS = histogram("sales_model_predict_rows", "Rows scored per model.predict call.", ("model",), buckets=ROW_BUCKETS)
+DEFAULT_FILLS = counter("sales_default_fills_total", "Input values replaced by a default during preprocessing.", ("column",))
+SCALER_FALLBACKS = counter("sales_scaler_fallbacks_total", "Rows scored without the trained scaler.", ("reason",))
+JOBS_FINISHED = counter("sales_jobs_finished_total", "Batch scoring job attempts that ended, by outcome.", ("status",))
+JOB_ROWS = counter("sales_job_rows_total", "Input rows read by batch scoring jobs.", ("model",))
+PREDICTIONS_STORED = counter("sales_predictions_stored_total", "Forecasts written to the prediction store.", ("model",))
+MEMO_ROWS = counter("sales_prediction_memo_rows_total", "Scored rows by whether the prediction memo answered them ('hit') or the model did ('miss').", ("model", "result"))
+CACHE_HITS = counter("sales_cache_hits_total", "Cache lookups that were served from the cache.", ("cache",))
+CACHE_MISSES = counter("sales_cache_misses_total", "Cache lookups that missed the cache.", ("cache",))
+
+
+def _cache_hit_ratio() -> dict:
+    ratios = {}
+    caches = {key for key, _ in CACHE_HITS.items()} | {key for key, _ in CACHE_MISSES.items()}
+    for key in caches:
+        hits = CACHE_HITS._values.get(key, 0)
+        total = hits + CACHE_MISSES._values.get(key, 0)
+        ratios[key] = hits / total if total else 0.0
+    return ratios
+
+
+CACHE_HIT_RATIO = gauge("sales_cache_hit_ratio", "Fraction of cache lookups served from the cache.", ("cache",), function=_cache_hit_ratio)
+
+
+def timed(stage: str):
+    """Context manager that records the duration of ``stage`` in the stage latency histogram."""
+    return STAGE_LATENCY.time(stage=stage)
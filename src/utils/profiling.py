@@ -0,0 +1,257 @@
+"""Opt-in per-request profiling: sampled call stacks, cProfile stats and tracemalloc allocators.
+
+Sampled stacks are emitted in the collapsed ("folded") format understood by flamegraph.pl,
+speedscope and inferno: one ``frame;frame;frame count`` line per distinct stack.
+
+A request is profiled on the thread that enters the profiler (the event loop for the API) and on
+every thread that runs part of it through ``profiled_call``, such as the threadpool thread of a
+sync endpoint.
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+# tracemalloc is process-wide: held by the one request whose allocations are being traced
+_memory_profile_lock = threading.Lock()
+# The profiler of the request being handled; copied into the threads the request runs work on
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """Sample the call stacks of a set of threads at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id: int = None, interval: float = 0.005):
+        self.thread_ids = {thread_id or threading.get_ident()}
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread_id: int):
+        self.thread_ids = self.thread_ids | {thread_id}
+
+    def remove_thread(self, thread_id: int):
+        self.thread_ids = self.thread_ids - {thread_id}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _start_tracemalloc():
+    """Start tracing for one memory profile: ``(started, snapshot)``, or None while another runs.
+
+    Concurrent memory profiles would reset each other's peak and count each other's allocations,
+    so only one request at a time gets one. Tracing that was on already is left on afterwards.
+    """
+    if not _memory_profile_lock.acquire(blocking=False):
+        return None
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    return started, tracemalloc.take_snapshot()
+
+
+def _stop_tracemalloc(state, top_n: int) -> dict:
+    started, start_snapshot = state
+    try:
+        end_snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started:
+            tracemalloc.stop()
+    finally:
+        _memory_profile_lock.release()
+    top = []
+    for stat in end_snapshot.compare_to(start_snapshot, "lineno")[:top_n]:
+        frame = stat.traceback[0]
+        top.append({
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+        })
+    return {"traced_current_mb": round(current / 1e6, 2), "traced_peak_mb": round(peak / 1e6, 2), "top_allocators": top}
+
+
+class RequestProfiler:
+    """Profile a block of work; use as a context manager and read the result afterwards.
+
+    ``mode`` is ``"sample"`` (stack sampling, flame-graph output) or ``"cprofile"``
+    (deterministic call statistics). ``memory`` additionally records tracemalloc allocators.
+    Threads that run work for the block through ``profiled_call`` are profiled as well.
+    """
+
+    def __init__(self, mode: str = "sample", interval: float = 0.005, memory: bool = True, top_n: int = 15):
+        if mode not in ("sample", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.mode = mode
+        self.interval = interval
+        self.memory = memory
+        self.top_n = top_n
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.result = None
+        self._sampler = None
+        self._cprofile = None
+        self._thread_profiles = []
+        self._snapshot = None
+        self._start = None
+        self._token = None
+
+    def __enter__(self):
+        if self.memory:
+            self._snapshot = _start_tracemalloc()
+        if self.mode == "sample":
+            self._sampler = StackSampler(interval=self.interval).start()
+        else:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._token = _active_profiler.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def thread(self):
+        """Context manager that extends the profile to the calling thread while it is open."""
+        return _ThreadProfile(self)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _active_profiler.reset(self._token)
+        result = {"id": self.profile_id, "mode": self.mode, "duration_ms": round(duration * 1e3, 2)}
+        # Snapshot memory first so the profiler's own bookkeeping is not reported as an allocator
+        if self._snapshot is not None:
+            result["memory"] = _stop_tracemalloc(self._snapshot, self.top_n)
+        elif self.memory:
+            result["memory"] = {"skipped": "another request was being memory-profiled"}
+        if self._sampler is not None:
+            self._sampler.stop()
+            result["samples"] = self._sampler.samples
+            result["interval_ms"] = self.interval * 1e3
+            result["collapsed"] = self._sampler.collapsed()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=stream)
+            for profile in self._thread_profiles:
+                stats.add(profile)
+            stats.sort_stats("cumulative").print_stats(40)
+            result["pstats"] = stream.getvalue()
+        self.result = result
+        return False
+
+
+class _ThreadProfile:
+    def __init__(self, profiler: RequestProfiler):
+        self.profiler = profiler
+        self._cprofile = None
+
+    def __enter__(self):
+        if self.profiler._sampler is not None:
+            self.profiler._sampler.add_thread(threading.get_ident())
+        if self.profiler._cprofile is not None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler._sampler is not None:
+            self.profiler._sampler.remove_thread(threading.get_ident())
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self.profiler._thread_profiles.append(self._cprofile)
+        return False
+
+
+def profiled_call(func):
+    """Wrap ``func`` so that, when it runs on another thread for a request being profiled
+    (e.g. a sync endpoint on the threadpool), that thread is part of the request's profile."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None or profiler.result is not None:
+            return func(*args, **kwargs)
+        with profiler.thread():
+            return func(*args, **kwargs)
+    wrapper.profiled = True
+    return wrapper
+
+
+class ProfileStore:
+    """Keep the most recent profiles on disk as ``<id>.json`` (+ ``<id>.collapsed``)."""
+
+    def __init__(self, directory, max_profiles: int = 100):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, result: dict, meta: dict = None) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = result["id"]
+        payload = dict(result, **(meta or {}))
+        collapsed = payload.pop("collapsed", None)
+        if collapsed is not None:
+            (self.directory / f"{profile_id}.collapsed").write_text(collapsed + "\n")
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(payload, indent=2))
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        summaries = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in summaries[:-self.max_profiles] if self.max_profiles else []:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".collapsed").unlink(missing_ok=True)
+
+    def _path(self, profile_id: str, suffix: str) -> Path:
+        # IDs are generated hex strings; refuse anything that could escape the directory
+        if not profile_id.isalnum():
+            raise FileNotFoundError(profile_id)
+        return self.directory / f"{profile_id}{suffix}"
+
+    def load(self, profile_id: str) -> dict:
+        return json.loads(self._path(profile_id, ".json").read_text())
+
+    def load_collapsed(self, profile_id: str) -> str:
+        return self._path(profile_id, ".collapsed").read_text()
+
+    def list_ids(self) -> list:
+        summaries = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [p.stem for p in summaries]
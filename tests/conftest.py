@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The API imports its siblings as top-level packages (features, models, utils, ...)
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+@pytest.fixture(scope='session')
+def api():
+    """The API module with the trained models from src/models loaded."""
+    import api.main as api_main
+    api_main.load_trained_models()
+    return api_main
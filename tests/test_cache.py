@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from utils.cache import LRUCache, row_keys
+
+
+def test_equal_rows_get_equal_keys():
+    X = np.array([[1.5, 2.0, 3.0], [4.0, 5.0, 6.0], [1.5, 2.0, 3.0]], dtype=np.float32)
+    keys = row_keys(X, namespace='xgboost:v1')
+    assert keys[0] == keys[2] and keys[0] != keys[1]
+    assert row_keys(X.copy(), namespace='xgboost:v1') == keys
+    assert len(keys[0]) == 16 and hash(keys[0]) == hash(keys[2])
+
+
+@pytest.mark.parametrize('column', [0, 1, 2])
+def test_rows_differing_in_one_feature_get_different_keys(column):
+    base = np.array([1.0, 2.0, 3.0], dtype=np.float32)
+    other = base.copy()
+    other[column] = np.nextafter(other[column], np.float32(np.inf))
+    assert len(set(row_keys(np.stack([base, other])))) == 2
+
+
+def test_keys_compare_bytes_not_values():
+    signed_zero = row_keys(np.array([[0.0, 1.0], [-0.0, 1.0]], dtype=np.float32))
+    assert signed_zero[0] != signed_zero[1]
+    nan = row_keys(np.array([[np.nan, 1.0], [np.nan, 1.0], [0.0, 1.0]], dtype=np.float32))
+    assert nan[0] == nan[1] and nan[0] != nan[2]
+
+
+def test_namespace_separates_keys():
+    X = np.ones((2, 3), dtype=np.float32)
+    assert row_keys(X, namespace='xgboost:v1') != row_keys(X, namespace='xgboost:v2')
+    assert row_keys(X, namespace='xgboost:v1') != row_keys(X, namespace='ensemble:v1')
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache('test', maxsize=2)
+    cache.put_many(['a', 'b'], [1, 2])
+    assert cache.get_many(['a', 'c']) == [1, None]
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
+
+
+@pytest.fixture
+def memo(api, monkeypatch):
+    monkeypatch.setattr(api, 'prediction_cache', LRUCache('predict', maxsize=100))
+    monkeypatch.setattr(api, 'model_version', 'v1')
+    calls = []
+
+    def compute(batch):
+        calls.append(len(batch))
+        return batch.sum(axis=1)
+    return api, calls, compute
+
+
+def test_memoized_computes_only_misses(memo):
+    api, calls, compute = memo
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]], dtype=np.float32)
+    np.testing.assert_array_equal(api._memoized('xgboost', 'xgboost', X, compute), [3.0, 7.0, 3.0])
+    assert calls == [3]  # duplicates within a batch are not deduplicated, only cached
+    np.testing.assert_array_equal(api._memoized('xgboost', 'xgboost', X, compute), [3.0, 7.0, 3.0])
+    assert calls == [3]
+
+    Y = np.array([[3.0, 4.0], [5.0, 6.0]], dtype=np.float32)
+    np.testing.assert_array_equal(api._memoized('xgboost', 'xgboost', Y, compute), [7.0, 11.0])
+    assert calls == [3, 1]
+
+
+def test_memoized_misses_after_model_version_change(memo, monkeypatch):
+    api, calls, compute = memo
+    X = np.array([[1.0, 2.0]], dtype=np.float32)
+    api._memoized('xgboost', 'xgboost', X, compute)
+    monkeypatch.setattr(api, 'model_version', 'v2')
+    api._memoized('xgboost', 'xgboost', X, compute)
+    api._memoized('xgboost', 'quantiles', X, compute)  # another output of the same model
+    assert calls == [1, 1, 1]
+
+
+def test_memoized_bypassed_when_disabled(memo):
+    api, calls, compute = memo
+    X = np.array([[1.0, 2.0]], dtype=np.float32)
+    api._memoized('xgboost', 'xgboost', X, compute, memoize=False)
+    api._memoized('linear', 'linear', X, compute)  # not in model.prediction_cache_models
+    api._memoized('linear', 'linear', X, compute)
+    assert calls == [1, 1, 1] and len(api.prediction_cache) == 0
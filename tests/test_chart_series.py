@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from data.chart_series import WeeklySeries, lttb
+
+
+def _reference_lttb(x, y, n_out):
+    """Textbook single-series LTTB (Steinarsson, 2013)."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    picked, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    return picked + [n - 1]
+
+
+@pytest.mark.parametrize('n, width', [(500, 50), (143, 7), (100, 99), (10, 3)])
+def test_lttb_keeps_endpoints_and_returns_increasing_indices(n, width):
+    x = np.arange(n, dtype=np.float64) * 7
+    y = np.random.default_rng(n).normal(size=(2, n)).cumsum(axis=1)
+    picked = lttb(x, y, width)
+    assert picked.shape == (2, width)
+    assert (picked[:, 0] == 0).all() and (picked[:, -1] == n - 1).all()
+    assert (np.diff(picked, axis=1) > 0).all()
+
+
+def test_lttb_returns_every_point_when_the_series_fits():
+    picked = lttb(np.arange(5), np.arange(5.0), 8)
+    assert picked.tolist() == [[0, 1, 2, 3, 4]]
+
+
+def test_lttb_matches_per_series_reference():
+    n, width = 400, 37
+    x = np.arange(n, dtype=np.float64) * 7
+    y = np.random.default_rng(0).normal(size=(4, n)).cumsum(axis=1)
+    picked = lttb(x, y, width)
+    for series, indices in zip(y, picked):
+        assert indices.tolist() == _reference_lttb(x, series, width)
+
+
+def test_missing_store_weeks_are_dropped():
+    df = pd.DataFrame({
+        'Store': [1, 1, 1, 2, 2, 2, 2],
+        'Date': ['05-02-2010', '12-02-2010', '19-02-2010', '05-02-2010', '19-02-2010', '19-02-2010', 'bad'],
+        'Weekly_Sales': [10.0, 20.0, 30.0, 1.0, 2.0, 3.0, 100.0],
+    })
+    series = WeeklySeries.from_frame(df)
+    chart = series.downsample(800, stores=[2])
+    total, store = chart['series']
+    assert chart['weeks'] == 3
+    assert total['values'] == [11.0, 20.0, 35.0]
+    assert store['dates'] == ['2010-02-05', '2010-02-19'] and store['values'] == [1.0, 5.0]
+    with pytest.raises(ValueError):
+        series.downsample(800, stores=[3])
+
+
+def test_weekly_sales_endpoint(api):
+    client = TestClient(api.app)
+    response = client.get('/api/charts/weekly_sales',
+                          params={'width': 5, 'store': [1, 2], 'start': '2011-01-01', 'end': '2011-03-31'})
+    assert response.status_code == 200
+    chart = response.json()
+    assert chart['start'] >= '2011-01-01' and chart['end'] <= '2011-03-31' and chart['weeks'] == 12  # Fridays 2011-01-07 to 2011-03-25
+    assert [series['name'] for series in chart['series']] == ['total', 'Store 1', 'Store 2']
+    for series in chart['series']:
+        assert len(series['dates']) == 5 and series['dates'] == sorted(series['dates'])
+        assert series['dates'][0] == chart['start'] and series['dates'][-1] == chart['end']
+
+    unknown = client.get('/api/charts/weekly_sales', params={'store': 999})
+    assert unknown.status_code == 400 and '999' in unknown.json()['detail']
+    assert client.get('/api/charts/weekly_sales', params={'start': '01-01-2011'}).status_code == 400
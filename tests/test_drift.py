@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+ROWS = [
+    {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31, 'Fuel_Price': 2.572, 'CPI': 211.1, 'Unemployment': 8.1},
+    {'Store': 2, 'Date': '12-02-2010', 'Holiday_Flag': 1, 'Temperature': 38.51, 'Fuel_Price': 2.548, 'CPI': 210.8, 'Unemployment': 8.3},
+]
+
+
+@pytest.fixture
+def client(api):
+    if api.drift_monitor is None:
+        pytest.skip("no drift reference in the model artifacts")
+    api.drift_monitor.reset()
+    yield TestClient(api.app)
+    api.drift_monitor.reset()
+
+
+@pytest.mark.parametrize('body', [
+    {'model': 'xgboost'},
+    {'model': 'xgboost', 'quantiles': [0.1, 0.9]},
+    {'model': 'ensemble', 'quantiles': [0.1, 0.9]},
+])
+def test_prediction_request_is_observed_once(api, client, body):
+    response = client.post('/api/predict_json', json={'data': ROWS, **body})
+    assert response.status_code == 200, response.text
+    assert api.drift_monitor.rows == len(ROWS)
+
+
+def test_explanations_are_not_observed(api, client):
+    response = client.post('/api/explain', json={'data': ROWS, 'model': 'xgboost'})
+    assert response.status_code == 200, response.text
+    assert api.drift_monitor.rows == 0
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from data.schema import feature_source
+
+ROWS = [
+    {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31, 'Fuel_Price': 2.572, 'CPI': 211.1, 'Unemployment': 8.1},
+    {'Store': 20, 'Date': '12-11-2011', 'Holiday_Flag': 1, 'Temperature': 60.5, 'Fuel_Price': 3.4, 'CPI': 190.2, 'Unemployment': 7.2},
+    {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31, 'Fuel_Price': 2.572, 'CPI': 211.1, 'Unemployment': 8.1},
+]
+
+
+def _explain(api, model, **options):
+    response = TestClient(api.app).post('/api/explain', json={'data': ROWS, 'model': model, **options})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.parametrize('model', ['linear', 'xgboost'])
+def test_contributions_add_up_to_the_prediction(api, model):
+    body = _explain(api, model, group_categories=False)
+    contributions = np.array(body['contributions'])
+    assert contributions.shape == (len(ROWS), len(body['features']))  # duplicate rows are kept
+    np.testing.assert_allclose(np.array(body['base_values']) + contributions.sum(axis=1), body['predictions'], rtol=1e-6)
+
+    model_data = api.available_models[model]
+    X, rows = api._prepare_features(pd.DataFrame(ROWS), model, model_data, drop_rows=False)
+    assert list(rows) == list(range(len(ROWS)))
+    np.testing.assert_allclose(body['predictions'], model_data['model'].predict(X), rtol=1e-4)
+
+
+def test_bit_columns_are_grouped_into_their_source(api):
+    bits = _explain(api, 'xgboost', group_categories=False)
+    grouped = _explain(api, 'xgboost', group_categories=True)
+    assert 'Store' in grouped['features'] and not any(name.startswith('Store_') for name in grouped['features'])
+
+    per_source = pd.DataFrame(bits['contributions'], columns=bits['features'])
+    per_source = per_source.T.groupby([feature_source(name)[0] or name for name in bits['features']], sort=False).sum().T
+    np.testing.assert_allclose(np.array(grouped['contributions']), per_source[grouped['features']].to_numpy(), rtol=1e-5, atol=1e-3)
+    np.testing.assert_allclose(grouped['predictions'], bits['predictions'], rtol=1e-6)
+
+
+def test_repeated_rows_are_served_from_the_cache(api):
+    api.explanation_cache.clear()
+    first = _explain(api, 'xgboost')
+    assert first['cached_rows'] == 0
+    second = _explain(api, 'xgboost')
+    assert second['cached_rows'] == len(ROWS)
+    assert second['contributions'] == first['contributions']
+
+    cached = api.explanation_cache.get(next(iter(api.explanation_cache._data)))
+    assert cached.base is None  # a copy, not a view of the batch it was computed in
@@ -0,0 +1,88 @@
+import io
+import time
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from api.jobs import FAILED, FINISHED, SUCCEEDED, JobQueue, _count_rows
+
+ROWS = """Store,Date,Weekly_Sales,Holiday_Flag,Temperature,Fuel_Price,CPI,Unemployment
+1,05-02-2010,1643690.9,0,42.31,2.572,211.0963582,8.106
+1,12-02-2010,1641957.44,1,38.51,2.548,211.2421698,8.106
+2,05-02-2010,2136989.46,0,40.19,2.572,210.7526053,8.324
+1,05-02-2010,1643690.9,0,42.31,2.572,211.0963582,8.106
+3,19-02-2010,461622.22,0,45.71,2.514,214.4248812,7.368
+4,26-02-2010,1979247.12,0,-40.0,2.561,126.4420645,8.623
+5,05-03-2010,317173.1,0,41.0,9.625,211.5283,6.566
+"""
+
+
+def _run(queue: JobQueue, data: bytes, **kwargs) -> dict:
+    job = queue.submit(io.BytesIO(data), 'rows.csv', 'xgboost', **kwargs)
+    queue.start()
+    try:
+        deadline = time.monotonic() + 60
+        while (job := queue.get(job['id']))['status'] not in FINISHED:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+    return job
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 3, 1000])
+def test_every_row_scored_and_joinable_whatever_the_chunk_size(api, tmp_path, chunk_rows):
+    queue = JobQueue(tmp_path, score=api._score_job_chunk, chunk_rows=chunk_rows, poll_interval=0.05)
+    job = _run(queue, ROWS.encode(), quantiles=[0.1, 0.9])
+    assert job['status'] == SUCCEEDED, job['error']
+
+    result = pd.read_csv(queue.result_path(job['id']))
+    source = pd.read_csv(io.StringIO(ROWS))
+    assert list(result.columns) == ['row', 'Store', 'Date', 'prediction', 'quantile_0.1', 'quantile_0.9']
+    assert result['row'].tolist() == list(range(len(source)))
+    assert result['Store'].tolist() == source['Store'].tolist()
+    assert result['Date'].tolist() == source['Date'].tolist()
+    # The duplicate row scores like the original, and nothing depends on the chunk size
+    assert result.loc[3, 'prediction'] == result.loc[0, 'prediction']
+    expected = api._score_job_chunk(source, 'xgboost', [0.1, 0.9])[0]
+    assert result['prediction'].tolist() == pytest.approx(list(expected), rel=1e-6)
+
+
+def test_http_exception_fails_without_retry(tmp_path):
+    def score(df, model, quantiles):
+        raise HTTPException(status_code=500, detail="Preprocessing did not produce required features")
+
+    queue = JobQueue(tmp_path, score=score, max_attempts=3, poll_interval=0.05)
+    job = _run(queue, ROWS.encode())
+    assert job['status'] == FAILED
+    assert job['attempts'] == 1
+    assert 'required features' in job['error']
+
+
+def test_rows_are_counted_as_csv_records(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('Store,Date,Note\n1,05-02-2010,"two\nlines"\n\n2,12-02-2010,plain')  # no final newline
+    assert _count_rows(path) == 2
+    path.write_text('Store,Date\n')
+    assert _count_rows(path) == 0
+
+
+def test_submit_rejects_header_only_csv(tmp_path):
+    queue = JobQueue(tmp_path, score=None)
+    with pytest.raises(ValueError):
+        queue.submit(io.BytesIO(b'Store,Date\n\n'), 'empty.csv', 'xgboost')
+    assert list((tmp_path / 'uploads').iterdir()) == []
+
+
+def test_slow_chunk_is_not_requeued_as_stale(tmp_path):
+    def score(df, model, quantiles):
+        time.sleep(1.0)
+        return df['Weekly_Sales'].to_numpy(), None, df.index
+
+    # The second worker looks for stale jobs every 50ms while the first one is scoring
+    queue = JobQueue(tmp_path, score=score, workers=2, stale_after=0.3, poll_interval=0.05)
+    job = _run(queue, ROWS.encode())
+    assert job['status'] == SUCCEEDED, job['error']
+    assert job['attempts'] == 1
+    assert job['rows_total'] == job['rows_scored'] == 7
@@ -0,0 +1,51 @@
+import json
+import logging
+import queue
+
+from utils.logging import TEXT_FORMAT, JsonFormatter, NonBlockingQueueHandler, RequestIdFilter
+
+
+def _queued(log) -> logging.LogRecord:
+    log_queue = queue.Queue()
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger('tests.queue_handler')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        log(logger)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+    return log_queue.get_nowait()
+
+
+def test_message_is_merged_before_enqueueing():
+    rows = [1, 2]
+
+    def log(logger):
+        logger.warning("scored %s rows", rows, extra={'model': 'xgboost'})
+        rows.append(3)
+    record = _queued(log)
+
+    assert record.args is None
+    assert record.getMessage() == "scored [1, 2] rows"
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload['message'] == "scored [1, 2] rows"
+    assert payload['model'] == 'xgboost'
+    assert payload['request_id'] == '-'
+
+
+def test_traceback_is_rendered_before_enqueueing():
+    def log(logger):
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logger.error("failed for %s", 'store 1', exc_info=True)
+    record = _queued(log)
+
+    assert record.exc_info is None
+    assert 'RuntimeError: boom' in record.exc_text
+    assert 'RuntimeError: boom' in json.loads(JsonFormatter().format(record))['exc_info']
+    text = logging.Formatter(TEXT_FORMAT).format(record)
+    assert 'failed for store 1' in text and 'RuntimeError: boom' in text
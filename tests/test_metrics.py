@@ -0,0 +1,50 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from utils import metrics
+
+# name{label="value",...} value, or a # HELP / # TYPE comment
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="[^"]*",?)*\})? -?([0-9.e+-]+|\+Inf|nan)$')
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = metrics.Histogram("test_duration_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="parse")
+
+    lines = histogram.render().splitlines()
+    assert lines[:2] == ["# HELP test_duration_seconds Test latency.", "# TYPE test_duration_seconds histogram"]
+    assert lines[2:] == [
+        'test_duration_seconds_bucket{stage="parse",le="0.1"} 2',
+        'test_duration_seconds_bucket{stage="parse",le="1.0"} 3',
+        'test_duration_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'test_duration_seconds_sum{stage="parse"} 2.65',
+        'test_duration_seconds_count{stage="parse"} 4',
+    ]
+    assert histogram.get(stage="parse") == (4, 2.65)
+
+
+def test_counter_and_gauge_render():
+    counter = metrics.Counter("test_rows_total", "Rows.", ("model",))
+    counter.inc(3, model="xgboost")
+    gauge = metrics.Gauge("test_in_flight", "In flight.")
+    with gauge.track_inprogress():
+        assert gauge.get() == 1
+    assert counter.render().splitlines()[-1] == 'test_rows_total{model="xgboost"} 3'
+    assert gauge.render().splitlines()[-1] == 'test_in_flight 0'
+
+
+def test_metrics_endpoint_text_format(api):
+    client = TestClient(api.app)
+    assert client.get('/health').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == metrics.CONTENT_TYPE_LATEST
+    lines = [line for line in response.text.splitlines() if line]
+    assert all(line.startswith('# ') or SAMPLE.match(line) for line in lines), \
+        [line for line in lines if not line.startswith('# ') and not SAMPLE.match(line)]
+    assert any(line.startswith('sales_api_requests_total{method="GET",path="/health",status="200"}') for line in lines)
+    assert any(line.startswith('sales_api_request_duration_seconds_bucket{method="GET",path="/health",le="+Inf"}')
+               for line in lines)
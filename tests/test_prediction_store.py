@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from data.prediction_store import PredictionStore, iso_dates
+
+ROW = {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31, 'Fuel_Price': 2.572, 'CPI': 211.1, 'Unemployment': 8.1}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PredictionStore(tmp_path / 'predictions.db')
+
+
+def test_iso_dates_leave_unparseable_values_empty():
+    days = iso_dates(['05-02-2010', '2010-02-05', 'not a date', None, '31-02-2010', '05-02-2010'])
+    assert days.tolist() == ['2010-02-05', None, None, None, None, '2010-02-05']
+    assert iso_dates(pd.to_datetime(['2012-03-30'])).tolist() == ['2012-03-30']
+
+
+def test_write_skips_rows_without_store_or_date(store):
+    written = store.write([1, None, 'x', 2], ['05-02-2010', '05-02-2010', '05-02-2010', 'bad'], [1.0, 2.0, 3.0, 4.0],
+                          'xgboost', 'v1')
+    assert written == 1
+    assert [(row['store'], row['date'], row['prediction']) for row in store.query()] == [(1, '2010-02-05', 1.0)]
+
+
+def test_query_filters_and_orders(store):
+    store.write([2, 1, 1, 1], ['12-02-2010', '19-02-2010', '05-02-2010', '05-03-2010'], [20.0, 11.0, 10.0, 12.0],
+                'xgboost', 'v1')
+    store.write([1], ['05-02-2010'], [99.0], 'linear', 'v1')
+    store.write([1], ['05-02-2010'], [50.0], 'xgboost', 'v2')
+
+    rows = store.query(model_version='v1', model='xgboost')
+    assert [(row['store'], row['date']) for row in rows] == [(1, '2010-02-05'), (1, '2010-02-19'), (1, '2010-03-05'),
+                                                            (2, '2010-02-12')]
+    rows = store.query(stores=[1], start='2010-02-10', end='2010-03-05', model_version='v1')
+    assert [row['prediction'] for row in rows] == [11.0, 12.0]
+    assert len(store.query()) == 6
+    assert len(store.query(limit=2)) == 2
+
+
+def test_summarize_groups(store):
+    store.write([1, 1, 2], ['05-02-2010', '05-03-2010', '05-02-2010'], [10.0, 30.0, 5.0], 'xgboost', 'v1')
+    by_store = store.summarize('store')
+    assert by_store == [{'key': 1, 'count': 2, 'sum': 40.0, 'mean': 20.0, 'min': 10.0, 'max': 30.0},
+                        {'key': 2, 'count': 1, 'sum': 5.0, 'mean': 5.0, 'min': 5.0, 'max': 5.0}]
+    assert [(group['key'], group['count']) for group in store.summarize('month')] == [('2010-02', 2), ('2010-03', 1)]
+    with pytest.raises(ValueError):
+        store.summarize('weekday')
+
+
+def test_latest_served_forecast_wins(store):
+    store.write([1, 1], ['05-02-2010', '05-02-2010'], [1.0, 2.0], 'xgboost', 'v1', served_at=100.0)
+    assert [row['prediction'] for row in store.query()] == [2.0]  # the later row of a batch
+    store.write([1], ['05-02-2010'], [3.0], 'xgboost', 'v1', served_at=200.0)
+    store.write([1], ['05-02-2010'], [4.0], 'xgboost', 'v1', served_at=150.0)  # served earlier, written late
+    assert [(row['prediction'], row['created_at']) for row in store.query()] == [(3.0, 200.0)]
+
+
+def test_prediction_endpoints(api, store, monkeypatch):
+    client = TestClient(api.app)
+    monkeypatch.setattr(api, 'prediction_store', None)
+    assert client.get('/api/predictions').status_code == 503
+
+    writer = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(api, 'prediction_store', store)
+    monkeypatch.setattr(api, 'prediction_writer', writer)
+    response = client.post('/api/predict_json', json={'data': [ROW, {**ROW, 'Store': 2}], 'model': 'xgboost'})
+    assert response.status_code == 200
+    writer.shutdown(wait=True)
+    store.write([3], ['05-02-2010'], [1.0], 'xgboost', 'older-version')
+
+    body = client.get('/api/predictions', params={'store': [1, 2], 'start': '2010-02-05', 'end': '2010-02-05'}).json()
+    assert body['model_version'] == api.model_version and body['count'] == 2 and not body['truncated']
+    assert [row['store'] for row in body['predictions']] == [1, 2]
+    np.testing.assert_allclose([row['prediction'] for row in body['predictions']], response.json()['predictions'], rtol=1e-6)
+
+    assert client.get('/api/predictions', params={'model_version': 'all'}).json()['count'] == 3
+    assert client.get('/api/predictions', params={'model_version': 'all', 'limit': 1}).json()['truncated']
+    assert client.get('/api/predictions', params={'start': '05-02-2010'}).status_code == 400
+
+    summary = client.get('/api/predictions/summary', params={'group_by': 'year', 'model_version': 'all'}).json()
+    assert summary['groups'][0]['key'] == '2010' and summary['groups'][0]['count'] == 3
+    assert client.get('/api/predictions/summary', params={'group_by': 'weekday'}).status_code == 400
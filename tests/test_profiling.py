@@ -0,0 +1,70 @@
+import time
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from utils.profiling import ProfileStore, RequestProfiler
+
+
+def busy_sync_endpoint():
+    deadline = time.perf_counter() + 0.2
+    while time.perf_counter() < deadline:
+        pass
+    return {}
+
+
+@pytest.fixture
+def client(api, tmp_path, monkeypatch):
+    monkeypatch.setitem(api.profiling_config, 'enabled', True)
+    monkeypatch.setattr(api, 'profile_store', ProfileStore(tmp_path))
+    if not any(getattr(route, 'path', None) == '/tests/busy' for route in api.app.routes):
+        api.app.add_api_route('/tests/busy', busy_sync_endpoint)
+        api._profile_sync_endpoints()
+    return TestClient(api.app)
+
+
+@pytest.mark.parametrize('mode', ['sample', 'cprofile'])
+def test_profile_covers_sync_endpoint_thread(api, client, mode):
+    response = client.get('/tests/busy', headers={'X-Profile': mode})
+    assert response.status_code == 200, response.text
+
+    profile = api.profile_store.load(response.headers['X-Profile-Id'])
+    if mode == 'sample':
+        output = api.profile_store.load_collapsed(profile['id'])
+    else:
+        output = profile['pstats']
+    assert 'busy_sync_endpoint' in output
+
+
+def test_sync_endpoints_are_wrapped_once(api):
+    calls = [route.dependant.call for route in api.app.routes if hasattr(route, 'dependant')]
+    api._profile_sync_endpoints()
+    assert [route.dependant.call for route in api.app.routes if hasattr(route, 'dependant')] == calls
+
+
+def test_concurrent_memory_profiles_do_not_share_tracemalloc():
+    outer = RequestProfiler(mode='cprofile').__enter__()
+    with RequestProfiler(mode='cprofile') as inner:
+        data = [bytes(1000) for _ in range(1000)]
+    assert inner.result['memory'] == {'skipped': 'another request was being memory-profiled'}
+    assert tracemalloc.is_tracing()
+    data += [bytes(1000) for _ in range(1000)]
+    outer.__exit__(None, None, None)
+
+    assert outer.result['memory']['top_allocators']
+    assert not tracemalloc.is_tracing()
+    with RequestProfiler(mode='cprofile') as later:
+        pass
+    assert 'top_allocators' in later.result['memory']
+
+
+def test_memory_profile_leaves_existing_tracing_on():
+    tracemalloc.start()
+    try:
+        with RequestProfiler(mode='cprofile') as profiler:
+            pass
+        assert 'top_allocators' in profiler.result['memory']
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import SRC
+
+ROW = {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31, 'Fuel_Price': 2.572, 'CPI': 211.1, 'Unemployment': 8.1}
+
+
+@pytest.mark.parametrize('model', ['xgboost', 'ensemble'])
+def test_invalid_quantiles_are_reported_as_sent(api, model):
+    response = TestClient(api.app).post('/api/predict_json', json={'data': [ROW], 'model': model, 'quantiles': [1.5]})
+    assert response.status_code == 400
+    assert '[1.5]' in response.json()['detail']
+    assert '0.5]' not in response.json()['detail']
+
+
+def test_ensemble_loads_as_the_class_the_api_imports(api):
+    from models.ensemble import QuantileEnsemble
+    assert type(api.available_models['ensemble']['model']) is QuantileEnsemble
+    assert 'src.models.ensemble' not in sys.modules  # resolved by the unpickler, not by aliasing modules
+
+
+def test_ensemble_loads_without_repo_root_on_path():
+    # The training scripts pickle the ensemble as ``src.models.ensemble``; here ``src`` is not importable
+    script = (
+        f"import sys; sys.path = [{SRC!r}] + [p for p in sys.path[1:] if p != {SRC.rsplit('/', 1)[0]!r}]\n"
+        "import api.main as m\n"
+        "m.load_trained_models()\n"
+        "assert m.available_models['ensemble'] is not None\n"
+    )
+    subprocess.run([sys.executable, '-W', 'ignore', '-c', script], cwd=SRC, check=True, capture_output=True,
+                   env={'LOG_LEVEL': 'ERROR', 'PATH': ''})
@@ -0,0 +1,48 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.preprocess import preprocess_sales_data, scale_features
+from features.scenario import ScenarioGrid, score_grid
+
+BASE = {'Store': 1, 'Date': '05-02-2010', 'Holiday_Flag': 0, 'Temperature': 42.31,
+        'Fuel_Price': 2.572, 'CPI': 211.0963582, 'Unemployment': 8.106}
+AXES = [
+    ('Temperature', np.linspace(10.1, 99.7, 13)),
+    ('Fuel_Price', np.array([2.513, 3.1417, 3.9])),
+    ('Store', np.array([1.0, 5.0, 20.0])),
+]
+
+
+def _request_features(api, rows: pd.DataFrame, feature_names) -> np.ndarray:
+    # What the prediction endpoints build from the same rows (see api.main)
+    df_proc = preprocess_sales_data(rows, codebook=api.loaded_codebook)
+    assert len(df_proc) == len(rows), "no row of the test grid may be dropped as an outlier"
+    df_scaled, _ = scale_features(df_proc, api.loaded_scaler)
+    return df_scaled[feature_names].values
+
+
+@pytest.mark.parametrize('model_name', ['linear', 'xgboost'])
+def test_grid_matches_regular_prediction_path(api, model_name):
+    model_data = api.available_models[model_name]
+    grid = ScenarioGrid(BASE, AXES, model_data['feature_names'], api.loaded_scaler, api.loaded_codebook)
+    rows = pd.DataFrame([{**BASE, **dict(zip([name for name, _ in AXES], point))}
+                         for point in itertools.product(*(values for _, values in AXES))])
+
+    X = _request_features(api, rows, model_data['feature_names'])
+    predictions = score_grid(grid, lambda X_grid: api.predict(model_data, X_grid)).reshape(-1)
+
+    np.testing.assert_array_equal(grid.features(0, grid.size), X)
+    np.testing.assert_array_equal(predictions, api.predict(model_data, X))
+
+
+@pytest.mark.parametrize('model_name', ['linear', 'xgboost'])
+def test_base_matches_regular_prediction_path(api, model_name):
+    model_data = api.available_models[model_name]
+    base_grid = ScenarioGrid(BASE, [], model_data['feature_names'], api.loaded_scaler, api.loaded_codebook)
+    X = _request_features(api, pd.DataFrame([BASE]), model_data['feature_names'])
+    np.testing.assert_array_equal(base_grid.features(0, 1), X)
+    np.testing.assert_array_equal(score_grid(base_grid, lambda X_grid: api.predict(model_data, X_grid)).reshape(-1),
+                                  api.predict(model_data, X))
@@ -0,0 +1,57 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.schema import bytes_per_row, coerce_column, read_sales_csv
+from features.preprocess import preprocess_sales_data
+
+
+@pytest.mark.parametrize('values, dtype', [
+    ([70000, 1], 'int16'),
+    ([-40000, 1], 'int16'),
+    ([300, 1], 'uint8'),
+    ([-1, 1], 'uint8'),
+    (['300', '1'], 'uint8'),
+    ([300.0, 1.0], 'uint8'),
+])
+def test_out_of_range_integers_become_missing(values, dtype):
+    coerced = coerce_column(pd.Series(values, name='col'), dtype)
+    assert coerced.dtype == np.float32
+    assert np.isnan(coerced.iloc[0]) and coerced.iloc[1] == 1
+
+
+def test_in_range_integers_are_narrowed():
+    coerced = coerce_column(pd.Series([-32768, 32767], name='Store'), 'int16')
+    assert coerced.dtype == np.int16
+    assert coerced.tolist() == [-32768, 32767]
+
+
+def test_read_sales_csv_does_not_wrap_integers():
+    df = read_sales_csv(io.StringIO("Store,Holiday_Flag,CPI\n70000,300,211.1\n1,0,211.2\n"))
+    assert np.isnan(df['Store'].iloc[0]) and np.isnan(df['Holiday_Flag'].iloc[0])
+    assert df['Store'].iloc[1] == 1 and df['Holiday_Flag'].iloc[1] == 0
+
+    df = read_sales_csv(io.StringIO("Store,Holiday_Flag,CPI\n45,1,211.1\n1,0,211.2\n"))
+    assert df['Store'].dtype == np.int16 and df['Holiday_Flag'].dtype == np.uint8
+
+
+def _default_width(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with every numeric column widened to pandas' default int64/float64."""
+    return df.astype({col: 'float64' if df[col].dtype.kind == 'f' else 'int64'
+                      for col in df.columns if df[col].dtype.kind in 'iuf'})
+
+
+def test_compact_frames_use_a_fraction_of_the_default_memory():
+    path = Path(__file__).resolve().parents[1] / 'data' / 'Walmart.csv'
+    raw = read_sales_csv(path)
+    assert {str(dtype) for dtype in raw.drop(columns='Date').dtypes} <= {'int16', 'uint8', 'float32'}
+    assert bytes_per_row(raw) < 0.85 * bytes_per_row(pd.read_csv(path))
+    numeric = raw.drop(columns='Date')
+    assert bytes_per_row(numeric) < 0.5 * bytes_per_row(_default_width(numeric))
+
+    processed = preprocess_sales_data(raw)
+    assert {str(dtype) for dtype in processed.dtypes} <= {'uint8', 'float32'}
+    assert bytes_per_row(processed) < 0.5 * bytes_per_row(_default_width(processed))
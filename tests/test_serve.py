@@ -0,0 +1,32 @@
+import copy
+
+import numpy as np
+import pytest
+
+from api.serve import _freeze_arrays
+
+
+class Holder:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+def test_freeze_arrays_marks_reachable_arrays_read_only():
+    weights = np.arange(6.0)
+    nested = {'weights': weights, 'layers': [np.ones(2), (np.zeros(3),)], 'owner': Holder(bias=np.array([0.5]))}
+    nested['self'] = nested  # cycles are visited once
+
+    assert _freeze_arrays(nested) == 4
+    for array in (weights, nested['layers'][0], nested['layers'][1][0], nested['owner'].bias):
+        assert not array.flags.writeable
+        with pytest.raises(ValueError):
+            array[0] = 1.0
+    assert _freeze_arrays(nested) == 4  # freezing again (e.g. after SIGHUP reload) is harmless
+
+
+def test_frozen_scaler_still_transforms(api):
+    scaler = copy.deepcopy(api.loaded_scaler)
+    assert _freeze_arrays(scaler) >= 3
+    assert not scaler.mean_.flags.writeable and not scaler.scale_.flags.writeable
+    X = np.tile(scaler.mean_, (2, 1))
+    np.testing.assert_allclose(scaler.transform(X), 0.0, atol=1e-9)
@@ -0,0 +1,54 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from models.bundle import build_bundle_from_files, compute_model_version, load_bundle
+
+
+@pytest.fixture
+def reload_after(api):
+    yield api
+    api.load_trained_models()
+
+
+def test_ready_only_after_warm_up(reload_after, monkeypatch):
+    api = reload_after
+    client = TestClient(api.app)
+    during_warm_up = []
+    warm_up = api._warm_up
+
+    def checked_warm_up():
+        during_warm_up.append(client.get('/ready').status_code)
+        warm_up()
+    monkeypatch.setattr(api, '_warm_up', checked_warm_up)
+    monkeypatch.setitem(api.config['model'], 'warmup', True)
+    api.load_trained_models()
+
+    assert during_warm_up == [503]
+    response = client.get('/ready')
+    assert response.status_code == 200
+    body = response.json()
+    assert body['ready'] and body['model_version'] == api.model_version
+    assert 'warmup_s' in body['startup']
+
+
+def test_bundle_round_trip_keeps_model_version(reload_after, tmp_path, monkeypatch):
+    api = reload_after
+    monkeypatch.setattr(api, 'BUNDLE_PATH', str(tmp_path / 'missing.joblib'))
+    api.load_trained_models()
+    assert api.startup_report['source'] == 'files'
+    files_version = api.model_version
+
+    bundle_path = build_bundle_from_files(api.MODELS_DIR, tmp_path / 'bundle.joblib')
+    bundle = load_bundle(bundle_path)
+    assert bundle['model_version'] == files_version
+    # memory-mapped arrays hash as np.memmap, so recompute from a plain load
+    unmapped = load_bundle(bundle_path, mmap_mode=None)
+    assert compute_model_version(unmapped['models'], unmapped['scaler']) == files_version
+
+    monkeypatch.setattr(api, 'BUNDLE_PATH', str(bundle_path))
+    versions = []
+    for _ in range(2):
+        api.load_trained_models()
+        assert api.startup_report['source'] == 'bundle'
+        versions.append(api.model_version)
+    assert versions == [files_version, files_version]
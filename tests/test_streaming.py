@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from models.streaming import StreamingTrainer, train_streaming
+
+DATA = Path(__file__).resolve().parents[1] / 'data' / 'Walmart.csv'
+
+
+@pytest.fixture
+def small_csv(tmp_path):
+    path = tmp_path / 'sales.csv'
+    pd.read_csv(DATA, nrows=900).to_csv(path, index=False)
+    return path
+
+
+def _stack(batches):
+    X, y, _ = zip(*batches)
+    return np.concatenate(X).astype(np.float64), np.concatenate(y).astype(np.float64)
+
+
+def test_chunked_linear_fit_matches_in_memory_fit(small_csv):
+    trainer = StreamingTrainer(small_csv, chunk_rows=200, sample_rows=1000, test_size=0.2, seed=1)
+    trainer.scan()
+    trainer.fit_scaler()
+    streamed = trainer.train_linear()
+
+    # The same scaled train rows, fitted in one go
+    X_train, y_train = _stack(trainer.batches('train'))
+    X_test, y_test = _stack(trainer.batches('test'))
+    assert 0 < len(X_test) < len(X_train)
+    reference = LinearRegression().fit(X_train, y_train)
+
+    np.testing.assert_allclose(streamed.predict(X_train), reference.predict(X_train), rtol=1e-4)
+    # Features that are constant in these rows scale to all-zero columns; both fits give them a 0 weight
+    np.testing.assert_allclose(streamed.coef_, reference.coef_, rtol=1e-3, atol=1e-6 * np.abs(reference.coef_).max())
+    assert streamed.intercept_ == pytest.approx(reference.intercept_, rel=1e-6)
+    rmse = [np.sqrt(np.mean((model.predict(X_test) - y_test) ** 2)) for model in (streamed, reference)]
+    assert rmse[0] == pytest.approx(rmse[1], rel=1e-4)
+
+
+def test_bootstrap_ensemble_is_rejected_before_training(small_csv, tmp_path):
+    config = {'ensemble': {'enabled': True, 'method': 'bootstrap'}}
+    with pytest.raises(ValueError, match='quantile'):
+        train_streaming(small_csv, tmp_path / 'models', config, chunk_rows=200)
+    assert not (tmp_path / 'models').exists()